@@ -0,0 +1,201 @@
+"""Certificate rendering benchmark.
+
+Renders synthetic rosters through CertificateService.generate and
+Certificate.write and measures every stage separately. Results are printed
+as JSON, save them to compare runs between commits:
+
+    python -m benchmarks.certificate --output before.json
+    python -m benchmarks.certificate --output after.json --compare before.json
+"""
+
+import json
+import platform
+import resource
+import subprocess
+from datetime import date
+from io import BytesIO
+from pathlib import Path
+from statistics import median
+from statistics import quantiles
+from time import perf_counter
+from typing import Any
+from typing import Callable
+
+import click
+import PIL
+from PIL.Image import open as _open_image
+
+from lib.domain.certificate.serializer.image_serializer import CertificateImageSerializer
+from lib.domain.certificate.serializer.profiles import DEFAULT_PROFILE
+from lib.domain.certificate.serializer.profiles import PROFILES
+from lib.domain.certificate.service import CertificateService
+from lib.domain.webinar.enums import WebinarTitle
+
+ROSTERS = {
+    "short": ["Ким Ан Ли", "Ли Ян Ю", "By Li Xi"],
+    "long": [
+        "Мельникова-Дёмкина Людмила Андреевна",
+        "Преображенская Анастасия Владимировна",
+        "Montgomery-Whitfield Alexandra Josephine",
+    ],
+    "cyrillic": [
+        "Мельникова Людмила Андреевна",
+        "Щербакова Юлия Эдуардовна",
+        "Ёлкина Жанна Фёдоровна",
+    ],
+    "pathological": [
+        "Константинопольская-Преображенская-Благовещенская Александра Вячеславовна",
+        "Ш" * 120,
+        "",
+    ],
+}
+STARTED_AT = date(2025, 2, 19)
+FINISHED_AT = date(2025, 2, 20)
+
+
+def measure(func: Callable[[], Any], rounds: int) -> dict[str, float]:
+    timings = []
+    for _ in range(rounds):
+        started_at = perf_counter()
+        func()
+        timings.append((perf_counter() - started_at) * 1000)
+    p95 = quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    return {"median_ms": median(timings), "p95_ms": p95}
+
+
+def get_peak_rss_kib() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def get_commit() -> str:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return result.stdout.strip()
+
+
+def bench_roster(service: CertificateService, names: list[str], rounds: int) -> dict[str, Any]:
+    serializer = service.serializer
+    certificates = [
+        service.generate(
+            title=WebinarTitle.GRAMMAR,
+            started_at=STARTED_AT,
+            finished_at=FINISHED_AT,
+            name=name,
+        )
+        for name in names
+    ]
+    title, _, date_text = certificates[0].get_texts()
+    result: dict[str, Any] = {}
+    if isinstance(serializer, CertificateImageSerializer):
+        base = serializer.get_base_image(title, date_text)
+        result["font_fitting"] = measure(
+            lambda: [serializer._get_name_font(base, name) for name in names],
+            rounds,
+        )
+        result["draw"] = measure(
+            lambda: [serializer.get_image(title, name, date_text) for name in names],
+            rounds,
+        )
+        image = serializer.get_image(title, names[0], date_text)
+        result["encode"] = measure(lambda: serializer.encode(image, BytesIO()), rounds)
+
+    def write_all() -> None:
+        for certificate in certificates:
+            certificate.write(BytesIO())
+
+    result["write"] = measure(write_all, rounds)
+    sizes = []
+    for certificate in certificates:
+        buffer = BytesIO()
+        certificate.write(buffer)
+        sizes.append(len(buffer.getvalue()))
+    result["bytes"] = sizes
+    return result
+
+
+def run(profile: str, rounds: int) -> dict[str, Any]:
+    service = CertificateService.from_profile(profile)
+    serializer = service.serializer
+    report: dict[str, Any] = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "profile": profile,
+        "rounds": rounds,
+    }
+    template = getattr(serializer, "template", None)
+    if isinstance(template, Path):
+        report["template_decode"] = measure(lambda: _open_image(template).load(), rounds)
+    if isinstance(serializer, CertificateImageSerializer):
+        report["template_load"] = measure(serializer.load_template, rounds)
+        title, _, date_text = service.generate(
+            title=WebinarTitle.GRAMMAR,
+            started_at=STARTED_AT,
+            finished_at=FINISHED_AT,
+            name="",
+        ).get_texts()
+
+        def render_base_layer() -> None:
+            # pylint: disable-next=protected-access
+            CertificateImageSerializer._get_base_image.cache_clear()
+            serializer.get_base_image(title, date_text)
+
+        report["base_layer"] = measure(render_base_layer, rounds)
+    report["rosters"] = {
+        roster: bench_roster(service, names, rounds) for roster, names in ROSTERS.items()
+    }
+    report["peak_rss_kib"] = get_peak_rss_kib()
+    return report
+
+
+def _collect_timings(report: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    timings = {}
+    for key, value in report.items():
+        if isinstance(value, dict) and "median_ms" in value:
+            timings[f"{prefix}{key}"] = value["median_ms"]
+        elif isinstance(value, dict):
+            timings.update(_collect_timings(value, f"{prefix}{key}."))
+    return timings
+
+
+def compare(before: dict[str, Any], after: dict[str, Any]) -> None:
+    before_timings = _collect_timings(before)
+    for stage, after_ms in _collect_timings(after).items():
+        if (before_ms := before_timings.get(stage)) is None:
+            continue
+        change = (after_ms - before_ms) / before_ms * 100 if before_ms else 0.0
+        click.echo(
+            f"{stage:32s} {before_ms:10.2f} ms -> {after_ms:10.2f} ms {change:+7.1f}%", err=True
+        )
+
+
+@click.command()
+@click.option("--profile", type=click.Choice(list(PROFILES)), default=DEFAULT_PROFILE)
+@click.option("--rounds", type=click.IntRange(min=1), default=5)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None)
+@click.option(
+    "--compare",
+    "compare_with",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+)
+def main(profile: str, rounds: int, output: Path | None, compare_with: Path | None) -> None:
+    report = run(profile, rounds)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output is None:
+        click.echo(text)
+    else:
+        output.write_text(text, encoding="utf-8")
+    if compare_with is not None:
+        compare(json.loads(compare_with.read_text(encoding="utf-8")), report)
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
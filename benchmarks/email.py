@@ -0,0 +1,138 @@
+"""Email throughput through the real SMTP client path into a local SMTP sink.
+
+Certificates are rendered once per name before the run, every message is
+built from a prebuilt MIME template, sent over SMTP and counted by the sink:
+
+    python -m benchmarks.email --messages 2000 --connections 4
+    python -m benchmarks.email --latency 0.05 --fail-every 500 --drop-every 100
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from statistics import median
+from statistics import quantiles
+from time import perf_counter
+from typing import Any
+
+import click
+from loguru import logger
+
+from lib.clients.email import SMTPClient
+from lib.clients.smtp_sink import SinkBehaviour
+from lib.clients.smtp_sink import SMTPSink
+from lib.domain.certificate.model import Certificate
+from lib.domain.certificate.serializer.profiles import DEFAULT_PROFILE
+from lib.domain.certificate.serializer.profiles import PROFILES
+from lib.domain.certificate.service import CertificateService
+from lib.domain.certificate.service import render_certificate
+from lib.domain.email.service import EmailService
+from lib.domain.webinar.enums import WebinarTitle
+
+NAMES = [
+    "Мельникова Людмила Андреевна",
+    "Мельникова-Дёмкина Людмила Андреевна",
+    "Ким Алла Кимовна",
+    "Преображенская Анастасия Владимировна",
+]
+MESSAGE = "Здравствуйте, Людмила! Благодарю вас за участие."
+
+
+def render(profile: str, scale: float) -> list[tuple[Certificate, bytes]]:
+    service = CertificateService.from_profile(profile, scale=scale)
+    return [
+        (certificate, render_certificate(certificate))
+        for certificate in (
+            service.generate(
+                title=WebinarTitle.GRAMMAR,
+                started_at=date(2025, 2, 19),
+                finished_at=date(2025, 2, 20),
+                name=name,
+            )
+            for name in NAMES
+        )
+    ]
+
+
+def run(
+    messages: int,
+    connections: int,
+    profile: str,
+    scale: float,
+    behaviour: SinkBehaviour,
+) -> dict[str, Any]:
+    rendered = render(profile, scale)
+    with SMTPSink(behaviour=behaviour) as sink:
+        client = SMTPClient(port=sink.port, connections=connections)
+        service = EmailService(email_client=client, bcc_emails=("bcc@localhost.test",))
+
+        def send(i: int) -> float:
+            certificate, content = rendered[i % len(rendered)]
+            started_at = perf_counter()
+            service.send_certificate_email(
+                title=WebinarTitle.GRAMMAR,
+                email=f"participant{i}@localhost.test",
+                message=MESSAGE,
+                certificate=certificate,
+                content=content,
+            )
+            return (perf_counter() - started_at) * 1000
+
+        started_at = perf_counter()
+        errors = 0
+        timings = []
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for future in [executor.submit(send, i) for i in range(messages)]:
+                try:
+                    timings.append(future.result())
+                except Exception:  # rejected by the sink, counted by it
+                    errors += 1
+        elapsed = perf_counter() - started_at
+        service.close()
+        sink_stats = dict(sink.stats)
+    return {
+        "messages": messages,
+        "connections": connections,
+        "profile": profile,
+        "scale": scale,
+        "certificate_bytes": [len(content) for _, content in rendered],
+        "seconds": elapsed,
+        "messages_per_second": (messages - errors) / elapsed,
+        "bytes_per_second": sink_stats.get("bytes", 0) / elapsed,
+        "send_median_ms": median(timings) if timings else None,
+        "send_p95_ms": quantiles(timings, n=20)[-1] if len(timings) > 1 else None,
+        "errors": errors,
+        "client": dict(client.stats),
+        "sink": sink_stats,
+    }
+
+
+@click.command()
+@click.option("--messages", type=click.IntRange(min=1), default=2000, show_default=True)
+@click.option("--connections", type=click.IntRange(min=1), default=4, show_default=True)
+@click.option("--profile", type=click.Choice(list(PROFILES)), default=DEFAULT_PROFILE)
+@click.option("--scale", type=click.FloatRange(min=0.05, max=1.0), default=1.0)
+@click.option("--latency", type=float, default=0.0, help="Sink delay before accepting, seconds.")
+@click.option("--messages-per-second", type=float, default=None, help="Sink throttling.")
+@click.option("--fail-every", type=int, default=0, help="Sink rejects every n-th message.")
+@click.option("--error-code", type=int, default=451, show_default=True)
+@click.option("--drop-every", type=int, default=0, help="Sink disconnects after n messages.")
+def main(
+    messages: int,
+    connections: int,
+    profile: str,
+    scale: float,
+    latency: float,
+    messages_per_second: float | None,
+    fail_every: int,
+    error_code: int,
+    drop_every: int,
+) -> None:
+    logger.remove()  # per message debug logs would dominate the timings
+    behaviour = SinkBehaviour(latency, messages_per_second, fail_every, error_code, drop_every)
+    report = run(messages, connections, profile, scale, behaviour)
+    click.echo(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,32 @@
+"""Encode time and output size of every certificate encoding profile.
+
+Run with `python -m benchmarks.encoding`.
+"""
+
+from io import BytesIO
+from time import perf_counter
+
+from lib.domain.certificate.serializer.image_serializer import CertificateImageSerializer
+from lib.domain.certificate.serializer.profiles import PROFILES
+
+TITLE = "Формирование базовых\nграмматических представлений"
+NAME = "Мельникова Людмила Андреевна"
+DATE_TEXT = "19 - 20 февраля\n2025 г."
+
+
+def main() -> None:
+    for profile, factory in PROFILES.items():
+        serializer = factory()
+        if not isinstance(serializer, CertificateImageSerializer):
+            continue
+        image = serializer.get_image(TITLE, NAME, DATE_TEXT)
+        buffer = BytesIO()
+        started_at = perf_counter()
+        serializer.encode(image, buffer)
+        elapsed = perf_counter() - started_at
+        size = len(buffer.getvalue())
+        print(f"{profile:12s} {elapsed * 1000:8.1f} ms {size / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Name font fitting: linear scan with uncached fonts vs cached bisection.
+
+Run with `python -m benchmarks.name_font`.
+"""
+
+from timeit import timeit
+
+from PIL.Image import open as _open_image
+from PIL.ImageFont import FreeTypeFont
+from PIL.ImageFont import truetype
+
+from lib.domain.certificate.serializer.image_serializer import FONT
+from lib.domain.certificate.serializer.png_serializer import CertificatePNGSerializer
+
+NAMES = [
+    "Ким Алла Кимовна",
+    "Мельникова Людмила Андреевна",
+    "Мельникова-Дёмкина Людмила Андреевна",
+    "Константинопольская-Преображенская Александра Вячеславовна",
+]
+ROUNDS = 20
+
+
+def linear_name_font(image_width: int, name: str) -> FreeTypeFont:
+    """Previous implementation: load every size until the name does not fit."""
+    max_text_width = image_width * 0.81
+    for font_size in range(100, 150):
+        if truetype(font=FONT, size=font_size).getlength(name) > max_text_width:
+            break
+    return truetype(font=FONT, size=font_size)
+
+
+def main() -> None:
+    serializer = CertificatePNGSerializer()
+    image = _open_image(serializer.template)
+    for name in NAMES:
+        expected = linear_name_font(image.width, name).size
+        assert serializer._get_name_font(image, name).size == expected
+        before = timeit(lambda: linear_name_font(image.width, name), number=ROUNDS) / ROUNDS
+        after = timeit(lambda: serializer._get_name_font(image, name), number=ROUNDS) / ROUNDS
+        print(
+            f"{len(name):3d} chars  before {before * 1000:8.3f} ms  "
+            f"after {after * 1000:8.3f} ms  x{before / after:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
+import os
+from pathlib import Path
+
 import click
 from dotenv import load_dotenv
 
+from lib.clients.email import RetryingEmailClient
+from lib.domain.certificate.cache import CertificateCache
+from lib.domain.certificate.serializer.profiles import DEFAULT_PROFILE
+from lib.domain.certificate.serializer.profiles import PROFILES
+from lib.domain.certificate.service import CertificateService
+from lib.domain.email.accounts import SenderPool
+from lib.domain.email.planner import SendPlanner
+from lib.domain.email.repository import SenderUsageRepository
+from lib.domain.email.service import EmailService
+from lib.domain.job.repository import SendJobRepository
+from lib.domain.job.service import SendJobWorker
+from lib.domain.outbox.repository import OutboxRepository
+from lib.webinar import FILL_CHUNK_ROWS
 from lib.webinar import Webinar
 
 
@@ -23,10 +39,17 @@ def contacts(url: str) -> None:
 
 @cli.command()
 @click.argument("url")
-def fill(url: str) -> None:
+@click.option(
+    "--chunk-rows",
+    type=click.IntRange(min=1),
+    default=FILL_CHUNK_ROWS,
+    show_default=True,
+    help="Rows written to the mailing sheet with one request.",
+)
+def fill(url: str, chunk_rows: int) -> None:
     click.echo(f"Fill mailing sheet from {url}")
     click.confirm("Continue?", default=True, abort=True)
-    Webinar.from_url(url).certificates_sheet_fill()
+    Webinar.from_url(url, fill_chunk_rows=chunk_rows).certificates_sheet_fill()
     click.echo("Mailing sheet filled")
     if click.confirm("Open mailing sheet?", default=True):
         click.launch(url)
@@ -34,15 +57,197 @@ def fill(url: str) -> None:
 
 @cli.command()
 @click.argument("url")
-def send(url: str) -> None:
+@click.option(
+    "--profile",
+    type=click.Choice(list(PROFILES)),
+    default=DEFAULT_PROFILE,
+    show_default=True,
+    help="Certificate encoding profile.",
+)
+@click.option(
+    "--preview-scale",
+    type=click.FloatRange(min=0.05, max=1.0),
+    default=0.25,
+    show_default=True,
+    help="Certificate scale for test emails.",
+)
+@click.option(
+    "--render-workers",
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    show_default=True,
+    help="Number of certificates rendered at the same time.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of emails sent at the same time, SMTP_PER_MINUTE limits the rate.",
+)
+@click.option(
+    "--requeue-sending",
+    is_flag=True,
+    help="Send again emails interrupted during SMTP, check the Sent folder for them first.",
+)
+def send(
+    url: str,
+    profile: str,
+    preview_scale: float,
+    render_workers: int,
+    workers: int,
+    requeue_sending: bool,
+) -> None:
     click.echo(f"Send emails with certificates from {url}")
+    outbox = OutboxRepository()
+    if requeue_sending:
+        click.echo(f"{outbox.requeue_sending(url)} interrupted emails queued again")
     if click.confirm("Open mailing sheet?", default=True):
         click.launch(url)
+    cache = CertificateCache()
     if click.confirm("Test emails?", default=True):
-        Webinar.from_url(url, test=True).send_emails_with_certificates()
-    if click.confirm(click.style("Send emails?", fg="red"), abort=True):
-        Webinar.from_url(url).send_emails_with_certificates()
-        click.echo("Emails sent")
+        webinar = Webinar.from_url(
+            url,
+            test=True,
+            profile=profile,
+            cache=cache,
+            scale=preview_scale,
+            render_workers=render_workers,
+            send_workers=workers,
+        )
+        webinar.send_emails_with_certificates()
+    usage = SenderUsageRepository()
+    webinar = Webinar.from_url(
+        url,
+        profile=profile,
+        cache=cache,
+        render_workers=render_workers,
+        send_workers=workers,
+        outbox=outbox,
+        sender_usage=usage,
+    )
+    plan = webinar.plan_send(SendPlanner.from_environment(), usage)
+    click.echo(f"{plan.pending} emails to send, {plan.budget} of them within the quota now")
+    if plan.last_start is not None:
+        click.echo(f"Projected completion: {plan.last_start:%Y-%m-%d %H:%M}")
+    if plan.budget and click.confirm(click.style("Send emails?", fg="red"), abort=True):
+        sent = webinar.send_emails_with_certificates(limit=plan.budget)
+        click.echo(f"{sent} emails sent")
+    if plan.resume_at is not None:
+        click.echo(f"Quota is spent, run send again after {plan.resume_at:%Y-%m-%d %H:%M}")
+
+
+@cli.command()
+@click.argument("url")
+@click.option(
+    "--profile",
+    type=click.Choice(list(PROFILES)),
+    default=DEFAULT_PROFILE,
+    show_default=True,
+    help="Certificate encoding profile, must be the same as for send.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    show_default=True,
+    help="Number of rendering processes.",
+)
+def prerender(url: str, profile: str, workers: int) -> None:
+    click.echo(f"Render certificates from {url} into the cache before sending")
+    webinar = Webinar.from_url(url, profile=profile, workers=workers, cache=CertificateCache())
+    webinar.prerender_certificates()
+    click.echo("Certificates rendered")
+
+
+@cli.command()
+@click.argument("url")
+@click.argument("path", type=click.Path(dir_okay=False, path_type=Path))
+def roster(url: str, path: Path) -> None:
+    click.echo(f"Save all certificates from {url} into one PDF for printing")
+    Webinar.from_url(url, profile="pdf").save_certificates_roster(path)
+    click.echo(f"Certificates saved to {click.format_filename(path)}")
+    if click.confirm("Open certificates?", default=True):
+        click.launch(str(path))
+
+
+@cli.command()
+@click.argument("url")
+@click.argument("path", type=click.Path(path_type=Path))
+@click.option(
+    "--scale",
+    type=click.FloatRange(min=0.02, max=0.5),
+    default=0.1,
+    show_default=True,
+    help="Thumbnail scale.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    show_default=True,
+    help="Number of rendering processes.",
+)
+def proof(url: str, path: Path, scale: float, workers: int) -> None:
+    click.echo(f"Save thumbnails of all certificates from {url} for review")
+    click.echo("PATH ending with .pdf gets one PDF, any other PATH is a directory of PNG pages")
+    webinar = Webinar.from_url(url, profile="jpeg", workers=workers, scale=scale)
+    webinar.save_proof_sheet(path)
+    click.echo(f"Proof sheet saved to {click.format_filename(path)}")
+    if click.confirm("Open proof sheet?", default=True):
+        click.launch(str(path))
+
+
+@cli.command()
+@click.argument("url")
+@click.option(
+    "--requeue-sending",
+    is_flag=True,
+    help="Send again emails interrupted during SMTP, check the Sent folder for them first.",
+)
+def enqueue(url: str, requeue_sending: bool) -> None:
+    click.echo(f"Put emails with certificates from {url} into the job queue")
+    click.echo("Run worker processes to send them, they share the DBPATH database")
+    click.confirm(click.style("Continue?", fg="red"), default=True, abort=True)
+    repository = SendJobRepository()
+    if requeue_sending:
+        click.echo(f"{repository.requeue_sending(url)} interrupted jobs queued again")
+    added = Webinar.from_url(url).enqueue_send_jobs(repository)
+    click.echo(f"{added} jobs enqueued")
+
+
+@cli.command()
+@click.option("--test", is_flag=True, help="Do not send emails, only render certificates.")
+@click.option(
+    "--profile",
+    type=click.Choice(list(PROFILES)),
+    default=DEFAULT_PROFILE,
+    show_default=True,
+    help="Certificate encoding profile.",
+)
+@click.option("--max-jobs", type=click.IntRange(min=1), default=None, help="Stop after N jobs.")
+def worker(test: bool, profile: str, max_jobs: int | None) -> None:
+    if test:
+        email_service = EmailService.with_test_client()
+    else:
+        sender_pool = SenderPool.from_environment(usage=SenderUsageRepository())
+        email_service = EmailService(email_client=RetryingEmailClient(sender_pool))
+    send_job_worker = SendJobWorker(
+        certificate_service=CertificateService.from_profile(profile, cache=CertificateCache()),
+        email_service=email_service,
+    )
+    click.echo(f"Worker {send_job_worker.name} started, it stops when the queue is empty")
+    done = send_job_worker.run(max_jobs=max_jobs)
+    click.echo(f"{done} jobs done")
+
+
+@cli.command()
+@click.argument("url")
+def sync(url: str) -> None:
+    click.echo(f"Mark emails sent by workers and by send in the mailing sheet of {url}")
+    webinar = Webinar.from_url(url, outbox=OutboxRepository())
+    synced = webinar.sync_send_jobs(SendJobRepository()) + webinar.sync_outbox()
+    click.echo(f"{synced} rows marked as sent")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+-- create queue of certificate emails, shared by worker processes
+CREATE TABLE IF NOT EXISTS send_job (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at DATETIME DEFAULT (datetime('now')),
+    url VARCHAR(255) NOT NULL,
+    row_number INTEGER NOT NULL,
+    fio VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    started_at DATE NOT NULL,
+    finished_at DATE NOT NULL,
+    -- pending, leased, done, failed or sending
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_by VARCHAR(255),
+    lease_expires_at REAL,
+    error TEXT,
+    done_at DATETIME,
+    -- done job is written to the mailing sheet
+    synced INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (url, row_number)
+);
+
+CREATE INDEX IF NOT EXISTS send_job_status ON send_job (status, lease_expires_at);
@@ -0,0 +1,18 @@
+-- certificate emails of the send command, so an interrupted run resumes without duplicates
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at DATETIME DEFAULT (datetime('now')),
+    url VARCHAR(255) NOT NULL,
+    fio VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    -- queued, sending or sent
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    message_id VARCHAR(255),
+    error TEXT,
+    sent_at DATETIME,
+    -- sent message is written to the mailing sheet
+    synced INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (url, fio, email)
+);
+
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (url, status, synced);
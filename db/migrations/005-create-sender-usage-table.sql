@@ -0,0 +1,8 @@
+-- emails sent by each sender account, daily quotas are counted from it
+CREATE TABLE IF NOT EXISTS sender_usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account VARCHAR(255) NOT NULL,
+    sent_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS sender_usage_account ON sender_usage (account, sent_at);
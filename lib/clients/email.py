@@ -1,18 +1,65 @@
 from abc import ABCMeta
 from abc import abstractmethod
+from collections import Counter
+from collections import OrderedDict
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
 from dataclasses import field
-from functools import cached_property
+from functools import lru_cache
+from hashlib import sha256
+from io import BytesIO
 from io import IOBase
 from pathlib import Path
+from queue import Empty
+from queue import LifoQueue
+from smtplib import SMTP as SMTPConnection
+from smtplib import SMTPRecipientsRefused
+from smtplib import SMTPResponseException
+from smtplib import SMTPServerDisconnected
+from threading import Lock
+from time import monotonic
+from traceback import walk_tb
 from typing import Any
+from typing import Callable
+from typing import Generator
 from typing import Mapping
 from typing import Sequence
 
 from yagmail import SMTP
 
+from lib.clients.mime import EncodedAttachment
+from lib.clients.mime import MessageTemplate
+from lib.clients.mime import encode_base64
+from lib.environment import env_int_field
 from lib.environment import env_str_field
 from lib.logging import logger
+from lib.resilience import ConnectError
+from lib.resilience import Retry
+from lib.resilience import smtp_retry
+
+
+class Attachment(BytesIO):
+    """In-memory file, attached under `name` the same way as a file on disk.
+
+    Its base64 form is computed once on first use, or can be passed if it
+    is already known, e.g. from a cache.
+    """
+
+    def __init__(self, name: str, content: bytes = b"", base64: str | None = None) -> None:
+        super().__init__(content)
+        self.name = name
+        self.base64 = base64
+
+    def encode(self) -> EncodedAttachment:
+        if self.base64 is None:
+            self.base64 = encode_base64(self.getvalue())
+        return EncodedAttachment.from_base64(self.name, self.base64)
+
+
+@lru_cache(maxsize=16)
+def get_message_template(sender: str, subject: str) -> MessageTemplate:
+    return MessageTemplate(sender=sender, subject=subject)
 
 
 class AbstractEmailClient(metaclass=ABCMeta):
@@ -24,17 +71,240 @@ class AbstractEmailClient(metaclass=ABCMeta):
         subject: str | None = None,
         contents: str | None = None,
         attachments: Sequence[str | IOBase | Path] | None = None,
+        message_id: str | None = None,
     ) -> None: ...  # pragma: no cover
 
+    def close(self) -> None:
+        """Release connections, the client can still be used after that."""
+
+
+def is_before_data(error: BaseException) -> bool:
+    """True if smtplib failed before the DATA command, so the server has not got the message."""
+    return all(
+        frame.f_code is not SMTPConnection.data.__code__
+        for frame, _ in walk_tb(error.__traceback__)
+    )
+
+
+@dataclass(slots=True)
+class SMTPSession:
+    """Logged in SMTP connection that is kept open between messages.
+
+    yagmail logs in again for every `SMTP.send`, so messages are prepared
+    with yagmail and sent through the connection directly. A connection
+    that was idle for `keepalive_seconds` is checked with NOOP before use,
+    a dropped one is opened again. A message is sent again only if the
+    connection was lost before DATA, after it the server may have accepted it.
+    """
+
+    connect: Callable[[], SMTP]  # creates SMTP that is not connected yet
+    stats: Counter[str] = field(default_factory=Counter)
+    keepalive_seconds: float = 60.0
+    _smtp: SMTP | None = None
+    _used_at: float = 0.0
+
+    def _open(self) -> SMTP:
+        smtp = self.connect()
+        try:
+            smtp.login()
+        except SMTPResponseException:
+            raise  # the reply tells if it is worth trying again
+        except OSError as error:
+            raise ConnectError(f"can not connect to {smtp.host}:{smtp.port}: {error!r}") from error
+        self.stats["opened"] += 1
+        logger.debug(f"SMTP connection opened to {smtp.host}:{smtp.port} for {smtp.user}")
+        return smtp
+
+    def _is_alive(self, smtp: SMTP) -> bool:
+        try:
+            code, _ = smtp.smtp.noop()
+        except (SMTPServerDisconnected, OSError):
+            return False
+        self.stats["noops"] += 1
+        return code == 250
+
+    def _reopen(self) -> SMTP:
+        self.stats["reconnects"] += 1
+        self.close()  # the old connection may still hold a socket
+        self._smtp = self._open()
+        return self._smtp
+
+    def _get_smtp(self) -> SMTP:
+        if self._smtp is None:
+            self._smtp = self._open()
+        elif monotonic() - self._used_at > self.keepalive_seconds and not self._is_alive(
+            self._smtp
+        ):
+            self._reopen()
+        self._used_at = monotonic()
+        return self._smtp
+
+    def send(self, **kwargs: Any) -> None:
+        """Build message with yagmail and send it."""
+        recipients, message = self._get_smtp().prepare_send(**kwargs)
+        self.send_message(recipients, message)
+
+    def send_message(self, recipients: Sequence[str], message: str) -> None:
+        smtp = self._get_smtp()
+        try:
+            smtp.smtp.sendmail(smtp.user, recipients, message)
+        except (SMTPResponseException, SMTPRecipientsRefused):
+            if smtp.smtp.sock is None:  # smtplib closes the connection after 421
+                self.close()
+            raise
+        except SMTPServerDisconnected as error:
+            if not is_before_data(error):  # the message may be accepted, it is not sent again
+                self.stats["dropped"] += 1
+                self.close()
+                raise
+            logger.warning(f"SMTP connection for {smtp.user} was closed by server, reconnecting")
+            smtp = self._reopen()
+            smtp.smtp.sendmail(smtp.user, recipients, message)
+        except OSError:
+            logger.warning(f"SMTP connection for {smtp.user} failed, next message reconnects")
+            self.stats["dropped"] += 1
+            self.close()
+            raise
+        self.stats["sent"] += 1
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            self._smtp.close()
+            self._smtp = None
+
+
+@dataclass(slots=True)
+class SMTPSessionPool:
+    """At most `size` sessions, each one is used by one thread at a time."""
+
+    connect: Callable[[], SMTP]
+    size: int = 1
+    stats: Counter[str] = field(default_factory=Counter)
+    _idle: LifoQueue[SMTPSession] = field(default_factory=LifoQueue)
+    _created: int = 0
+    _lock: Lock = field(default_factory=Lock)
+
+    def _create(self) -> SMTPSession | None:
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        return SMTPSession(connect=self.connect, stats=self.stats)
+
+    @contextmanager
+    def session(self) -> Generator[SMTPSession, None, None]:
+        session = self._create() if self._idle.empty() else None
+        if session is None:
+            # most recently used session goes first, it is the least likely to be dropped
+            session = self._idle.get()
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def close(self) -> None:
+        """Close idle sessions, sessions in use go back to the pool and stay counted."""
+        closed = 0
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except Empty:
+                break
+            session.close()
+            closed += 1
+        with self._lock:
+            self._created -= closed
+
+
+@dataclass(slots=True, frozen=True)
+class SMTPClient(AbstractEmailClient):
+    """Any SMTP server, e.g. a local `SMTPSink` for load tests."""
+
+    user: str = env_str_field("SMTP_USER", "webinar@localhost")
+    password: str = env_str_field("SMTP_PASSWORD", "")
+    host: str = env_str_field("SMTP_HOST", "localhost")
+    port: int = env_int_field("SMTP_PORT", 8025)
+    ssl: bool = False
+    starttls: bool = False
+    connections: int = 1
+    pool: SMTPSessionPool = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        pool = SMTPSessionPool(connect=self.create_smtp, size=self.connections)
+        object.__setattr__(self, "pool", pool)
+
+    def create_smtp(self) -> SMTP:
+        return SMTP(
+            user=self.user,
+            password=self.password,
+            host=self.host,
+            port=self.port,
+            smtp_ssl=self.ssl,
+            smtp_starttls=self.starttls,
+        )
+
+    @property
+    def stats(self) -> Counter[str]:
+        return self.pool.stats
+
+    def send(
+        self,
+        to: str,
+        bcc: Sequence[str] | None = None,
+        subject: str | None = None,
+        contents: str | None = None,
+        attachments: Sequence[str | IOBase | Path] | None = None,
+        message_id: str | None = None,
+    ) -> None:
+        logger.debug(f"Sending mail to {to}")
+        attachments = attachments or []
+        encoded = [item.encode() for item in attachments if isinstance(item, Attachment)]
+        if len(encoded) == len(attachments):
+            template = get_message_template(self.user, subject or "")
+            message = template.render(
+                to=to,
+                contents=contents or "",
+                attachments=encoded,
+                message_id=message_id,
+            )
+            with self.pool.session() as session:
+                session.send_message([to, *(bcc or [])], message)
+        else:  # files on disk are attached by yagmail
+            with self.pool.session() as session:
+                session.send(
+                    to=to,
+                    bcc=bcc,
+                    subject=subject,
+                    contents=contents,
+                    attachments=attachments,
+                    message_id=message_id,
+                )
+        logger.debug(f"Sending mail to {to} done")
+
+    def close(self) -> None:
+        self.pool.close()
+        logger.info(f"SMTP stats for {self.user}: {dict(self.stats)}")
+
 
 @dataclass(slots=True, frozen=True)
-class GMailClient(AbstractEmailClient):
+class GMailClient(SMTPClient):
     user: str = env_str_field("GMAILACCOUNT")
     password: str = env_str_field("GMAILAPPLICATIONPASSWORD")
+    host: str = "smtp.gmail.com"
+    port: int = 465
+    ssl: bool = True
+
+
+@dataclass(frozen=True, slots=True)
+class RetryingEmailClient(AbstractEmailClient):
+    """Sends through `client` again after transient SMTP errors, see `Retry`.
 
-    @cached_property
-    def smtp(self) -> SMTP:
-        return SMTP(user=self.user, password=self.password)
+    Share one instance between threads, so that its circuit breaker pauses
+    all of them when the server keeps failing.
+    """
+
+    client: AbstractEmailClient
+    retry: Retry = field(default_factory=smtp_retry)
 
     def send(
         self,
@@ -43,21 +313,70 @@ class GMailClient(AbstractEmailClient):
         subject: str | None = None,
         contents: str | None = None,
         attachments: Sequence[str | IOBase | Path] | None = None,
+        message_id: str | None = None,
     ) -> None:
-        logger.debug(f"Sending mail to {to}")
-        self.smtp.send(
+        self.retry.call(
+            self.client.send,
             to=to,
             bcc=bcc,
             subject=subject,
             contents=contents,
             attachments=attachments,
+            message_id=message_id,
         )
-        logger.debug(f"Sending mail to {to} done")
+
+    def close(self) -> None:
+        self.client.close()
+        logger.info(f"SMTP retry stats: {self.retry.get_stats()}")
+
+
+@dataclass(frozen=True, slots=True)
+class AttachmentDigest:
+    """Name, size and hash of an attachment, kept instead of its content."""
+
+    name: str
+    size: int
+    sha256: str
+
+    @classmethod
+    def from_attachment(cls, attachment: str | IOBase | Path) -> "AttachmentDigest":
+        if isinstance(attachment, BytesIO):
+            content = attachment.getvalue()
+            name = str(getattr(attachment, "name", ""))
+        elif isinstance(attachment, (str, Path)) and Path(attachment).is_file():
+            content = Path(attachment).read_bytes()
+            name = Path(attachment).name
+        else:  # not a file, nothing to read
+            content = b""
+            name = str(getattr(attachment, "name", attachment))
+        return cls(name=name, size=len(content), sha256=sha256(content).hexdigest())
+
+
+AttachmentT = str | IOBase | Path | AttachmentDigest
 
 
 @dataclass(frozen=True, slots=True)
 class TestEmailClient(AbstractEmailClient):
-    _call_args: list[Mapping[str, Any]] = field(default_factory=list)
+    """Keeps emails instead of sending them, lookups by recipient take constant time.
+
+    For dry runs of large rosters, keep only digests of attachments and
+    set `max_calls`: the last `max_calls` emails and attachments of as many
+    recipients are kept, then only the sent counts grow with the roster.
+    """
+
+    keep_attachments: bool = True
+    max_calls: int | None = None
+    _call_args: deque[Mapping[str, Any]] = field(init=False, repr=False)
+    _sent_count: Counter[str] = field(default_factory=Counter, repr=False)
+    _attachments: OrderedDict[str, list[AttachmentT]] = field(
+        default_factory=OrderedDict,
+        repr=False,
+    )
+    _lock: Lock = field(default_factory=Lock, repr=False)
+    stats: Counter[str] = field(default_factory=Counter)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_call_args", deque(maxlen=self.max_calls))
 
     def send(
         self,
@@ -66,30 +385,48 @@ class TestEmailClient(AbstractEmailClient):
         subject: str | None = None,
         contents: str | None = None,
         attachments: Sequence[str | IOBase | Path] | None = None,
+        message_id: str | None = None,
     ) -> None:
+        kept: list[AttachmentT] = list(attachments or [])
+        if not self.keep_attachments:
+            kept = [AttachmentDigest.from_attachment(item) for item in attachments or []]
         args = {
             "to": to,
             "bcc": bcc,
             "subject": subject,
             "contents": contents,
-            "attachments": attachments,
+            "attachments": kept,
+            "message_id": message_id,
         }
-        self._call_args.append(args)
+        with self._lock:
+            self._call_args.append(args)
+            self._sent_count[to] += 1
+            self._attachments.setdefault(to, []).extend(kept)
+            self._attachments.move_to_end(to)
+            if self.max_calls is not None and len(self._attachments) > self.max_calls:
+                self._attachments.popitem(last=False)
+            self.stats["sent"] += 1
         logger.debug("TestEmailClient.send: {args}", args=args)
 
     def is_sent_to(self, to: str) -> bool:
-        return to in {call["to"] for call in self._call_args}
+        return to in self._sent_count
 
     def sent_count(self, to: str) -> int:
-        return len([call for call in self._call_args if call["to"] == to])
+        return self._sent_count[to]
+
+    def get_attachments(self, to: str) -> list[AttachmentT]:
+        return list(self._attachments.get(to, []))
 
-    def get_attachments(self, to: str) -> list[str]:
-        attachments = []
-        for call in self._call_args:
-            if call["to"] == to:
-                attachments.extend(call["attachments"])
-        return attachments
+    def get_calls(self, to: str | None = None) -> list[Mapping[str, Any]]:
+        """Arguments of the kept emails in the order they were sent, only to `to` if it is set."""
+        with self._lock:
+            return [args for args in self._call_args if to is None or args["to"] == to]
 
     @property
     def total_send_count(self) -> int:
-        return len(self._call_args)
+        return self.stats["sent"]
+
+    def close(self) -> None:
+        logger.info(
+            f"test client: {self.total_send_count} emails to {len(self._sent_count)} recipients"
+        )
@@ -0,0 +1,118 @@
+from base64 import encodebytes
+from dataclasses import dataclass
+from dataclasses import field
+from email.header import Header
+from email.utils import formataddr
+from email.utils import formatdate
+from email.utils import make_msgid
+from html import escape
+from mimetypes import guess_type
+from secrets import token_hex
+from typing import Sequence
+from urllib.parse import quote
+
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+
+def encode_base64(content: bytes) -> str:
+    """Base64 in 76 character lines, as in MIME parts."""
+    return encodebytes(content).decode("ascii")
+
+
+def _get_boundary() -> str:
+    # "=" and "_" never start a line of base64, so the boundary can not appear in parts
+    return f"=_{token_hex(16)}_="
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedAttachment:
+    name: str
+    base64: str
+    content_type: str = DEFAULT_CONTENT_TYPE
+
+    @classmethod
+    def from_base64(cls, name: str, base64: str) -> "EncodedAttachment":
+        content_type, _ = guess_type(name)
+        return cls(name, base64, content_type or DEFAULT_CONTENT_TYPE)
+
+    @classmethod
+    def from_bytes(cls, name: str, content: bytes) -> "EncodedAttachment":
+        return cls.from_base64(name, encode_base64(content))
+
+    def to_part(self) -> str:
+        name = quote(self.name)
+        return (
+            f"Content-Type: {self.content_type}; name*=utf-8''{name}\n"
+            f"Content-Transfer-Encoding: base64\n"
+            f"Content-Disposition: attachment; filename*=utf-8''{name}\n"
+            f"\n"
+            f"{self.base64}"
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class MessageTemplate:
+    """Headers and MIME structure that are the same for every email with this subject.
+
+    Only recipient, body and attachments are added for each message, so
+    the message is not built and flattened by the email package every time.
+    """
+
+    sender: str
+    subject: str
+    _headers: str = field(init=False, repr=False)
+    _boundary: str = field(init=False, repr=False)
+    _body_boundary: str = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        headers = (
+            f"MIME-Version: 1.0\n"
+            f"Subject: {Header(self.subject, 'utf-8').encode()}\n"
+            f"From: {formataddr((self.sender, self.sender))}\n"
+        )
+        object.__setattr__(self, "_headers", headers)
+        object.__setattr__(self, "_boundary", _get_boundary())
+        object.__setattr__(self, "_body_boundary", _get_boundary())
+
+    def _get_body(self, contents: str) -> str:
+        html = escape(contents).replace("\n", "<br>")
+        html = f"<html><head></head><body><div>{html}</div></body></html>"
+        return (
+            f'Content-Type: multipart/alternative; boundary="{self._body_boundary}"\n'
+            f"\n"
+            f"--{self._body_boundary}\n"
+            f'Content-Type: text/plain; charset="utf-8"\n'
+            f"Content-Transfer-Encoding: base64\n"
+            f"\n"
+            f"{encode_base64(contents.encode('utf-8'))}"
+            f"--{self._body_boundary}\n"
+            f'Content-Type: text/html; charset="utf-8"\n'
+            f"Content-Transfer-Encoding: base64\n"
+            f"\n"
+            f"{encode_base64(html.encode('utf-8'))}"
+            f"--{self._body_boundary}--\n"
+        )
+
+    def render(
+        self,
+        to: str,
+        contents: str,
+        attachments: Sequence[EncodedAttachment] = (),
+        message_id: str | None = None,
+    ) -> str:
+        if message_id is None:
+            message_id = make_msgid(domain=self.sender.rpartition("@")[2] or None)
+        parts = [self._get_body(contents), *(attachment.to_part() for attachment in attachments)]
+        delimiter = f"--{self._boundary}\n"
+        return "".join(
+            [
+                f'Content-Type: multipart/mixed; boundary="{self._boundary}"\n',
+                self._headers,
+                f"Date: {formatdate(localtime=True)}\n",
+                f"To: {to}\n",
+                f"Message-ID: {message_id}\n",
+                "\n",
+                *(delimiter + part for part in parts),
+                f"--{self._boundary}--\n",
+            ]
+        )
@@ -0,0 +1,213 @@
+"""Local SMTP server that accepts and drops messages, for load tests of the email path.
+
+python -m lib.clients.smtp_sink --port 8025 --latency 0.2 --fail-every 100
+"""
+
+from collections import Counter
+from collections import deque
+from dataclasses import dataclass
+from socketserver import StreamRequestHandler
+from socketserver import ThreadingTCPServer
+from threading import Lock
+from threading import Thread
+from time import sleep
+from typing import Any
+
+import click
+
+from lib.rate_limit import TokenBucket
+
+HOSTNAME = "localhost"
+MAX_MESSAGE_SIZE = 35 * 1024**2
+
+
+@dataclass(frozen=True, slots=True)
+class SinkBehaviour:
+    latency: float = 0.0  # seconds before the answer to DATA
+    messages_per_second: float | None = None  # answers are delayed to keep this rate
+    fail_every: int = 0  # every n-th message is rejected with `error_code`
+    error_code: int = 451  # 4xx is temporary, 5xx is permanent
+    drop_every: int = 0  # connection is closed after every n-th message
+
+
+class SinkHandler(StreamRequestHandler):
+    server: "SMTPSink"
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def read_line(self) -> str | None:
+        line = self.rfile.readline(MAX_MESSAGE_SIZE)
+        return None if not line else line.decode("utf-8", "replace").rstrip("\r\n")
+
+    def read_data(self) -> int:
+        size = 0
+        lines = []
+        while (line := self.rfile.readline(MAX_MESSAGE_SIZE)) not in (b".\r\n", b".\n", b""):
+            size += len(line)
+            if self.server.keep_messages:
+                lines.append(line[1:] if line.startswith(b"..") else line)
+        if lines:
+            self.server.add_message(b"".join(lines))
+        return size
+
+    def handle(self) -> None:
+        self.server.count("connections")
+        self.reply(f"220 {HOSTNAME} SMTP sink")
+        while (line := self.read_line()) is not None:
+            command, _, argument = line.partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self.reply(f"250-{HOSTNAME}")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250-8BITMIME")
+                self.reply(f"250 SIZE {MAX_MESSAGE_SIZE}")
+            elif command == "HELO":
+                self.reply(f"250 {HOSTNAME}")
+            elif command == "AUTH":
+                self.authenticate(argument)
+            elif command in ("MAIL", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "RCPT":
+                self.server.count("recipients")
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = self.read_data()
+                code, message = self.server.accept(size)
+                self.reply(f"{code} {message}")
+                if self.server.should_drop():
+                    return
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def authenticate(self, argument: str) -> None:
+        mechanism, _, initial = argument.partition(" ")
+        if mechanism.upper() == "LOGIN":
+            if not initial:
+                self.reply("334 VXNlcm5hbWU6")
+                self.read_line()
+            self.reply("334 UGFzc3dvcmQ6")
+            self.read_line()
+        elif not initial:
+            self.reply("334 ")
+            self.read_line()
+        self.server.count("logins")
+        self.reply("235 Authentication successful")
+
+
+class SMTPSink(ThreadingTCPServer):
+    """Counts connections, messages and bytes, any credentials are accepted.
+
+    Use port 0 to get a free port, it is in `port` after creation.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        behaviour: SinkBehaviour | None = None,
+        keep_messages: int = 0,
+    ) -> None:
+        super().__init__((host, port), SinkHandler)
+        self.behaviour = behaviour or SinkBehaviour()
+        self.stats: Counter[str] = Counter()
+        self.messages: deque[bytes] = deque(maxlen=keep_messages or None)
+        self.keep_messages = keep_messages
+        self._lock = Lock()
+        self._rate_limit = (
+            None
+            if self.behaviour.messages_per_second is None
+            else TokenBucket(rate=self.behaviour.messages_per_second)
+        )
+        self._thread: Thread | None = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def add_message(self, message: bytes) -> None:
+        with self._lock:
+            self.messages.append(message)
+
+    def accept(self, size: int) -> tuple[int, str]:
+        if self.behaviour.latency:
+            sleep(self.behaviour.latency)
+        if self._rate_limit is not None:
+            self._rate_limit.acquire()
+        with self._lock:
+            self.stats["messages"] += 1
+            number = self.stats["messages"]
+            fail_every = self.behaviour.fail_every
+            if fail_every and number % fail_every == 0:
+                self.stats["rejected"] += 1
+                return self.behaviour.error_code, "Message rejected by sink"
+            self.stats["bytes"] += size
+        return 250, "OK"
+
+    def should_drop(self) -> bool:
+        drop_every = self.behaviour.drop_every
+        with self._lock:
+            if drop_every and self.stats["messages"] % drop_every == 0:
+                self.stats["dropped"] += 1
+                return True
+        return False
+
+    def start(self) -> "SMTPSink":
+        self._thread = Thread(target=self.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "SMTPSink":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", type=int, default=8025, show_default=True)
+@click.option("--latency", type=float, default=0.0, show_default=True)
+@click.option("--messages-per-second", type=float, default=None)
+@click.option("--fail-every", type=int, default=0, show_default=True)
+@click.option("--error-code", type=int, default=451, show_default=True)
+@click.option("--drop-every", type=int, default=0, show_default=True)
+def main(
+    host: str,
+    port: int,
+    latency: float,
+    messages_per_second: float | None,
+    fail_every: int,
+    error_code: int,
+    drop_every: int,
+) -> None:
+    behaviour = SinkBehaviour(latency, messages_per_second, fail_every, error_code, drop_every)
+    with SMTPSink(host, port, behaviour) as sink:
+        click.echo(f"SMTP sink listening on {host}:{sink.port}, Ctrl+C to stop")
+        try:
+            while True:
+                sleep(10)
+                click.echo(dict(sink.stats))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
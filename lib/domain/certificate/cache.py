@@ -0,0 +1,118 @@
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from functools import lru_cache
+from hashlib import sha256
+from os import utime
+from pathlib import Path
+from tempfile import mkstemp
+
+from lib.environment import env_int_field
+from lib.environment import env_str_field
+from lib.logging import logger
+from lib.paths import CACHE_PATH
+
+DEFAULT_MAX_SIZE = 2 * 1024**3
+EVICT_TO_RATIO = 0.9
+
+
+@lru_cache(maxsize=16)
+def _file_digest(path: Path, mtime_ns: int, size: int) -> str:  # pylint: disable=unused-argument
+    return sha256(path.read_bytes()).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """Digest of the file content, recalculated only if the file was changed."""
+    stat = path.stat()
+    return _file_digest(path, stat.st_mtime_ns, stat.st_size)
+
+
+@dataclass(frozen=True, slots=True)
+class CertificateCache:
+    """Rendered certificates on disk, addressed by a hash of everything they depend on.
+
+    Least recently used entries are removed when the cache grows over
+    `max_size` bytes. Reading an entry updates its mtime, which is used as
+    the last access time.
+    """
+
+    path: str | Path = env_str_field("CERTIFICATE_CACHE_PATH", str(CACHE_PATH / "certificates"))
+    max_size: int = env_int_field("CERTIFICATE_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE)
+    stats: Counter[str] = field(default_factory=Counter, compare=False, repr=False)
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        digest = sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _get_path(self, key: str) -> Path:
+        return Path(self.path) / key[:2] / key
+
+    def contains(self, key: str) -> bool:
+        return self._get_path(key).exists()
+
+    def get(self, key: str) -> bytes | None:
+        path = self._get_path(key)
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            self.stats["misses"] += 1
+            logger.debug(f"certificate cache miss {key}")
+            return None
+        utime(path)
+        self.stats["hits"] += 1
+        logger.debug(f"certificate cache hit {key}")
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        path = self._get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # others may read or write the same entry, so it appears atomically from a unique file
+        fd, temp_name = mkstemp(dir=path.parent, prefix=f"{key}.", suffix=".tmp")
+        with open(fd, "wb") as file:
+            file.write(content)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        Path(temp_name).replace(path)
+        self.stats["writes"] += 1
+        self._add_size(len(content) - replaced)
+
+    def _get_entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in Path(self.path).glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _add_size(self, added: int) -> None:
+        if "size" not in self.stats:  # first write, includes the added entry
+            self.stats["size"] = sum(size for _, size, _ in self._get_entries())
+        else:
+            self.stats["size"] += added
+        if self.stats["size"] > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        entries = sorted(self._get_entries())
+        size = sum(size for _, size, _ in entries)
+        target_size = self.max_size * EVICT_TO_RATIO
+        evicted = 0
+        for _, entry_size, path in entries:
+            if size <= target_size:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+            evicted += 1
+        self.stats["size"] = size
+        self.stats["evictions"] += evicted
+        logger.info(f"certificate cache: evicted {evicted} entries, {size} bytes left")
@@ -36,6 +36,13 @@ class Certificate:
             WebinarTitle.TEST: "Тестовый вебинар",
         }[self.title]
 
+    @property
+    def filename(self) -> str:
+        return f"certificate.{self.serializer.extension}"
+
+    def get_texts(self) -> tuple[str, str, str]:
+        return self._get_webinar_title_text(), self.name, self._get_date_text()
+
     def write(self, buffer: IO[bytes]) -> None:
         self.serializer.serialize(
             buffer=buffer,
@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import IO
+from typing import Iterable
+from typing import Iterator
+
+from PIL.Image import Image
+from PIL.Image import new as _new_image
+from PIL.Image import open as _open_image
+from PIL.ImageDraw import Draw
+
+from .serializer.image_serializer import BLACK
+from .serializer.image_serializer import FONT
+from .serializer.image_serializer import get_font
+
+WHITE = (255, 255, 255)
+GREY = (200, 200, 200)
+ELLIPSIS = "…"
+TileT = tuple[str, bytes]  # name, encoded thumbnail
+
+
+@dataclass(frozen=True, slots=True)
+class ProofSheet:
+    """Certificate thumbnails tiled into pages with the name under each one.
+
+    Pages are filled as thumbnails arrive and written as soon as they are
+    full, so only one page is kept in memory whatever the roster size is.
+    """
+
+    columns: int = 4
+    rows: int = 3
+    margin: int = 24
+    label_size: int = 20
+    dpi: int = 150
+    quality: int = 75  # pages are embedded into PDF as JPEG
+
+    def _fit_label(self, name: str, max_width: int) -> str:
+        font = get_font(FONT, self.label_size)
+        if font.getlength(name) <= max_width:
+            return name
+        while name and font.getlength(name + ELLIPSIS) > max_width:
+            name = name[:-1]
+        return name + ELLIPSIS
+
+    def _new_page(self, tile_size: tuple[int, int]) -> Image:
+        tile_width, tile_height = tile_size
+        width = self.columns * (tile_width + self.margin) + self.margin
+        height = self.rows * (tile_height + self.label_size * 2 + self.margin) + self.margin
+        return _new_image("RGB", (width, height), WHITE)
+
+    def get_pages(self, tiles: Iterable[TileT]) -> Iterator[Image]:
+        """Yield pages one by one as they are filled, the last one may be partial.
+
+        Tile size is taken from the first thumbnail, others are resized to it.
+        """
+        per_page = self.columns * self.rows
+        label_height = self.label_size * 2
+        font = get_font(FONT, self.label_size)
+        page: Image | None = None
+        tile_size = (0, 0)
+        index = 0
+        for name, content in tiles:
+            thumbnail = _open_image(BytesIO(content)).convert("RGB")
+            if page is None:
+                tile_size = thumbnail.size
+                page = self._new_page(tile_size)
+            if thumbnail.size != tile_size:
+                thumbnail = thumbnail.resize(tile_size)
+            tile_width, tile_height = tile_size
+            column, row = index % self.columns, index // self.columns
+            x = self.margin + column * (tile_width + self.margin)
+            y = self.margin + row * (tile_height + label_height + self.margin)
+            page.paste(thumbnail, (x, y))
+            draw = Draw(page)
+            draw.rectangle((x - 1, y - 1, x + tile_width, y + tile_height), outline=GREY)
+            draw.text(
+                xy=(x + tile_width // 2, y + tile_height + label_height // 2),
+                text=self._fit_label(name, tile_width),
+                font=font,
+                fill=BLACK,
+                anchor="mm",
+            )
+            index += 1
+            if index == per_page:
+                yield page
+                page = self._new_page(tile_size)
+                index = 0
+        if page is not None and index:
+            yield page
+
+    def write_pdf(self, target: Path | IO[bytes], tiles: Iterable[TileT]) -> int:
+        """Write pages into one PDF file or buffer, every page is appended to it on its own."""
+        if isinstance(target, Path):
+            with open(target, "w+b") as fd:
+                return self.write_pdf(fd, tiles)
+        pages = 0
+        for page in self.get_pages(tiles):
+            page.save(
+                target,
+                format="pdf",
+                resolution=self.dpi,
+                quality=self.quality,
+                append=pages > 0,
+            )
+            pages += 1
+        return pages
+
+    def write_images(self, directory: Path, tiles: Iterable[TileT]) -> list[Path]:
+        """Write pages as PNG files into `directory`, returns their paths."""
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for i, page in enumerate(self.get_pages(tiles)):
+            path = directory / f"proof-{i + 1:03d}.png"
+            page.save(path, format="png", compress_level=1)
+            paths.append(path)
+        return paths
@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import IO
+
+from ..cache import CertificateCache
+from ..cache import file_digest
+from .protocol import Serializable
+
+
+@dataclass(frozen=True, slots=True)
+class CachedSerializer:
+    """Serializer that takes certificates from the cache and renders only missing ones."""
+
+    serializer: Serializable
+    cache: CertificateCache
+
+    @property
+    def extension(self) -> str:
+        return self.serializer.extension
+
+    def get_key(self, title: str, name: str, date_text: str) -> str:
+        # serializer repr contains all of its settings, template is hashed by content
+        template = getattr(self.serializer, "template", None)
+        template_digest = file_digest(template) if isinstance(template, Path) else ""
+        return self.cache.key(repr(self.serializer), template_digest, title, name, date_text)
+
+    def serialize(
+        self,
+        buffer: IO[bytes],
+        title: str,
+        name: str,
+        date_text: str,
+    ) -> None:
+        key = self.get_key(title, name, date_text)
+        if (content := self.cache.get(key)) is None:
+            rendered = BytesIO()
+            self.serializer.serialize(rendered, title=title, name=name, date_text=date_text)
+            content = rendered.getvalue()
+            self.cache.put(key, content)
+        buffer.write(content)
@@ -0,0 +1,229 @@
+from abc import ABCMeta
+from abc import abstractmethod
+from dataclasses import dataclass
+from dataclasses import field
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from threading import Lock
+from typing import IO
+from typing import ClassVar
+from typing import Sequence
+
+from PIL.Image import Image
+from PIL.Image import Resampling
+from PIL.Image import open as _open_image
+from PIL.ImageDraw import Draw
+from PIL.ImageFont import FreeTypeFont
+from PIL.ImageFont import truetype
+
+from .paths import get_png_template_path
+from .template_cache import get_template_cache_path
+from .template_cache import map_template
+
+BLACK = (0, 0, 0)
+FONT = "Arial"
+FONT_CACHE_SIZE = 64
+BASE_IMAGE_CACHE_SIZE = 8
+# layout in pixels of the template
+SMALL_FONT_SIZE = 82
+LARGE_FONT_SIZE = 137
+MIN_NAME_FONT_SIZE = 100
+MAX_NAME_FONT_SIZE = 150
+MAX_REL_NAME_WIDTH = 0.81
+SPACING = 18
+CONFIRMS_Y = 1650
+NAME_Y = 1900
+PASSED_Y = 2160
+TITLE_Y = 2540
+DATE_XY = (270, 3100)
+CONFIRMS_TEXT = "подтверждает, что"
+PASSED_TEXT = "прошла практическую\nи теоретическую части вебинара"
+
+_base_image_lock = Lock()
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_font(face: str, size: int) -> FreeTypeFont:
+    return truetype(font=face, size=size)
+
+
+def fit_font_size(
+    face: str,
+    text: str,
+    max_width: float,
+    min_size: int = MIN_NAME_FONT_SIZE,
+    max_size: int = MAX_NAME_FONT_SIZE,
+) -> int:
+    # first size that does not fit, or the largest one if all of them fit
+    low, high = min_size, max_size - 1
+    while low < high:
+        middle = (low + high) // 2
+        if get_font(face, middle).getlength(text) > max_width:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+@dataclass(frozen=True, slots=True)
+class OutputTarget:
+    encoder: "CertificateImageSerializer"  # only its encode() is used
+    width: int | None = None  # None keeps the rendered size
+
+
+@dataclass(frozen=True, slots=True)
+class CertificateImageSerializer(metaclass=ABCMeta):
+    """Draws certificate on the template, subclasses encode it to a file format."""
+
+    extension: ClassVar[str]
+    template: Path = field(default_factory=get_png_template_path)
+    # less than 1 renders a downscaled preview, layout stays the same
+    scale: float = 1.0
+    # decoded template is kept here, None to decode it every time
+    template_cache: Path | None = field(default_factory=get_template_cache_path)
+
+    def _px(self, value: float) -> int:
+        return round(value * self.scale)
+
+    def _get_font(self, size: int) -> FreeTypeFont:
+        return get_font(FONT, self._px(size))
+
+    def _get_small_font(self) -> FreeTypeFont:
+        return self._get_font(size=SMALL_FONT_SIZE)
+
+    def _get_large_font(self) -> FreeTypeFont:
+        return self._get_font(size=LARGE_FONT_SIZE)
+
+    def _get_name_font(
+        self,
+        image: Image,
+        name: str,
+    ) -> FreeTypeFont:
+        image_width, _ = image.size
+        max_text_width = image_width * MAX_REL_NAME_WIDTH
+        size = fit_font_size(
+            FONT,
+            name,
+            max_text_width,
+            min_size=self._px(MIN_NAME_FONT_SIZE),
+            max_size=self._px(MAX_NAME_FONT_SIZE),
+        )
+        return get_font(FONT, size)
+
+    def load_template(self) -> Image:
+        if self.template_cache is None:
+            image: Image = _open_image(self.template)
+            image.load()
+            return image
+        return map_template(self.template, self.template_cache)
+
+    def get_base_image(self, title: str, date_text: str) -> Image:
+        """Template with all the text that is the same for every participant.
+
+        The result is cached and shared between calls, so it must be copied
+        before drawing on it. Render threads wait for the one that draws it.
+        """
+        with _base_image_lock:
+            return self._get_base_image(title, date_text)
+
+    @lru_cache(maxsize=BASE_IMAGE_CACHE_SIZE)
+    def _get_base_image(self, title: str, date_text: str) -> Image:
+        image = self.load_template()
+        if self.scale != 1:
+            size = (self._px(image.width), self._px(image.height))
+            image = image.resize(size, resample=Resampling.BILINEAR, reducing_gap=2.0)
+        center = image.width // 2
+        small_font = self._get_small_font()
+        large_font = self._get_large_font()
+        spacing = self._px(SPACING)
+        date_x, date_y = DATE_XY
+        draw = Draw(image)
+        draw.text(
+            xy=(center, self._px(CONFIRMS_Y)),
+            text=CONFIRMS_TEXT,
+            font=small_font,
+            fill=BLACK,
+            anchor="ms",
+        )
+        draw.multiline_text(
+            xy=(center, self._px(PASSED_Y)),
+            text=PASSED_TEXT,
+            align="center",
+            font=small_font,
+            spacing=spacing,
+            anchor="mm",
+            fill=BLACK,
+        )
+        draw.multiline_text(
+            xy=(center, self._px(TITLE_Y)),
+            text=f"«{title}»",
+            align="center",
+            font=large_font,
+            spacing=spacing,
+            anchor="mm",
+            fill=BLACK,
+        )
+        draw.multiline_text(
+            xy=(self._px(date_x), self._px(date_y)),
+            text=date_text,
+            align="left",
+            font=small_font,
+            anchor="lm",
+            spacing=spacing,
+            fill=BLACK,
+        )
+        return image
+
+    def get_image(self, title: str, name: str, date_text: str) -> Image:
+        image = self.get_base_image(title, date_text).copy()
+        center = image.width // 2
+        name_font = self._get_name_font(image, name)
+        draw = Draw(image)
+        draw.text(
+            xy=(center, self._px(NAME_Y)),
+            text=name,
+            font=name_font,
+            fill=BLACK,
+            anchor="ms",
+        )
+        return image
+
+    def serialize(
+        self,
+        buffer: IO[bytes],
+        title: str,
+        name: str,
+        date_text: str,
+    ) -> None:
+        image = self.get_image(title, name, date_text)
+        self.encode(image, buffer)
+
+    def serialize_targets(
+        self,
+        title: str,
+        name: str,
+        date_text: str,
+        targets: Sequence[OutputTarget],
+    ) -> list[bytes]:
+        """Draw certificate once and encode it for every target, in the order of targets.
+
+        Targets are produced from the largest to the smallest one, every
+        image is downscaled from the previous one. Targets wider than the
+        rendered image get the rendered size.
+        """
+        image = self.get_image(title, name, date_text)
+        full_width, full_height = image.size
+        widths = [min(target.width or full_width, full_width) for target in targets]
+        results = [b""] * len(targets)
+        for i in sorted(range(len(targets)), key=lambda i: widths[i], reverse=True):
+            if widths[i] < image.width:
+                height = round(full_height * widths[i] / full_width)
+                image = image.resize((widths[i], height), Resampling.LANCZOS, reducing_gap=3.0)
+            buffer = BytesIO()
+            targets[i].encoder.encode(image, buffer)
+            results[i] = buffer.getvalue()
+        return results
+
+    @abstractmethod
+    def encode(self, image: Image, buffer: IO[bytes]) -> None: ...  # pragma: no cover
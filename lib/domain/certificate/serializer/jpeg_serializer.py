@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+from typing import IO
+from typing import ClassVar
+
+from PIL.Image import Image
+
+from .image_serializer import CertificateImageSerializer
+
+
+@dataclass(frozen=True, slots=True)
+class CertificateJPEGSerializer(CertificateImageSerializer):
+    extension: ClassVar[str] = "jpeg"
+    quality: int = 85
+    optimize: bool = True
+
+    def encode(self, image: Image, buffer: IO[bytes]) -> None:
+        image.save(buffer, format="jpeg", quality=self.quality, optimize=self.optimize)
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+from dataclasses import field
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import IO
+from typing import ClassVar
+from typing import Iterable
+
+from fpdf import FPDF
+from PIL.Image import open as _open_image
+
+from .image_serializer import CONFIRMS_TEXT
+from .image_serializer import CONFIRMS_Y
+from .image_serializer import DATE_XY
+from .image_serializer import FONT
+from .image_serializer import LARGE_FONT_SIZE
+from .image_serializer import MAX_REL_NAME_WIDTH
+from .image_serializer import NAME_Y
+from .image_serializer import PASSED_TEXT
+from .image_serializer import PASSED_Y
+from .image_serializer import SMALL_FONT_SIZE
+from .image_serializer import SPACING
+from .image_serializer import TITLE_Y
+from .image_serializer import fit_font_size
+from .image_serializer import get_font
+from .paths import get_png_template_path
+
+PageT = tuple[str, str, str]  # title, name, date_text
+
+
+@dataclass(frozen=True, slots=True)
+class CertificatePDFSerializer:
+    """Template embedded as a JPEG image with text on top of it as real text.
+
+    Layout is the same as in image serializers: coordinates and font sizes
+    are in template pixels and converted to points using `dpi`.
+    """
+
+    extension: ClassVar[str] = "pdf"
+    template: Path = field(default_factory=get_png_template_path)
+    dpi: int = 330  # template is A4 at 330 dpi
+    quality: int = 85
+    # text is vector, so the background image can have lower resolution
+    template_reduce: int = 2
+
+    @lru_cache(maxsize=1)
+    def _get_template(self) -> tuple[bytes, int, int]:
+        """Template as JPEG, fpdf embeds JPEG data without re-encoding it."""
+        image = _open_image(self.template).convert("RGB")
+        width, height = image.size
+        if self.template_reduce > 1:
+            image = image.reduce(self.template_reduce)
+        buffer = BytesIO()
+        image.save(buffer, format="jpeg", quality=self.quality, optimize=True)
+        return buffer.getvalue(), width, height
+
+    def _pt(self, pixels: float) -> float:
+        return pixels * 72 / self.dpi
+
+    def _create_document(self) -> FPDF:
+        _, width, height = self._get_template()
+        document = FPDF(unit="pt", format=(self._pt(width), self._pt(height)))
+        document.set_auto_page_break(False)
+        document.set_margin(0)
+        document.add_font(FONT, fname=str(get_font(FONT, SMALL_FONT_SIZE).path))
+        return document
+
+    def _text(
+        self,
+        document: FPDF,
+        text: str,
+        xy: tuple[float, float],
+        size: int,
+        align: str = "center",
+        baseline: bool = False,
+    ) -> None:
+        """Draw text like Pillow with "mm"/"lm" anchors, or "ms" if `baseline`."""
+        font = get_font(FONT, size)
+        ascent, descent = font.getmetrics()
+        line_spacing = font.getbbox("A")[3] + SPACING
+        lines = text.split("\n")
+        x, y = xy
+        top = y - (len(lines) - 1) * line_spacing / 2
+        document.set_font(FONT, size=self._pt(size))
+        for i, line in enumerate(lines):
+            line_y = top + i * line_spacing
+            if not baseline:
+                line_y += (ascent - descent) / 2
+            left = self._pt(x)
+            if align == "center":
+                left -= document.get_string_width(line) / 2
+            document.text(left, self._pt(line_y), line)
+
+    def _add_page(self, document: FPDF, title: str, name: str, date_text: str) -> None:
+        content, width, height = self._get_template()
+        center = width / 2
+        document.add_page()
+        # same bytes on every page, so fpdf embeds the image only once
+        document.image(BytesIO(content), x=0, y=0, w=self._pt(width), h=self._pt(height))
+        name_size = fit_font_size(FONT, name, width * MAX_REL_NAME_WIDTH)
+        self._text(document, CONFIRMS_TEXT, (center, CONFIRMS_Y), SMALL_FONT_SIZE, baseline=True)
+        self._text(document, name, (center, NAME_Y), name_size, baseline=True)
+        self._text(document, PASSED_TEXT, (center, PASSED_Y), SMALL_FONT_SIZE)
+        self._text(document, f"«{title}»", (center, TITLE_Y), LARGE_FONT_SIZE)
+        self._text(document, date_text, DATE_XY, SMALL_FONT_SIZE, align="left")
+
+    def serialize(
+        self,
+        buffer: IO[bytes],
+        title: str,
+        name: str,
+        date_text: str,
+    ) -> None:
+        self.serialize_roster(buffer, [(title, name, date_text)])
+
+    def serialize_roster(self, buffer: IO[bytes], pages: Iterable[PageT]) -> None:
+        document = self._create_document()
+        for title, name, date_text in pages:
+            self._add_page(document, title, name, date_text)
+        buffer.write(document.output())
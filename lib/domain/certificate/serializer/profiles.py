@@ -0,0 +1,37 @@
+from dataclasses import replace
+from functools import partial
+from typing import Callable
+
+from .image_serializer import CertificateImageSerializer
+from .jpeg_serializer import CertificateJPEGSerializer
+from .pdf_serializer import CertificatePDFSerializer
+from .png_serializer import CertificatePNGSerializer
+from .protocol import Serializable
+from .webp_serializer import CertificateWebPSerializer
+
+DEFAULT_PROFILE = "png"
+PROFILES: dict[str, Callable[[], Serializable]] = {
+    "png": CertificatePNGSerializer,
+    "png-fast": partial(CertificatePNGSerializer, compress_level=1),
+    "png-small": partial(CertificatePNGSerializer, compress_level=9, optimize=True),
+    "png-palette": partial(CertificatePNGSerializer, palette=True),
+    "jpeg": CertificateJPEGSerializer,
+    "webp": CertificateWebPSerializer,
+    "pdf": CertificatePDFSerializer,
+}
+
+
+class UnknownProfileError(Exception):
+    def __init__(self, profile: str) -> None:
+        super().__init__(f"Unknown encoding profile {profile!r}, expected one of {list(PROFILES)}")
+
+
+def get_serializer(profile: str, scale: float = 1.0) -> Serializable:
+    """Serializer of the profile, image ones render a downscaled preview if `scale` < 1."""
+    try:
+        serializer = PROFILES[profile]()
+    except KeyError as err:
+        raise UnknownProfileError(profile) from err
+    if scale != 1 and isinstance(serializer, CertificateImageSerializer):
+        serializer = replace(serializer, scale=scale)
+    return serializer
@@ -1,8 +1,13 @@
 from typing import IO
+from typing import Iterable
 from typing import Protocol
+from typing import runtime_checkable
 
 
 class Serializable(Protocol):
+    @property
+    def extension(self) -> str: ...
+
     def serialize(
         self,
         buffer: IO[bytes],
@@ -10,3 +15,12 @@ class Serializable(Protocol):
         name: str,
         date_text: str,
     ) -> None: ...
+
+
+@runtime_checkable
+class RosterSerializable(Serializable, Protocol):
+    def serialize_roster(
+        self,
+        buffer: IO[bytes],
+        pages: Iterable[tuple[str, str, str]],
+    ) -> None: ...
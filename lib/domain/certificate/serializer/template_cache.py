@@ -0,0 +1,84 @@
+import re
+from mmap import ACCESS_READ
+from mmap import mmap
+from os import close
+from pathlib import Path
+from tempfile import mkstemp
+from threading import Lock
+
+from PIL.Image import Image
+from PIL.Image import frombuffer
+from PIL.Image import open as _open_image
+
+from lib.environment import get_env_variable
+from lib.logging import logger
+from lib.paths import CACHE_PATH
+
+from ..cache import file_digest
+
+RAW_MODE = "RGB"  # certificates are drawn and encoded in this mode
+TEMP_SUFFIX = ".tmp"
+COPY_NAME = r"[0-9a-f]{64}-\d+x\d+\.\w+"  # digest of the template, its size and mode
+
+_lock = Lock()  # render threads map the template at once on a cold cache
+
+
+def get_template_cache_path() -> Path:
+    return Path(get_env_variable(str, "TEMPLATE_CACHE_PATH", str(CACHE_PATH / "templates")))
+
+
+def _write_raw_template(template: Path, path: Path) -> None:
+    image = _open_image(template).convert(RAW_MODE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # workers of render_batch may write the same copy at once, each uses its own file
+    fd, temp_name = mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=TEMP_SUFFIX)
+    close(fd)
+    temp_path = Path(temp_name)
+    temp_path.write_bytes(image.tobytes())
+    try:
+        temp_path.replace(path)
+    except OSError:
+        temp_path.unlink(missing_ok=True)
+        if not path.exists():
+            raise  # the copy was not written by another process either
+
+
+def _is_old_copy(template: Path, path: Path, other: Path) -> bool:
+    # copies used to be named without the template name
+    pattern = f"(?:{re.escape(template.stem)}-)?{COPY_NAME}"
+    return other != path and re.fullmatch(pattern, other.name) is not None
+
+
+def _remove_old_copies(template: Path, path: Path) -> None:
+    """Copies of previous versions of the template and of other raw modes are not used."""
+    for old in path.parent.iterdir():
+        if _is_old_copy(template, path, old):
+            try:
+                old.unlink()
+            except OSError as error:  # mapped by another process
+                logger.debug(f"old template copy {old} is not removed: {error!r}")
+
+
+def _read_raw_template(path: Path, size: tuple[int, int]) -> Image:
+    with open(path, "rb") as fd, mmap(fd.fileno(), 0, access=ACCESS_READ) as buffer:
+        return frombuffer(RAW_MODE, size, buffer, "raw", RAW_MODE, 0, 1)  # type: ignore[arg-type]
+
+
+def map_template(template: Path, cache_dir: Path) -> Image:
+    """Template pixels read from a raw copy, so the template is decoded only once.
+
+    The raw copy is named after the template content digest, so a changed
+    template gets a new copy and the old ones are removed. It is in the mode
+    the certificate is drawn in, so the pixels are copied from the page
+    cache straight into a new image, which the caller can draw on.
+    """
+    with _open_image(template) as image:
+        size = image.size  # only the header is read here
+    width, height = size
+    name = f"{template.stem}-{file_digest(template)}-{width}x{height}.{RAW_MODE.lower()}"
+    path = cache_dir / name
+    with _lock:
+        if not path.exists():
+            _write_raw_template(template, path)
+            _remove_old_copies(template, path)
+        return _read_raw_template(path, size)
@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+from typing import IO
+from typing import ClassVar
+
+from PIL.Image import Image
+
+from .image_serializer import CertificateImageSerializer
+
+
+@dataclass(frozen=True, slots=True)
+class CertificateWebPSerializer(CertificateImageSerializer):
+    extension: ClassVar[str] = "webp"
+    quality: int = 80
+    method: int = 4  # 0 is fastest, 6 is smallest
+
+    def encode(self, image: Image, buffer: IO[bytes]) -> None:
+        image.save(buffer, format="webp", quality=self.quality, method=self.method)
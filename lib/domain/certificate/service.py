@@ -1,17 +1,102 @@
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
 from dataclasses import dataclass
 from dataclasses import field
 from datetime import date
+from io import BytesIO
+from typing import IO
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Sequence
+from typing import TypeVar
 
 from lib.domain.webinar.enums import WebinarTitle
+from lib.logging import logger
 
+from .cache import CertificateCache
 from .model import Certificate
+from .serializer.cached_serializer import CachedSerializer
+from .serializer.image_serializer import CertificateImageSerializer
+from .serializer.image_serializer import OutputTarget
 from .serializer.png_serializer import CertificatePNGSerializer
+from .serializer.profiles import get_serializer
+from .serializer.protocol import RosterSerializable
 from .serializer.protocol import Serializable
 
+T = TypeVar("T")
+RenderedT = tuple[Certificate, bytes]
+
+
+class TargetsNotSupportedError(Exception):
+    def __init__(self, serializer: Serializable) -> None:
+        super().__init__(f"{type(serializer).__name__} can not render several output targets")
+
+
+class RosterNotSupportedError(Exception):
+    def __init__(self, serializer: Serializable) -> None:
+        super().__init__(f"{type(serializer).__name__} can not write certificates into one file")
+
+
+def render_certificate(certificate: Certificate) -> bytes:
+    buffer = BytesIO()
+    certificate.write(buffer)
+    return buffer.getvalue()
+
+
+def warm_cache(certificate: Certificate) -> Counter[str]:
+    """Render certificate into its cache, returns cache stats of this render instead of image.
+
+    Runs in a worker process, where the cache stats are a copy of the
+    parent ones, so only the difference is returned.
+    """
+    if not isinstance(certificate.serializer, CachedSerializer):
+        render_certificate(certificate)
+        return Counter()
+    stats = certificate.serializer.cache.stats
+    before = stats.copy()
+    render_certificate(certificate)
+    difference = stats - before
+    del difference["size"]  # size of the whole cache, not a counter
+    return difference
+
+
+def _collect(
+    in_flight: dict["Future[T]", Certificate],
+    ordered: bool,
+) -> Iterator[tuple[Certificate, T]]:
+    if ordered:
+        done: Iterable["Future[T]"] = [next(iter(in_flight))]
+    else:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+    for future in done:
+        certificate = in_flight.pop(future)
+        yield certificate, future.result()
+
 
 @dataclass(frozen=True, slots=True)
 class CertificateService:
     serializer: Serializable = field(default_factory=CertificatePNGSerializer)
+    workers: int = 1
+    cache: CertificateCache | None = None
+
+    @classmethod
+    def from_profile(
+        cls,
+        profile: str,
+        workers: int = 1,
+        cache: CertificateCache | None = None,
+        scale: float = 1.0,
+    ) -> "CertificateService":
+        return cls(serializer=get_serializer(profile, scale), workers=workers, cache=cache)
+
+    def _get_serializer(self) -> Serializable:
+        if self.cache is None:
+            return self.serializer
+        return CachedSerializer(serializer=self.serializer, cache=self.cache)
 
     def generate(
         self,
@@ -25,5 +110,98 @@ class CertificateService:
             name=name,
             started_at=started_at,
             finished_at=finished_at,
-            serializer=self.serializer,
+            serializer=self._get_serializer(),
         )
+
+    def is_cached(self, certificate: Certificate) -> bool:
+        if not isinstance(certificate.serializer, CachedSerializer):
+            return False
+        title, name, date_text = certificate.get_texts()
+        key = certificate.serializer.get_key(title, name, date_text)
+        return certificate.serializer.cache.contains(key)
+
+    def prerender(
+        self,
+        certificates: Sequence[Certificate],
+        workers: int | None = None,
+    ) -> None:
+        """Render certificates that are not cached yet, so sending takes them from the cache.
+
+        Blocks until all of them are rendered. Workers return only their
+        cache stats, images stay in the cache.
+        """
+        workers = self.workers if workers is None else workers
+        missing = [certificate for certificate in certificates if not self.is_cached(certificate)]
+        logger.info(
+            f"prerendering {len(missing)} certificates, "
+            f"{len(certificates) - len(missing)} already cached"
+        )
+        rendered = self._map(warm_cache, missing, workers, ordered=False)
+        for i, (certificate, stats) in enumerate(rendered):
+            if workers > 1 and self.cache is not None:  # one worker updates the stats in place
+                self.cache.stats.update(stats)
+            logger.debug(f"{certificate.name} prerendered ({i + 1}/{len(missing)})")
+
+    def log_stats(self) -> None:
+        if self.cache is not None:
+            logger.info(f"certificate cache stats: {dict(self.cache.stats)}")
+
+    def render_batch(
+        self,
+        certificates: Iterable[Certificate],
+        workers: int | None = None,
+        max_in_flight: int | None = None,
+        ordered: bool = True,
+    ) -> Iterator[RenderedT]:
+        """Render certificates in a process pool, yielding (certificate, bytes).
+
+        At most `max_in_flight` certificates (twice the workers by default) are
+        submitted at once, so rendered images do not pile up in memory when the
+        consumer is slower than the pool. With one worker everything is
+        rendered in the current process.
+        """
+        workers = self.workers if workers is None else workers
+        return self._map(render_certificate, certificates, workers, max_in_flight, ordered)
+
+    @staticmethod
+    def _map(
+        func: Callable[[Certificate], T],
+        certificates: Iterable[Certificate],
+        workers: int,
+        max_in_flight: int | None = None,
+        ordered: bool = True,
+    ) -> Iterator[tuple[Certificate, T]]:
+        if workers <= 1:
+            for certificate in certificates:
+                yield certificate, func(certificate)
+            return
+        max_in_flight = max_in_flight or workers * 2
+        executor = ProcessPoolExecutor(max_workers=workers)
+        in_flight: dict["Future[T]", Certificate] = {}
+        try:
+            for certificate in certificates:
+                if len(in_flight) >= max_in_flight:
+                    yield from _collect(in_flight, ordered)
+                in_flight[executor.submit(func, certificate)] = certificate
+            while in_flight:
+                yield from _collect(in_flight, ordered)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def write_roster(self, buffer: IO[bytes], certificates: Iterable[Certificate]) -> None:
+        """Write all certificates into one multi-page document, e.g. for printing."""
+        if not isinstance(self.serializer, RosterSerializable):
+            raise RosterNotSupportedError(self.serializer)
+        pages = (certificate.get_texts() for certificate in certificates)
+        self.serializer.serialize_roster(buffer, pages)
+
+    def render_targets(
+        self,
+        certificate: Certificate,
+        targets: Sequence[OutputTarget],
+    ) -> list[bytes]:
+        """Draw certificate once and encode it for every target, e.g. print, email, thumbnail."""
+        if not isinstance(self.serializer, CertificateImageSerializer):
+            raise TargetsNotSupportedError(self.serializer)
+        title, name, date_text = certificate.get_texts()
+        return self.serializer.serialize_targets(title, name, date_text, targets)
@@ -0,0 +1,257 @@
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from io import IOBase
+from pathlib import Path
+from smtplib import SMTPRecipientsRefused
+from smtplib import SMTPResponseException
+from smtplib import SMTPServerDisconnected
+from threading import Lock
+from time import time
+from typing import Callable
+from typing import Sequence
+from zlib import crc32
+
+from lib.clients.email import AbstractEmailClient
+from lib.clients.email import GMailClient
+from lib.clients.email import is_before_data
+from lib.environment import get_env_variable
+from lib.logging import logger
+from lib.resilience import ConnectError
+
+from .repository import DAY_SECONDS
+from .repository import SenderUsageRepository
+
+THROTTLE_SECONDS = 15 * 60
+
+
+class NoSenderAvailableError(Exception):
+    """Every sender account has spent its daily quota or is throttled."""
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Gmail answers 550 5.4.5 when the daily quota is spent."""
+    return (
+        isinstance(error, SMTPResponseException)
+        and error.smtp_code == 550
+        and b"5.4.5" in _get_reply(error)
+    )
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """Gmail answers 421 or 454 4.7.0 when an account sends or logs in too fast."""
+    return (
+        isinstance(error, SMTPResponseException)
+        and error.smtp_code in (421, 454)
+        and b"4.7." in _get_reply(error)
+    )
+
+
+def is_not_sent(error: Exception) -> bool:
+    """The email surely was not delivered: it was refused, or SMTP failed before DATA."""
+    if isinstance(error, (SMTPResponseException, SMTPRecipientsRefused, ConnectError)):
+        return True
+    if isinstance(error, SMTPServerDisconnected):
+        return is_before_data(error)
+    return isinstance(error, NoSenderAvailableError)
+
+
+def _get_reply(error: SMTPResponseException) -> bytes:
+    reply = error.smtp_error
+    return reply if isinstance(reply, bytes) else str(reply).encode()
+
+
+def get_gmail_credentials() -> list[tuple[str, str]]:
+    """Accounts from GMAILACCOUNTS as "user:password,user:password", GMAILACCOUNT otherwise."""
+    accounts = [
+        (user.strip(), password.strip())
+        for user, _, password in (
+            item.partition(":")
+            for item in get_env_variable(str, "GMAILACCOUNTS", "").split(",")
+            if item.strip()
+        )
+    ]
+    return accounts or [
+        (
+            get_env_variable(str, "GMAILACCOUNT"),
+            get_env_variable(str, "GMAILAPPLICATIONPASSWORD"),
+        )
+    ]
+
+
+def get_daily_quota() -> int:
+    """Gmail limit of one account, 2000 for Google Workspace."""
+    return get_env_variable(int, "GMAIL_DAILY_QUOTA", 500)
+
+
+@dataclass(frozen=True, slots=True)
+class SenderAccount:
+    name: str  # email address, usage is counted by it
+    client: AbstractEmailClient
+    daily_quota: int = 500  # Gmail limit, 2000 for Google Workspace
+
+
+@dataclass(slots=True)
+class SenderPool(AbstractEmailClient):
+    """Sends every email from one of several accounts within their daily quotas.
+
+    A recipient is assigned to an account by a hash of the address, so
+    the load is spread evenly. If that account has no quota left or is
+    throttled, the next one is used. Quota is counted over the last 24
+    hours in `usage`, where every email takes its place before it is sent,
+    so processes sharing the database stay within the quota together.
+    """
+
+    accounts: Sequence[SenderAccount]
+    usage: SenderUsageRepository | None = None
+    throttle_seconds: float = THROTTLE_SECONDS
+    clock: Callable[[], float] = field(default=time, repr=False)
+    stats: Counter[str] = field(default_factory=Counter)  # sent by account in this run
+    _used: Counter[str] = field(default_factory=Counter, repr=False)  # sent without `usage`
+    _exhausted: set[str] = field(default_factory=set, repr=False)  # quota spent as server says
+    _unavailable_until: dict[str, float] = field(default_factory=dict, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    @classmethod
+    def from_environment(
+        cls,
+        connections: int = 1,
+        usage: SenderUsageRepository | None = None,
+    ) -> "SenderPool":
+        daily_quota = get_daily_quota()
+        accounts = [
+            SenderAccount(
+                name=user,
+                client=GMailClient(user=user, password=password, connections=connections),
+                daily_quota=daily_quota,
+            )
+            for user, password in get_gmail_credentials()
+        ]
+        return cls(accounts=accounts, usage=usage)
+
+    @property
+    def daily_quota(self) -> int:
+        return sum(account.daily_quota for account in self.accounts)
+
+    def _get_used(self) -> Counter[str]:
+        """Sent in the last 24 hours, `usage` is read every time as other processes send too."""
+        if self.usage is None:
+            return self._used
+        return Counter(self.usage.get_counts(self.clock() - DAY_SECONDS))
+
+    def _get_remaining(self, used: Counter[str]) -> dict[str, int]:
+        return {
+            account.name: (
+                0
+                if account.name in self._exhausted
+                else max(account.daily_quota - used[account.name], 0)
+            )
+            for account in self.accounts
+        }
+
+    def get_remaining(self) -> dict[str, int]:
+        """Emails each account can still send today."""
+        with self._lock:
+            return self._get_remaining(self._get_used())
+
+    def _reserve(self, to: str, tried: set[str]) -> tuple[SenderAccount, int | None]:
+        """Account to send from and the id of its place in `usage`, None without `usage`."""
+        start = crc32(to.lower().encode())
+        now = self.clock()
+        with self._lock:
+            for i in range(len(self.accounts)):
+                account = self.accounts[(start + i) % len(self.accounts)]
+                if (
+                    account.name in tried
+                    or account.name in self._exhausted
+                    or self._unavailable_until.get(account.name, 0) > now
+                ):
+                    continue
+                if self.usage is None:
+                    if self._used[account.name] < account.daily_quota:
+                        self._used[account.name] += 1
+                        return account, None
+                elif reservation := self.usage.reserve(account.name, account.daily_quota, now):
+                    return account, reservation
+        raise NoSenderAvailableError(f"no sender account can send to {to}: {self.get_report()}")
+
+    def _release(
+        self,
+        account: SenderAccount,
+        reservation: int | None,
+        unavailable_for: float | None = None,
+    ) -> None:
+        with self._lock:
+            if reservation is not None and self.usage is not None:
+                self.usage.cancel(reservation)
+            else:
+                self._used[account.name] -= 1
+            if unavailable_for is not None:
+                self._unavailable_until[account.name] = self.clock() + unavailable_for
+
+    def _exhaust(self, account: SenderAccount, reservation: int | None) -> None:
+        """Server knows the quota better, the account is not used again in this run."""
+        self._release(account, reservation)
+        with self._lock:
+            self._exhausted.add(account.name)
+
+    def send(
+        self,
+        to: str,
+        bcc: Sequence[str] | None = None,
+        subject: str | None = None,
+        contents: str | None = None,
+        attachments: Sequence[str | IOBase | Path] | None = None,
+        message_id: str | None = None,
+    ) -> None:
+        tried: set[str] = set()
+        while True:
+            account, reservation = self._reserve(to, tried)
+            tried.add(account.name)
+            try:
+                account.client.send(
+                    to=to,
+                    bcc=bcc,
+                    subject=subject,
+                    contents=contents,
+                    attachments=attachments,
+                    message_id=message_id,
+                )
+            except Exception as error:
+                if is_quota_error(error):
+                    logger.warning(f"{account.name} daily quota is spent: {error!r}")
+                    self._exhaust(account, reservation)
+                elif is_throttling_error(error):
+                    logger.warning(f"{account.name} is throttled: {error!r}")
+                    self._release(account, reservation, unavailable_for=self.throttle_seconds)
+                elif is_not_sent(error):
+                    self._release(account, reservation)
+                    raise
+                else:  # the email may be delivered, so it keeps its place in the quota
+                    logger.warning(f"{account.name} may have sent the email to {to}: {error!r}")
+                    raise
+                continue
+            with self._lock:
+                self.stats[account.name] += 1
+            return
+
+    def get_report(self) -> dict[str, dict[str, int]]:
+        """Sent in this run, sent in the last 24 hours and left of quota by account."""
+        with self._lock:
+            used = self._get_used()
+            remaining = self._get_remaining(used)
+        return {
+            account.name: {
+                "sent": self.stats[account.name],
+                "sent_24h": used[account.name],
+                "remaining": remaining[account.name],
+            }
+            for account in self.accounts
+        }
+
+    def close(self) -> None:
+        for account in self.accounts:
+            account.client.close()
+        if self.usage is not None:
+            self.usage.delete_older(self.clock() - DAY_SECONDS)
+        logger.info(f"sender accounts: {self.get_report()}")
@@ -0,0 +1,98 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from typing import Sequence
+
+from lib.environment import get_env_variable
+
+from .accounts import get_daily_quota
+from .accounts import get_gmail_credentials
+from .repository import DAY_SECONDS
+
+HOUR_SECONDS = 60 * 60
+MAX_PLAN_DAYS = 366
+
+
+@dataclass(frozen=True, slots=True)
+class SendWindow:
+    starts_at: float  # unix timestamp
+    count: int
+
+    @property
+    def start(self) -> datetime:
+        return datetime.fromtimestamp(self.starts_at)
+
+
+@dataclass(frozen=True, slots=True)
+class SendPlan:
+    pending: int
+    created_at: float  # unix timestamp, the first window starts at it if there is quota
+    windows: list[SendWindow] = field(default_factory=list)
+
+    @property
+    def budget(self) -> int:
+        """Emails that can be sent now, 0 if the first window is in the future."""
+        if self.windows and self.windows[0].starts_at <= self.created_at:
+            return self.windows[0].count
+        return 0
+
+    @property
+    def resume_at(self) -> datetime | None:
+        """Start of the first window after the current one, send should be run again then."""
+        later = [window for window in self.windows if window.starts_at > self.created_at]
+        return later[0].start if later else None
+
+    @property
+    def last_start(self) -> datetime | None:
+        """Start of the window with the last emails, the projected completion."""
+        return self.windows[-1].start if self.windows else None
+
+
+@dataclass(frozen=True, slots=True)
+class SendPlanner:
+    """Spreads pending emails over hourly windows within daily and hourly quotas.
+
+    Quotas are rolling, as Gmail counts them: an email sent at 10:15 frees
+    its place in the daily quota at 10:15 next day. Emails already sent
+    are taken from sender usage.
+    """
+
+    daily_quota: int
+    hourly_quota: int | None = None  # None if only the daily quota applies
+
+    def __post_init__(self) -> None:
+        if self.daily_quota <= 0:
+            raise ValueError(f"daily quota must be positive, got {self.daily_quota}")
+
+    @classmethod
+    def from_environment(cls) -> "SendPlanner":
+        """Daily quota of all sender accounts together, SEND_HOURLY_QUOTA=0 for no hourly one."""
+        hourly_quota = get_env_variable(int, "SEND_HOURLY_QUOTA", 0)
+        return cls(
+            daily_quota=get_daily_quota() * len(get_gmail_credentials()),
+            hourly_quota=hourly_quota or None,
+        )
+
+    def _get_capacity(self, sent: list[float], at: float) -> int:
+        daily = self.daily_quota - (len(sent) - bisect_right(sent, at - DAY_SECONDS))
+        if self.hourly_quota is None:
+            return daily
+        return min(daily, self.hourly_quota - (len(sent) - bisect_right(sent, at - HOUR_SECONDS)))
+
+    def plan(self, pending: int, sent_times: Sequence[float], now: float) -> SendPlan:
+        """Windows start every hour from `now`, only the ones with emails are returned.
+
+        `now` and `sent_times` of emails sent by all accounts are unix timestamps.
+        """
+        sent = sorted(time for time in sent_times if time > now - DAY_SECONDS)
+        windows = []
+        left = pending
+        at = now
+        while left > 0 and at <= now + MAX_PLAN_DAYS * DAY_SECONDS:
+            if (count := min(self._get_capacity(sent, at), left)) > 0:
+                windows.append(SendWindow(starts_at=at, count=count))
+                sent.extend([at] * count)
+                left -= count
+            at += HOUR_SECONDS
+        return SendPlan(pending=pending, created_at=now, windows=windows)
@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from dataclasses import field
+from time import time
+
+from lib.clients.db import DB
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+@dataclass(frozen=True, slots=True)
+class SenderUsageRepository:
+    """Time of every email sent by each account, kept between runs and processes."""
+
+    db: DB = field(default_factory=DB)
+
+    def record(self, account: str, sent_at: float | None = None) -> None:
+        query = "INSERT INTO sender_usage (account, sent_at) VALUES (?, ?)"
+        with self.db.connection() as connection:
+            connection.execute(query, (account, time() if sent_at is None else sent_at))
+
+    def reserve(self, account: str, quota: int, sent_at: float | None = None) -> int | None:
+        """Records an email if `account` sent less than `quota` in the day before `sent_at`.
+
+        The check and the insert are one statement, so processes sharing the
+        database can not take the same place. Returns the id to cancel it with.
+        """
+        sent_at = time() if sent_at is None else sent_at
+        query = """
+            INSERT INTO sender_usage (account, sent_at)
+            SELECT :account, :sent_at
+            WHERE (
+                SELECT COUNT(*) FROM sender_usage
+                WHERE account = :account AND sent_at > :since
+            ) < :quota
+        """
+        params = {"account": account, "sent_at": sent_at, "since": sent_at - DAY_SECONDS}
+        with self.db.connection() as connection:
+            cursor = connection.execute(query, {**params, "quota": quota})
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def cancel(self, reservation: int) -> None:
+        """Removes a reserved email that was not sent."""
+        with self.db.connection() as connection:
+            connection.execute("DELETE FROM sender_usage WHERE id = ?", (reservation,))
+
+    def get_counts(self, since: float) -> dict[str, int]:
+        """Emails sent by each account after `since`, a unix timestamp."""
+        query = """
+            SELECT account, COUNT(*) FROM sender_usage
+            WHERE sent_at > :since
+            GROUP BY account
+        """
+        with self.db.connection() as connection:
+            return dict(connection.execute(query, {"since": since}).fetchall())
+
+    def get_sent_times(self, since: float) -> list[float]:
+        """Times of emails sent by all accounts after `since`, in order."""
+        query = "SELECT sent_at FROM sender_usage WHERE sent_at > ? ORDER BY sent_at"
+        with self.db.connection() as connection:
+            return [sent_at for (sent_at,) in connection.execute(query, (since,))]
+
+    def delete_older(self, before: float) -> int:
+        with self.db.connection() as connection:
+            query = "DELETE FROM sender_usage WHERE sent_at < ?"
+            return connection.execute(query, (before,)).rowcount
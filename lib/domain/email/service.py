@@ -1,24 +1,72 @@
 from dataclasses import dataclass
 from dataclasses import field
-from pathlib import Path
-from tempfile import TemporaryDirectory
+from enum import Enum
+from enum import unique
+from functools import partial
+from io import BytesIO
+from typing import Iterator
 
 from lib.clients.email import AbstractEmailClient
+from lib.clients.email import Attachment
 from lib.clients.email import GMailClient
 from lib.clients.email import TestEmailClient
+from lib.clients.mime import encode_base64
 from lib.domain.certificate.model import Certificate
+from lib.domain.certificate.proof import ProofSheet
+from lib.domain.certificate.proof import TileT
+from lib.domain.certificate.serializer.cached_serializer import CachedSerializer
+from lib.domain.certificate.serializer.jpeg_serializer import CertificateJPEGSerializer
 from lib.domain.webinar.enums import WebinarTitle
 from lib.environment import env_str_tuple_field
+from lib.environment import get_env_variable
+from lib.logging import logger
+
+DIGEST_THUMBNAIL_SCALE = 0.08
+DRY_RUN_MAX_CALLS = 100
+
+
+@unique
+class BccMode(str, Enum):
+    COPY = "copy"  # every certificate email is sent to bcc_emails as well
+    DIGEST = "digest"  # bcc_emails get one summary email with a proof sheet
+
+
+@dataclass(frozen=True, slots=True)
+class DigestEntry:
+    email: str
+    certificate: Certificate
 
 
 @dataclass(frozen=True, slots=True)
 class EmailService:
     email_client: AbstractEmailClient = field(default_factory=GMailClient)
     bcc_emails: tuple[str, ...] = env_str_tuple_field("BCC_EMAILS")
+    bcc_mode: BccMode = field(
+        default_factory=partial(get_env_variable, BccMode, "BCC_MODE", BccMode.COPY.value),
+    )
+    digest: list[DigestEntry] = field(default_factory=list, compare=False, repr=False)
 
     @classmethod
     def with_test_client(cls) -> "EmailService":
-        return cls(email_client=TestEmailClient())
+        """Dry run, only digests of attachments and the last emails are kept."""
+        email_client = TestEmailClient(keep_attachments=False, max_calls=DRY_RUN_MAX_CALLS)
+        return cls(email_client=email_client)
+
+    @staticmethod
+    def _get_base64(certificate: Certificate, content: bytes) -> str | None:
+        """Base64 of rendered `content`, kept next to it in the certificate cache if there is one.
+
+        It is stored under the render key of the certificate, so a cached
+        certificate is neither hashed nor encoded again.
+        """
+        serializer = certificate.serializer
+        if not isinstance(serializer, CachedSerializer):
+            return None  # the attachment is encoded when the email is built
+        key = serializer.cache.key("base64", serializer.get_key(*certificate.get_texts()))
+        if (encoded := serializer.cache.get(key)) is None:
+            encoded = encode_base64(content).encode("ascii")
+            serializer.cache.put(key, encoded)
+        return encoded.decode("ascii")
 
     def send_certificate_email(
         self,
@@ -26,15 +74,70 @@ class EmailService:
         email: str,
         message: str,
         certificate: Certificate,
+        content: bytes | None = None,
+        message_id: str | None = None,
     ) -> None:
-        with TemporaryDirectory() as temp_dir:
-            path = Path(temp_dir) / "certificate.png"
-            with open(path, "wb+") as fd:
-                certificate.write(fd)
+        """Attach `content` if the certificate is already rendered, render it otherwise.
+
+        `message_id` is set as Message-ID header, the client makes a new one if it is None.
+        """
+        if content is None:
+            attachment = Attachment(certificate.filename)
+            certificate.write(attachment)
+            attachment.seek(0)
+        else:
+            attachment = Attachment(certificate.filename, content)
+        attachment.base64 = self._get_base64(certificate, attachment.getvalue())
+        self.email_client.send(
+            to=email,
+            bcc=self.bcc_emails if self.bcc_mode == BccMode.COPY else None,
+            subject=title.title(),
+            contents=message,
+            attachments=[attachment],
+            message_id=message_id,
+        )
+
+    def add_to_digest(self, email: str, certificate: Certificate) -> None:
+        """Add a sent certificate email to the next digest, nothing is kept in copy mode."""
+        if self.bcc_mode == BccMode.DIGEST and self.bcc_emails:
+            self.digest.append(DigestEntry(email=email, certificate=certificate))
+
+    def _get_digest_tiles(self, entries: list[DigestEntry]) -> Iterator[TileT]:
+        serializer = CertificateJPEGSerializer(scale=DIGEST_THUMBNAIL_SCALE, quality=70)
+        for entry in entries:
+            buffer = BytesIO()
+            serializer.serialize(buffer, *entry.certificate.get_texts())
+            yield entry.certificate.name, buffer.getvalue()
+
+    def _get_digest_proof(self, entries: list[DigestEntry]) -> Attachment:
+        attachment = Attachment("certificates.pdf")
+        ProofSheet(columns=5, rows=4, quality=50).write_pdf(
+            attachment, self._get_digest_tiles(entries)
+        )
+        attachment.seek(0)
+        return attachment
+
+    def send_bcc_digest(self) -> None:
+        """In digest mode, send bcc_emails one email per webinar with everything added so far."""
+        if self.bcc_mode != BccMode.DIGEST or not self.bcc_emails:
+            return
+        by_title: dict[WebinarTitle, list[DigestEntry]] = {}
+        for entry in self.digest:
+            by_title.setdefault(entry.certificate.title, []).append(entry)
+        for title, entries in by_title.items():
+            lines = [
+                f"{i}. {entry.certificate.name} <{entry.email}>"
+                for i, entry in enumerate(entries, start=1)
+            ]
+            logger.info(f"sending digest of {len(lines)} emails to {', '.join(self.bcc_emails)}")
             self.email_client.send(
-                to=email,
-                bcc=self.bcc_emails,
-                subject=title.title(),
-                contents=message,
-                attachments=[path],
+                to=self.bcc_emails[0],
+                bcc=self.bcc_emails[1:],
+                subject=f"{title.title()}: отправлено сертификатов {len(lines)}",
+                contents="\n".join(lines),
+                attachments=[self._get_digest_proof(entries)],
             )
+        self.digest.clear()
+
+    def close(self) -> None:
+        self.email_client.close()
@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+from datetime import date
+from enum import Enum
+from enum import unique
+
+from lib.domain.webinar.enums import WebinarTitle
+
+
+@unique
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+    SENDING = "sending"  # the email may be delivered, the job is queued again only by hand
+
+
+@dataclass(frozen=True, slots=True)
+class SendJob:
+    """One row of the mailing sheet with everything needed to render and send it."""
+
+    url: str
+    row_number: int
+    fio: str
+    email: str
+    message: str
+    title: WebinarTitle
+    started_at: date
+    finished_at: date
+    id: int | None = None
+    attempts: int = 0
@@ -0,0 +1,209 @@
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import date
+from sqlite3 import Connection
+from time import time
+from typing import Any
+from typing import Iterable
+
+from lib.clients.db import DB
+from lib.domain.webinar.enums import WebinarTitle
+from lib.environment import env_int_field
+
+from .model import JobStatus
+from .model import SendJob
+
+COLUMNS = "url, row_number, fio, email, message, title, started_at, finished_at, id, attempts"
+
+
+def _to_job(row: tuple[Any, ...]) -> SendJob:
+    url, row_number, fio, email, message, title, started_at, finished_at, id_, attempts = row
+    return SendJob(
+        url=url,
+        row_number=row_number,
+        fio=fio,
+        email=email,
+        message=message,
+        title=WebinarTitle(title),
+        started_at=date.fromisoformat(started_at),
+        finished_at=date.fromisoformat(finished_at),
+        id=id_,
+        attempts=attempts,
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class SendJobRepository:
+    """Queue of send jobs in SQLite, workers on several hosts may share one database file.
+
+    A worker leases a job for `lease_seconds`. If it crashes, the lease
+    expires and the job is leased again by another worker, until it was
+    attempted `max_attempts` times. Leases compare wall clock time, so
+    clocks of worker hosts must be in sync.
+    """
+
+    db: DB = field(default_factory=DB)
+    lease_seconds: int = env_int_field("SEND_JOB_LEASE_SECONDS", 300)
+    max_attempts: int = env_int_field("SEND_JOB_MAX_ATTEMPTS", 3)
+
+    def enqueue(self, jobs: Iterable[SendJob]) -> int:
+        """Add jobs, rows that are already in the queue are skipped. Returns number added."""
+        query = """
+            INSERT INTO send_job
+                (url, row_number, fio, email, message, title, started_at, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url, row_number) DO NOTHING
+        """
+        rows = (
+            (
+                job.url,
+                job.row_number,
+                job.fio,
+                job.email,
+                job.message,
+                job.title.value,
+                job.started_at.isoformat(),
+                job.finished_at.isoformat(),
+            )
+            for job in jobs
+        )
+        with self.db.connection() as connection:
+            return connection.executemany(query, rows).rowcount
+
+    def _fail_expired(self, connection: Connection, now: float) -> None:
+        query = """
+            UPDATE send_job
+            SET status = :failed, error = 'lease expired', leased_by = NULL
+            WHERE status = :leased AND lease_expires_at < :now AND attempts >= :max_attempts
+        """
+        params = {
+            "failed": JobStatus.FAILED.value,
+            "leased": JobStatus.LEASED.value,
+            "now": now,
+            "max_attempts": self.max_attempts,
+        }
+        connection.execute(query, params)
+
+    def lease(self, worker: str) -> SendJob | None:
+        """Take the oldest pending or expired job, the update is atomic between processes."""
+        now = time()
+        query = f"""
+            UPDATE send_job
+            SET status = :leased,
+                leased_by = :worker,
+                lease_expires_at = :expires_at,
+                attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM send_job
+                WHERE status = :pending OR (status = :leased AND lease_expires_at < :now)
+                ORDER BY id
+                LIMIT 1
+            )
+            RETURNING {COLUMNS}
+        """
+        params = {
+            "leased": JobStatus.LEASED.value,
+            "pending": JobStatus.PENDING.value,
+            "worker": worker,
+            "now": now,
+            "expires_at": now + self.lease_seconds,
+        }
+        with self.db.connection() as connection:
+            self._fail_expired(connection, now)
+            row = connection.execute(query, params).fetchone()
+        return None if row is None else _to_job(row)
+
+    def complete(self, job: SendJob, worker: str) -> bool:
+        """Mark leased job as done, False if the lease was lost to another worker."""
+        query = """
+            UPDATE send_job
+            SET status = :done, done_at = datetime('now'), leased_by = NULL, error = NULL
+            WHERE id = :id AND status = :leased AND leased_by = :worker
+        """
+        params = {
+            "done": JobStatus.DONE.value,
+            "leased": JobStatus.LEASED.value,
+            "id": job.id,
+            "worker": worker,
+        }
+        with self.db.connection() as connection:
+            return connection.execute(query, params).rowcount == 1
+
+    def fail(self, job: SendJob, worker: str, error: str) -> None:
+        """Return job to the queue, or mark it failed if there are no attempts left."""
+        query = """
+            UPDATE send_job
+            SET status = CASE WHEN attempts >= :max_attempts THEN :failed ELSE :pending END,
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                error = :error
+            WHERE id = :id AND status = :leased AND leased_by = :worker
+        """
+        params = {
+            "max_attempts": self.max_attempts,
+            "failed": JobStatus.FAILED.value,
+            "pending": JobStatus.PENDING.value,
+            "leased": JobStatus.LEASED.value,
+            "error": error,
+            "id": job.id,
+            "worker": worker,
+        }
+        with self.db.connection() as connection:
+            connection.execute(query, params)
+
+    def abandon(self, job: SendJob, worker: str, error: str) -> None:
+        """Keep job in sending, the email may be delivered and it is not sent again."""
+        query = """
+            UPDATE send_job
+            SET status = :sending, leased_by = NULL, lease_expires_at = NULL, error = :error
+            WHERE id = :id AND status = :leased AND leased_by = :worker
+        """
+        params = {
+            "sending": JobStatus.SENDING.value,
+            "leased": JobStatus.LEASED.value,
+            "error": error,
+            "id": job.id,
+            "worker": worker,
+        }
+        with self.db.connection() as connection:
+            connection.execute(query, params)
+
+    def requeue_sending(self, url: str) -> int:
+        """Queue jobs stuck in sending again, use it only if their emails were not delivered."""
+        query = """
+            UPDATE send_job
+            SET status = :pending, attempts = 0
+            WHERE url = :url AND status = :sending
+        """
+        params = {
+            "pending": JobStatus.PENDING.value,
+            "sending": JobStatus.SENDING.value,
+            "url": url,
+        }
+        with self.db.connection() as connection:
+            return connection.execute(query, params).rowcount
+
+    def get_unsynced_done(self, url: str) -> list[SendJob]:
+        query = f"""
+            SELECT {COLUMNS} FROM send_job
+            WHERE url = :url AND status = :done AND synced = 0
+            ORDER BY row_number
+        """
+        with self.db.connection() as connection:
+            rows = connection.execute(query, {"url": url, "done": JobStatus.DONE.value})
+            return [_to_job(row) for row in rows]
+
+    def mark_synced(self, jobs: Iterable[SendJob]) -> None:
+        query = "UPDATE send_job SET synced = 1 WHERE id = ?"
+        with self.db.connection() as connection:
+            connection.executemany(query, ((job.id,) for job in jobs))
+
+    def count_by_status(self, url: str | None = None) -> dict[JobStatus, int]:
+        query = """
+            SELECT status, COUNT(*) FROM send_job
+            WHERE :url IS NULL OR url = :url
+            GROUP BY status
+        """
+        with self.db.connection() as connection:
+            rows = connection.execute(query, {"url": url}).fetchall()
+        return {JobStatus(status): count for status, count in rows}
@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+from dataclasses import field
+from os import getpid
+from socket import gethostname
+
+from lib.domain.certificate.service import CertificateService
+from lib.domain.email.accounts import is_not_sent
+from lib.domain.email.service import EmailService
+from lib.logging import logger
+
+from .model import SendJob
+from .repository import SendJobRepository
+
+
+def get_worker_name() -> str:
+    return f"{gethostname()}:{getpid()}"
+
+
+@dataclass(frozen=True, slots=True)
+class SendJobWorker:
+    """Leases send jobs one by one, renders certificates and sends them.
+
+    Any number of workers can run against the same repository, each job is
+    processed by one of them. A job is tried again only if its email was
+    surely not delivered, otherwise it is left in sending.
+    """
+
+    repository: SendJobRepository = field(default_factory=SendJobRepository)
+    certificate_service: CertificateService = field(default_factory=CertificateService)
+    email_service: EmailService = field(default_factory=EmailService)
+    name: str = field(default_factory=get_worker_name)
+
+    def process(self, job: SendJob) -> None:
+        certificate = self.certificate_service.generate(
+            title=job.title,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            name=job.fio,
+        )
+        self.email_service.send_certificate_email(
+            title=job.title,
+            email=job.email,
+            message=job.message,
+            certificate=certificate,
+        )
+
+    def run(self, max_jobs: int | None = None) -> int:
+        """Process jobs until the queue is empty or `max_jobs` are done, returns jobs done."""
+        done = 0
+        lost = 0
+        try:
+            while max_jobs is None or done < max_jobs:
+                if (job := self.repository.lease(self.name)) is None:
+                    break
+                logger.info(f"{self.name}: {job.fio} sending email to {job.email}")
+                try:
+                    self.process(job)
+                except Exception as error:
+                    if is_not_sent(error):
+                        logger.exception(f"{self.name}: {job.fio} failed (attempt {job.attempts})")
+                        self.repository.fail(job, self.name, repr(error))
+                    else:
+                        logger.exception(
+                            f"{self.name}: {job.fio} email may be sent, check it and requeue"
+                        )
+                        self.repository.abandon(job, self.name, repr(error))
+                    continue
+                if self.repository.complete(job, self.name):
+                    done += 1
+                else:
+                    lost += 1
+                    logger.error(
+                        f"{self.name}: {job.fio} email was sent, but the lease expired before "
+                        f"the job was done, another worker may send it again"
+                    )
+        finally:
+            self.email_service.close()  # BCC digest of the jobs is sent by sync
+        logger.info(f"{self.name}: {done} jobs done, {lost} leases lost")
+        return done
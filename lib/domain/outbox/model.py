@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+from enum import Enum
+from enum import unique
+
+
+@unique
+class OutboxStatus(str, Enum):
+    QUEUED = "queued"
+    SENDING = "sending"  # SMTP send started, the result is unknown until it is sent
+    SENT = "sent"
+
+
+@dataclass(frozen=True, slots=True)
+class OutboxMessage:
+    """Certificate email of one participant, rows are matched by fio and email.
+
+    Row numbers are not stored, so rows that were inserted or moved in
+    the mailing sheet between runs are still found.
+    """
+
+    fio: str
+    email: str
+    status: OutboxStatus = OutboxStatus.QUEUED
+    message_id: str | None = None
+    synced: bool = False
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.fio, self.email
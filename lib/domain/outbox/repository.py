@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Iterable
+
+from lib.clients.db import DB
+
+from .model import OutboxMessage
+from .model import OutboxStatus
+
+
+@dataclass(frozen=True, slots=True)
+class OutboxRepository:
+    """Emails of mailing sheets in SQLite, status of each one is written before and after SMTP.
+
+    A message is moved to `sending` with its Message-ID before it is handed
+    to the SMTP server and to `sent` right after, so after a crash it is
+    known which messages may have been delivered.
+    """
+
+    db: DB = field(default_factory=DB)
+
+    def add(self, url: str, messages: Iterable[OutboxMessage]) -> int:
+        """Queue messages, ones already in the outbox keep their status. Returns number added."""
+        query = """
+            INSERT INTO outbox (url, fio, email) VALUES (?, ?, ?)
+            ON CONFLICT (url, fio, email) DO NOTHING
+        """
+        with self.db.connection() as connection:
+            rows = ((url, message.fio, message.email) for message in messages)
+            return connection.executemany(query, rows).rowcount
+
+    def get_all(self, url: str) -> dict[tuple[str, str], OutboxMessage]:
+        query = "SELECT fio, email, status, message_id, synced FROM outbox WHERE url = :url"
+        with self.db.connection() as connection:
+            rows = connection.execute(query, {"url": url}).fetchall()
+        messages = (
+            OutboxMessage(fio, email, OutboxStatus(status), message_id, bool(synced))
+            for fio, email, status, message_id, synced in rows
+        )
+        return {message.key: message for message in messages}
+
+    def _set_status(
+        self,
+        url: str,
+        message: OutboxMessage,
+        status: OutboxStatus,
+        expected: OutboxStatus,
+        **values: str | None,
+    ) -> bool:
+        assignments = "".join(f", {name} = :{name}" for name in values)
+        query = f"""
+            UPDATE outbox SET status = :status{assignments}
+            WHERE url = :url AND fio = :fio AND email = :email AND status = :expected
+        """
+        params = {
+            "status": status.value,
+            "expected": expected.value,
+            "url": url,
+            "fio": message.fio,
+            "email": message.email,
+            **values,
+        }
+        with self.db.connection() as connection:
+            return connection.execute(query, params).rowcount == 1
+
+    def start(self, url: str, message: OutboxMessage, message_id: str) -> bool:
+        """Move queued message to sending, False if it is not queued."""
+        return self._set_status(
+            url,
+            message,
+            OutboxStatus.SENDING,
+            OutboxStatus.QUEUED,
+            message_id=message_id,
+        )
+
+    def complete(self, url: str, message: OutboxMessage) -> None:
+        query = """
+            UPDATE outbox SET status = :sent, sent_at = datetime('now'), error = NULL
+            WHERE url = :url AND fio = :fio AND email = :email
+        """
+        params = {
+            "sent": OutboxStatus.SENT.value,
+            "url": url,
+            "fio": message.fio,
+            "email": message.email,
+        }
+        with self.db.connection() as connection:
+            connection.execute(query, params)
+
+    def release(self, url: str, message: OutboxMessage, error: str) -> None:
+        """Return message to the queue when SMTP has refused it."""
+        self._set_status(url, message, OutboxStatus.QUEUED, OutboxStatus.SENDING, error=error)
+
+    def requeue_sending(self, url: str) -> int:
+        """Queue messages stuck in sending again, use it only if they were not delivered."""
+        query = "UPDATE outbox SET status = :queued WHERE url = :url AND status = :sending"
+        params = {
+            "queued": OutboxStatus.QUEUED.value,
+            "sending": OutboxStatus.SENDING.value,
+            "url": url,
+        }
+        with self.db.connection() as connection:
+            return connection.execute(query, params).rowcount
+
+    def mark_synced(self, url: str, messages: Iterable[OutboxMessage]) -> None:
+        query = "UPDATE outbox SET synced = 1 WHERE url = ? AND fio = ? AND email = ?"
+        with self.db.connection() as connection:
+            connection.executemany(query, ((url, m.fio, m.email) for m in messages))
+
+    def count_by_status(self, url: str) -> dict[OutboxStatus, int]:
+        query = "SELECT status, COUNT(*) FROM outbox WHERE url = :url GROUP BY status"
+        with self.db.connection() as connection:
+            rows = connection.execute(query, {"url": url}).fetchall()
+        return {OutboxStatus(status): count for status, count in rows}
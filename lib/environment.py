@@ -29,6 +29,17 @@ def env_str_field(var_name: str, default: str | None = None) -> str:
     )
 
 
+def env_int_field(var_name: str, default: int | None = None) -> int:
+    return field(
+        default_factory=partial(
+            get_env_variable,
+            cast=int,
+            var_name=var_name,
+            default=default,
+        ),
+    )
+
+
 def env_str_tuple_field(var_name: str) -> tuple[str, ...]:
     def split_to_str(text: str) -> tuple[str, ...]:
         return tuple(str(e) for e in text.split(","))
@@ -3,3 +3,4 @@ from pathlib import Path
 ROOT_PATH = Path(__file__).parent
 ETC_PATH = ROOT_PATH.parent / "etc"
 DB_PATH = ROOT_PATH.parent / "db"
+CACHE_PATH = ROOT_PATH.parent / ".cache"
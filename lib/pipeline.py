@@ -0,0 +1,131 @@
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from queue import Queue
+from threading import Event
+from threading import Lock
+from threading import Thread
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import Generator
+from typing import Iterable
+from typing import Sequence
+
+from lib.logging import logger
+
+_DONE = object()  # end of the stream marker, one for every worker of the next stage
+
+
+@dataclass(frozen=True, slots=True)
+class Stage:
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    # items waiting for this stage, twice the workers by default
+    queue_size: int | None = None
+
+    def get_queue_size(self) -> int:
+        return self.queue_size or self.workers * 2
+
+
+@dataclass(slots=True)
+class Pipeline:
+    """Stages run in their own threads and pass items through bounded queues.
+
+    A stage that is slower than the previous one fills its queue and blocks
+    it, so the slowest stage sets the pace and only a few items are in
+    memory. Items are yielded in order of completion. If a stage fails, the
+    items that were not started are dropped, the ones that passed all stages
+    are still yielded and then the error is raised.
+    """
+
+    stages: Sequence[Stage]
+    stats: Counter[str] = field(default_factory=Counter)
+    _error: BaseException | None = None
+    _stopped: Event = field(default_factory=Event)
+    _lock: Lock = field(default_factory=Lock)
+
+    def _fail(self, name: str, error: BaseException) -> None:
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        logger.error(f"pipeline stage {name} failed: {error!r}")
+        self._stopped.set()
+
+    def _feed(self, items: Iterable[Any], output: Queue[Any], workers: int) -> None:
+        try:
+            for item in items:
+                if self._stopped.is_set():
+                    break
+                output.put(item)
+        except Exception as error:
+            self._fail("read", error)
+        finally:
+            for _ in range(workers):
+                output.put(_DONE)
+
+    def _work(
+        self,
+        stage: Stage,
+        source: Queue[Any],
+        output: Queue[Any],
+        running: list[int],
+        next_workers: int,
+    ) -> None:
+        while (item := source.get()) is not _DONE:
+            if self._stopped.is_set():
+                continue  # drain the queue, so the previous stage is not blocked
+            started_at = perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as error:
+                self._fail(stage.name, error)
+                continue
+            with self._lock:
+                self.stats[f"{stage.name}.items"] += 1
+                self.stats[f"{stage.name}.busy_ms"] += round((perf_counter() - started_at) * 1000)
+            output.put(result)
+        with self._lock:
+            running[0] -= 1
+            last = running[0] == 0
+        if last:
+            for _ in range(next_workers):
+                output.put(_DONE)
+
+    def run(self, items: Iterable[Any]) -> Generator[Any, None, None]:
+        self._error = None
+        self._stopped.clear()
+        queues: list[Queue[Any]] = [Queue(stage.get_queue_size()) for stage in self.stages]
+        queues.append(Queue(self.stages[-1].get_queue_size()))
+        workers = [stage.workers for stage in self.stages] + [1]
+        threads = [Thread(target=self._feed, args=(items, queues[0], workers[0]), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            running = [stage.workers]
+            threads.extend(
+                Thread(
+                    target=self._work,
+                    args=(stage, queues[i], queues[i + 1], running, workers[i + 1]),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                for n in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+        output = queues[-1]
+        finished = False
+        try:
+            while (result := output.get()) is not _DONE:
+                yield result
+            finished = True
+        finally:
+            if not finished:  # consumer stopped early or failed
+                self._stopped.set()
+                while output.get() is not _DONE:
+                    pass
+            for thread in threads:
+                thread.join()
+            logger.info(f"pipeline stats: {dict(self.stats)}")
+        if self._error is not None:
+            raise self._error
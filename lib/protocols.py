@@ -20,6 +20,8 @@ class ProtoSheet(Protocol):
 
     def update_cell(self, row: int, col: int, value: str) -> dict[str, Any]: ...
 
+    def batch_update(self, data: list[dict[str, Any]]) -> Any: ...
+
     def append_row(self, row: RowT) -> None: ...
 
     def append_rows(self, rows: RowsT) -> None: ...
@@ -37,6 +39,9 @@ class ProtoDocument(Protocol):
     @property
     def title(self) -> str: ...
 
+    @property
+    def url(self) -> str: ...
+
     def update_title(self, title: str) -> None: ...
 
     def add_worksheet(
@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+from dataclasses import field
+from math import inf
+from threading import Lock
+from time import monotonic
+from time import sleep
+from typing import Callable
+
+from lib.environment import get_env_variable
+
+
+@dataclass(slots=True)
+class TokenBucket:
+    """Rate limiter that allows `rate` calls per second on average and bursts up to `capacity`.
+
+    Callers that have to wait reserve their tokens first and sleep outside the
+    lock, so concurrent threads are served in order of arrival.
+    """
+
+    rate: float
+    capacity: float = 1.0
+    clock: Callable[[], float] = field(default=monotonic, repr=False)
+    sleep: Callable[[float], None] = field(default=sleep, repr=False)
+    _tokens: float | None = field(default=None, repr=False)  # full until the first call
+    _updated_at: float = field(default=0.0, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    @classmethod
+    def per_minute(cls, count: int, burst: int = 1) -> "TokenBucket":
+        return cls(rate=count / 60, capacity=burst)
+
+    @classmethod
+    def unlimited(cls) -> "TokenBucket":
+        return cls(rate=inf)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens, waiting until they are available. Returns seconds waited."""
+        if self.rate == inf:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            if self._tokens is None:
+                self._tokens = self.capacity
+            else:
+                elapsed = now - self._updated_at
+                self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+def smtp_rate_limit() -> TokenBucket:
+    """By default the same pace as one email every 3 seconds, with short bursts."""
+    return TokenBucket.per_minute(
+        count=get_env_variable(int, "SMTP_PER_MINUTE", 20),
+        burst=get_env_variable(int, "SMTP_BURST", 5),
+    )
+
+
+def sheets_rate_limit() -> TokenBucket:
+    """Sheets API allows 60 write requests per minute per user."""
+    return TokenBucket.per_minute(
+        count=get_env_variable(int, "SHEETS_WRITES_PER_MINUTE", 60),
+        burst=get_env_variable(int, "SHEETS_BURST", 10),
+    )
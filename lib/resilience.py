@@ -0,0 +1,199 @@
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from random import random
+from smtplib import SMTPAuthenticationError
+from smtplib import SMTPConnectError
+from smtplib import SMTPHeloError
+from smtplib import SMTPRecipientsRefused
+from smtplib import SMTPSenderRefused
+from threading import Lock
+from time import monotonic
+from time import sleep
+from typing import Callable
+from typing import TypeVar
+
+from gspread.exceptions import APIError
+
+from lib.environment import get_env_variable
+from lib.logging import logger
+
+T = TypeVar("T")
+PROBE_INTERVAL = 1.0  # seconds between checks while another caller probes the upstream
+
+
+class ConnectError(OSError):
+    """Connecting or logging in failed without a reply from the server, nothing was sent."""
+
+
+def is_transient_smtp_error(error: Exception) -> bool:
+    """Failures before the message data is sent: connecting, logging in, 4xx to MAIL or RCPT.
+
+    A dropped connection or a timeout later, and any reply to DATA, may come
+    after the server has accepted the message, so they are never retried.
+    """
+    if isinstance(error, ConnectError):
+        return True
+    if isinstance(error, (SMTPConnectError, SMTPHeloError, SMTPAuthenticationError)):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, SMTPSenderRefused):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    return False
+
+
+def is_transient_sheets_error(error: Exception) -> bool:
+    """Quota errors, server errors and network errors of requests, which are OSError."""
+    if isinstance(error, APIError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, OSError)
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """Seconds from Retry-After header of gspread APIError, dates are not supported."""
+    if not isinstance(error, APIError):
+        return None
+    try:
+        return float(error.response.headers["Retry-After"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class CircuitBreaker:
+    """Pauses every caller for `reset_seconds` after `failure_threshold` failures in a row.
+
+    When the pause is over, one caller probes the upstream while others
+    wait. Success closes the circuit, failure opens it again.
+    """
+
+    failure_threshold: int = 5
+    reset_seconds: float = 30.0
+    clock: Callable[[], float] = field(default=monotonic, repr=False)
+    sleep: Callable[[float], None] = field(default=sleep, repr=False)
+    stats: Counter[str] = field(default_factory=Counter, repr=False)
+    _failures: int = field(default=0, repr=False)
+    _opened_until: float | None = field(default=None, repr=False)
+    _probing: bool = field(default=False, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_until is not None
+
+    def wait(self) -> float:
+        """Sleep while the circuit is open or being probed. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                if self._opened_until is None:
+                    return waited
+                delay = self._opened_until - self.clock()
+                if delay <= 0:
+                    if not self._probing:
+                        self._probing = True
+                        return waited
+                    delay = PROBE_INTERVAL
+                self.stats["circuit_waits"] += 1
+            self.sleep(delay)
+            waited += delay
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._opened_until is not None:
+                logger.info("circuit closed, upstream is available again")
+            self._opened_until = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_until = self.clock() + self.reset_seconds
+                self._probing = False
+                self.stats["circuit_opened"] += 1
+                logger.warning(
+                    f"circuit opened after {self._failures} failures in a row, "
+                    f"calls are paused for {self.reset_seconds}s"
+                )
+
+
+@dataclass(slots=True)
+class Retry:
+    """Calls a function again after transient errors with exponential backoff and full jitter.
+
+    Retry-After of the error is used instead of the backoff if it is
+    known. Errors are counted by the circuit breaker, which can be shared
+    between several Retry instances of one upstream.
+    """
+
+    name: str
+    is_transient: Callable[[Exception], bool]
+    attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    get_retry_after: Callable[[Exception], float | None] = get_retry_after
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    sleep: Callable[[float], None] = field(default=sleep, repr=False)
+    random: Callable[[], float] = field(default=random, repr=False)
+    stats: Counter[str] = field(default_factory=Counter, repr=False)
+
+    def get_delay(self, attempt: int, error: Exception) -> float:
+        if (retry_after := self.get_retry_after(error)) is not None:
+            return retry_after
+        return self.random() * min(self.max_delay, self.base_delay * 2**attempt)
+
+    def call(self, func: Callable[..., T], *args: object, **kwargs: object) -> T:
+        attempt = 0
+        while True:
+            self.breaker.wait()
+            self.stats["calls"] += 1
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                if not self.is_transient(error):
+                    self.breaker.record_success()  # upstream has answered
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 >= self.attempts:
+                    self.stats["gave_up"] += 1
+                    raise
+                delay = self.get_delay(attempt, error)
+                self.stats["retries"] += 1
+                logger.warning(f"{self.name}: {error!r}, retry {attempt + 1} in {delay:.1f}s")
+                self.sleep(delay)
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+
+    def get_stats(self) -> dict[str, int]:
+        return dict(self.stats + self.breaker.stats)
+
+
+def smtp_retry() -> Retry:
+    return Retry(
+        name="smtp",
+        is_transient=is_transient_smtp_error,
+        attempts=get_env_variable(int, "SMTP_RETRY_ATTEMPTS", 5),
+        breaker=CircuitBreaker(
+            failure_threshold=get_env_variable(int, "SMTP_CIRCUIT_FAILURES", 5),
+            reset_seconds=get_env_variable(float, "SMTP_CIRCUIT_RESET_SECONDS", 60),
+        ),
+    )
+
+
+def sheets_retry() -> Retry:
+    """Backoff recommended for Sheets API quota errors: 1, 2, 4 ... up to 64 seconds."""
+    return Retry(
+        name="sheets",
+        is_transient=is_transient_sheets_error,
+        attempts=get_env_variable(int, "SHEETS_RETRY_ATTEMPTS", 7),
+        max_delay=64.0,
+        breaker=CircuitBreaker(
+            failure_threshold=get_env_variable(int, "SHEETS_CIRCUIT_FAILURES", 5),
+            reset_seconds=get_env_variable(float, "SHEETS_CIRCUIT_RESET_SECONDS", 60),
+        ),
+    )
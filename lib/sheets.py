@@ -1,7 +1,9 @@
+import json
 import re
 from dataclasses import dataclass
 from datetime import date
 from typing import Iterable
+from typing import Iterator
 
 from gspread import Spreadsheet
 from gspread import Worksheet
@@ -11,6 +13,7 @@ from gspread.exceptions import APIError
 from lib.const import NAME2MONTH
 from lib.logging import logger
 from lib.participants import Participant
+from lib.protocols import RowsT
 
 FIX_API_ERROR_MESSAGE = """You have to add permissions to spreadsheet.
 Fix APIError:
@@ -19,6 +22,8 @@ Share > Get Link > Change > Anyone with link > Editor
 
 """
 PARTICIPANTS = "Form Responses 1"
+# Sheets API recommends at most 2 MB per request, rows are sized as JSON
+MAX_PAYLOAD_BYTES = 2 * 1024**2
 
 RE_DATE = r"(\d{1,2})"
 RE_MONTH = r"(\w+)"
@@ -151,3 +156,22 @@ def open_spreadsheet(url: str) -> Spreadsheet:
     ).open_by_url(url)
     ensure_permissions(document)
     return document
+
+
+def chunk_rows(
+    rows: Iterable[list[str]],
+    max_rows: int,
+    max_bytes: int = MAX_PAYLOAD_BYTES,
+) -> Iterator[RowsT]:
+    """Split rows into chunks of at most `max_rows` rows and about `max_bytes` of JSON."""
+    chunk: RowsT = []
+    size = 0
+    for row in rows:
+        row_size = len(json.dumps(row, ensure_ascii=False).encode()) + 1
+        if chunk and (len(chunk) >= max_rows or size + row_size > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield chunk
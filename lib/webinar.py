@@ -1,25 +1,74 @@
 from dataclasses import dataclass
+from dataclasses import field
 from datetime import date
+from email.utils import make_msgid
 from functools import cached_property
+from itertools import islice
 from pathlib import Path
-from time import sleep
+from smtplib import SMTPRecipientsRefused
+from smtplib import SMTPResponseException
+from time import time
 from typing import Iterable
+from typing import Iterator
 
 from gspread import Spreadsheet
 from gspread import Worksheet
 from gspread.exceptions import WorksheetNotFound
 
+from lib.clients.email import RetryingEmailClient
+from lib.domain.certificate.cache import CertificateCache
+from lib.domain.certificate.model import Certificate
+from lib.domain.certificate.proof import ProofSheet
+from lib.domain.certificate.serializer.profiles import DEFAULT_PROFILE
 from lib.domain.certificate.service import CertificateService
+from lib.domain.certificate.service import render_certificate
 from lib.domain.contact.service import ContactService
+from lib.domain.email.accounts import NoSenderAvailableError
+from lib.domain.email.accounts import SenderPool
+from lib.domain.email.planner import SendPlan
+from lib.domain.email.planner import SendPlanner
+from lib.domain.email.repository import DAY_SECONDS
+from lib.domain.email.repository import SenderUsageRepository
 from lib.domain.email.service import EmailService
+from lib.domain.job.model import SendJob
+from lib.domain.job.repository import SendJobRepository
+from lib.domain.outbox.model import OutboxMessage
+from lib.domain.outbox.model import OutboxStatus
+from lib.domain.outbox.repository import OutboxRepository
 from lib.domain.webinar.enums import WebinarTitle
 from lib.logging import logger
 from lib.participants import Participant
+from lib.pipeline import Pipeline
+from lib.pipeline import Stage
+from lib.protocols import RowsT
+from lib.rate_limit import TokenBucket
+from lib.rate_limit import sheets_rate_limit
+from lib.rate_limit import smtp_rate_limit
+from lib.resilience import Retry
+from lib.resilience import sheets_retry
 from lib.sheets import Sheet
+from lib.sheets import chunk_rows
 
 CERTIFICATES = "mailing"
 PARTICIPANTS = "Form Responses 1"
 DIR_MODE = 0o660
+IS_SENT_COLUMN = "C"
+SHEET_SYNC_BATCH_SIZE = 50
+FILL_CHUNK_ROWS = 500
+
+
+@dataclass(frozen=True, slots=True)
+class MailingRow:
+    row_number: int
+    fio: str
+    email: str
+    message: str
+
+    def to_outbox(self) -> OutboxMessage:
+        return OutboxMessage(fio=self.fio, email=self.email)
+
+
+RenderedRowT = tuple[MailingRow, Certificate, bytes]
 
 
 @dataclass(frozen=True)
@@ -32,9 +81,31 @@ class Webinar:
     certificate_service: CertificateService
     contact_service: ContactService
     email_service: EmailService
+    render_workers: int = 1
+    send_workers: int = 1
+    email_rate_limit: TokenBucket = field(default_factory=smtp_rate_limit)
+    sheet_rate_limit: TokenBucket = field(default_factory=sheets_rate_limit)
+    fill_chunk_rows: int = FILL_CHUNK_ROWS
+    # transient Sheets API errors of the mailing sheet are retried with backoff
+    sheet_retry: Retry = field(default_factory=sheets_retry)
+    # progress of send is kept here if set, the sheet is updated from it in batches
+    outbox: OutboxRepository | None = None
 
     @classmethod
-    def from_url(cls, url: str, test: bool = False) -> "Webinar":
+    def from_url(
+        cls,
+        url: str,
+        test: bool = False,
+        profile: str = DEFAULT_PROFILE,
+        workers: int = 1,
+        cache: CertificateCache | None = None,
+        scale: float = 1.0,
+        render_workers: int = 1,
+        send_workers: int = 1,
+        outbox: OutboxRepository | None = None,
+        sender_usage: SenderUsageRepository | None = None,
+        fill_chunk_rows: int = FILL_CHUNK_ROWS,
+    ) -> "Webinar":
         logger.debug("creating webinar")
         sheet = Sheet.from_url(url)
         title = WebinarTitle.from_text(sheet.get_webinar_title())
@@ -42,17 +113,33 @@ class Webinar:
         finished_at = sheet.get_finished_at()
         if test:
             email_sertice = EmailService.with_test_client()
+            email_rate_limit = TokenBucket.unlimited()
         else:
-            email_sertice = EmailService()
+            email_sertice = EmailService(
+                email_client=RetryingEmailClient(
+                    SenderPool.from_environment(connections=send_workers, usage=sender_usage)
+                ),
+            )
+            email_rate_limit = smtp_rate_limit()
         return cls(
             document=sheet.document,
             participants=sheet.participants,
             title=title,
             started_at=started_at,
             finished_at=finished_at,
-            certificate_service=CertificateService(),
+            certificate_service=CertificateService.from_profile(
+                profile,
+                workers=workers,
+                cache=cache,
+                scale=scale,
+            ),
             contact_service=ContactService(),
             email_service=email_sertice,
+            render_workers=render_workers,
+            send_workers=send_workers,
+            email_rate_limit=email_rate_limit,
+            outbox=outbox,
+            fill_chunk_rows=fill_chunk_rows,
         )
 
     @cached_property
@@ -69,42 +156,317 @@ class Webinar:
             )
 
     def certificates_sheet_fill(self) -> None:
+        """Write all participants with a few requests of `fill_chunk_rows` rows."""
         logger.info("filling certificates")
+        rows = []
         for participant in self.participants:
-            logger.info(f"{participant.fio} taken")
             message = f"Здравствуйте, {participant.name}! Благодарю вас за участие."
-            row = [participant.fio, "-", "no", participant.email, message]
-            self.cert_sheet.append_row(row)
-            logger.info(f"{participant.fio} done")
-            sleep(1)  # Quota limit is 60 rpm
+            rows.append([participant.fio, "-", "no", participant.email, message])
+        filled = len(self.sheet_retry.call(self.cert_sheet.get_all_values))
+        for chunk in chunk_rows(rows, max_rows=self.fill_chunk_rows):
+            self.sheet_rate_limit.acquire()
+            self._append_rows(chunk, filled)
+            filled += len(chunk)
+            logger.info(f"{len(chunk)} rows added, last one is {chunk[-1][0]}")
         logger.info("filling certificates done")
 
-    def send_emails_with_certificates(self) -> None:
-        logger.info("sending emails")
-        for i, row in enumerate(self.cert_sheet.get_all_values()):
-            fio, _, is_email_sent, email, message = row
+    def _append_rows(self, rows: RowsT, filled: int) -> None:
+        """Append `rows` after `filled` rows of the sheet, retries do not add them twice.
+
+        A request that failed may still have been applied, so before the
+        next attempt the rows are counted again.
+        """
+        attempts = 0
+
+        def append() -> None:
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1 and len(self.cert_sheet.get_all_values()) >= filled + len(rows):
+                logger.warning(f"{len(rows)} rows were added by the failed request")
+                return
+            self.cert_sheet.append_rows(rows)
+
+        self.sheet_retry.call(append)
+
+    def _get_rows_to_send(self, values: RowsT) -> Iterator[MailingRow]:
+        outbox = {} if self.outbox is None else self.outbox.get_all(self.document.url)
+        taken: set[tuple[str, str]] = set()
+        for i, (fio, _, is_email_sent, email, message) in enumerate(values):
             logger.debug(f"{fio} taken")
             if is_email_sent == "yes":
                 logger.debug(f"{fio} do not need to send email")
                 continue
-            certificate = self.certificate_service.generate(
-                title=self.title,
-                started_at=self.started_at,
-                finished_at=self.finished_at,
-                name=fio,
-            )
-            logger.info(f"{fio} sending email to {email}")
+            if self.outbox is not None and (fio, email) in taken:
+                # the outbox keeps one message per participant, so the first row is sent only
+                logger.warning(f"{fio} <{email}> is repeated in row {i + 1}, the row is skipped")
+                continue
+            taken.add((fio, email))
+            row = MailingRow(row_number=i + 1, fio=fio, email=email, message=message)
+            status = outbox[fio, email].status if (fio, email) in outbox else None
+            if status == OutboxStatus.SENT:
+                logger.debug(f"{fio} email is already sent, the sheet is not synced yet")
+            elif status == OutboxStatus.SENDING:
+                message_id = outbox[fio, email].message_id
+                logger.warning(f"{fio} email {message_id} may be sent, check it and requeue")
+            else:
+                yield row
+
+    def _render_row(self, row: MailingRow) -> RenderedRowT:
+        certificate = self.generate_certificate(row.fio)
+        return row, certificate, render_certificate(certificate)
+
+    def _send_row(self, rendered: RenderedRowT) -> MailingRow:
+        row, certificate, content = rendered
+        self.email_rate_limit.acquire()
+        message_id = None
+        if self.outbox is not None:
+            message_id = make_msgid()
+            if not self.outbox.start(self.document.url, row.to_outbox(), message_id):
+                raise RuntimeError(f"{row.fio} is not queued in the outbox")
+        logger.info(f"{row.fio} sending email to {row.email}")
+        try:
             self.email_service.send_certificate_email(
                 title=self.title,
+                email=row.email,
+                message=row.message,
+                certificate=certificate,
+                content=content,
+                message_id=message_id,
+            )
+        except (SMTPResponseException, SMTPRecipientsRefused, NoSenderAvailableError) as error:
+            # the server or the sender pool refused the email, so it can be sent again
+            if self.outbox is not None:
+                self.outbox.release(self.document.url, row.to_outbox(), repr(error))
+            raise
+        if self.outbox is not None:
+            self.outbox.complete(self.document.url, row.to_outbox())
+        self.email_service.add_to_digest(row.email, certificate)
+        return row
+
+    def _mark_rows_sent(self, rows: list[MailingRow]) -> None:
+        """Write is_sent of all `rows` with one request."""
+        if not rows:
+            return
+        self.sheet_rate_limit.acquire()
+        self.sheet_retry.call(
+            self.cert_sheet.batch_update,
+            [{"range": f"{IS_SENT_COLUMN}{row.row_number}", "values": [["yes"]]} for row in rows],
+        )
+        if self.outbox is not None:
+            self.outbox.mark_synced(self.document.url, (row.to_outbox() for row in rows))
+        logger.debug(f"{len(rows)} rows marked as sent")
+
+    def _mark_rows_sent_in_batches(self, rows: list[MailingRow]) -> None:
+        for start in range(0, len(rows), SHEET_SYNC_BATCH_SIZE):
+            end = start + SHEET_SYNC_BATCH_SIZE
+            self._mark_rows_sent(rows[start:end])
+
+    def _mark_rows_sent_after_error(self, rows: list[MailingRow]) -> None:
+        """Mark rows while an error is raised, a failure here must not replace that error."""
+        try:
+            self._mark_rows_sent(rows)
+        except Exception:
+            logger.exception(f"{len(rows)} sent rows are not marked, sync marks them later")
+
+    def sync_outbox(self, values: RowsT | None = None) -> int:
+        """Mark rows of emails sent by previous runs in the sheet, returns number of rows."""
+        if self.outbox is None:
+            return 0
+        if values is None:
+            values = self.sheet_retry.call(self.cert_sheet.get_all_values)
+        outbox = self.outbox.get_all(self.document.url)
+        rows = [
+            MailingRow(row_number=i + 1, fio=fio, email=email, message=message)
+            for i, (fio, _, is_email_sent, email, message) in enumerate(values)
+            if (fio, email) in outbox
+            and outbox[fio, email].status == OutboxStatus.SENT
+            and not outbox[fio, email].synced
+            and is_email_sent != "yes"
+        ]
+        self._mark_rows_sent_in_batches(rows)
+        # rows that are already marked or removed from the sheet need no sync
+        self.outbox.mark_synced(
+            self.document.url,
+            (message for message in outbox.values() if message.status == OutboxStatus.SENT),
+        )
+        counts = self.outbox.count_by_status(self.document.url)
+        logger.info(f"{len(rows)} sent rows synced, outbox by status: {counts}")
+        return len(rows)
+
+    def plan_send(
+        self,
+        planner: SendPlanner,
+        usage: SenderUsageRepository,
+        now: float | None = None,
+    ) -> SendPlan:
+        """Spread rows that are not sent yet over time windows within sending quotas."""
+        now = time() if now is None else now
+        values = self.sheet_retry.call(self.cert_sheet.get_all_values)
+        pending = sum(1 for _ in self._get_rows_to_send(values))
+        plan = planner.plan(pending, usage.get_sent_times(now - DAY_SECONDS), now)
+        logger.info(
+            f"{pending} emails pending, {plan.budget} can be sent now, "
+            f"last ones are sent after {plan.last_start}"
+        )
+        return plan
+
+    def send_emails_with_certificates(self, limit: int | None = None) -> int:
+        """Rows are rendered and sent by separate stages, so rendering and uploads overlap.
+
+        Stages are connected by bounded queues with `render_workers` and
+        `send_workers` threads. Sent rows are marked in the sheet by the
+        current thread only. If a stage fails, rows that were not sent yet
+        are dropped, the sent ones are marked and the error is raised.
+
+        With `outbox` every email is recorded before and after it is sent,
+        so a run that was interrupted resumes without sending anything
+        twice, and rows are marked in the sheet `SHEET_SYNC_BATCH_SIZE` at
+        a time. Without it, every row is marked as soon as it is sent.
+
+        At most `limit` emails are sent, e.g. the budget of `plan_send`, the
+        rest of the rows are left for the next run. Returns the number sent.
+        """
+        logger.info("sending emails")
+        values = self.sheet_retry.call(self.cert_sheet.get_all_values)
+        if self.outbox is not None:
+            self.sync_outbox(values)
+            added = self.outbox.add(
+                self.document.url,
+                (
+                    OutboxMessage(fio, email)
+                    for fio, _, is_sent, email, _ in values
+                    if is_sent != "yes"
+                ),
+            )
+            logger.info(f"{added} emails added to the outbox")
+        pipeline = Pipeline(
+            [
+                Stage("render", func=self._render_row, workers=self.render_workers),
+                Stage("send", func=self._send_row, workers=self.send_workers),
+            ]
+        )
+        rows = self._get_rows_to_send(values)
+        if limit is not None:
+            logger.info(f"sending at most {limit} emails")
+            rows = islice(rows, limit)
+        sent: list[MailingRow] = []
+        count = 0
+        try:
+            try:
+                for row in pipeline.run(rows):
+                    logger.info(f"{row.fio} done")
+                    count += 1
+                    if self.outbox is None:
+                        self.sheet_rate_limit.acquire()
+                        self.sheet_retry.call(self.cert_sheet.update_cell, row.row_number, 3, "yes")
+                        continue
+                    sent.append(row)
+                    if len(sent) >= SHEET_SYNC_BATCH_SIZE:
+                        self._mark_rows_sent(sent)
+                        sent = []
+                self.email_service.send_bcc_digest()
+            except BaseException:
+                self._mark_rows_sent_after_error(sent)
+                raise
+            self._mark_rows_sent(sent)
+        finally:
+            self.email_service.close()
+        self.certificate_service.log_stats()
+        logger.info(f"sheets retry stats: {self.sheet_retry.get_stats()}")
+        logger.info(f"sending emails done, {count} sent")
+        return count
+
+    def enqueue_send_jobs(self, repository: SendJobRepository) -> int:
+        """Put rows that are not sent yet into the job queue for `worker` processes."""
+        logger.info("enqueueing send jobs")
+        jobs = [
+            SendJob(
+                url=self.document.url,
+                row_number=i + 1,
+                fio=fio,
                 email=email,
                 message=message,
-                certificate=certificate,
+                title=self.title,
+                started_at=self.started_at,
+                finished_at=self.finished_at,
+            )
+            for i, (fio, _, is_email_sent, email, message) in enumerate(
+                self.cert_sheet.get_all_values()
             )
-            row_number = i + 1
-            self.cert_sheet.update_cell(row_number, 3, "yes")
-            logger.info(f"{fio} done")
-            sleep(3)
-        logger.info("sending emails done")
+            if is_email_sent != "yes"
+        ]
+        added = repository.enqueue(jobs)
+        logger.info(f"enqueued {added} send jobs, {len(jobs) - added} already in the queue")
+        return added
+
+    def sync_send_jobs(self, repository: SendJobRepository) -> int:
+        """Mark rows sent by workers in the mailing sheet, only this process writes to it.
+
+        Workers do not send BCC digests, the digest of the synced rows is sent here.
+        """
+        jobs = repository.get_unsynced_done(self.document.url)
+        rows = [
+            MailingRow(row_number=job.row_number, fio=job.fio, email=job.email, message=job.message)
+            for job in jobs
+        ]
+        self._mark_rows_sent_in_batches(rows)
+        for job in jobs:
+            self.email_service.add_to_digest(job.email, self.generate_certificate(job.fio))
+        try:
+            self.email_service.send_bcc_digest()
+        finally:
+            self.email_service.close()
+        repository.mark_synced(jobs)
+        counts = repository.count_by_status(self.document.url)
+        logger.info(f"{len(jobs)} sent rows synced, jobs by status: {counts}")
+        return len(jobs)
+
+    def generate_certificate(self, fio: str) -> Certificate:
+        return self.certificate_service.generate(
+            title=self.title,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            name=fio,
+        )
+
+    def prerender_certificates(self) -> None:
+        logger.info("prerendering certificates")
+        certificates = [
+            self.generate_certificate(fio)
+            for fio, _, is_email_sent, *_ in self.cert_sheet.get_all_values()
+            if is_email_sent != "yes"
+        ]
+        self.certificate_service.prerender(certificates)
+        self.certificate_service.log_stats()
+        logger.info("prerendering certificates done")
+
+    def save_certificates_roster(self, path: Path) -> Path:
+        logger.info("saving certificates roster")
+        certificates = [
+            self.generate_certificate(fio) for fio, *_ in self.cert_sheet.get_all_values()
+        ]
+        with open(path, "wb") as fd:
+            self.certificate_service.write_roster(fd, certificates)
+        logger.info(f"certificates roster saved to {path}")
+        return path
+
+    def save_proof_sheet(self, path: Path, proof: ProofSheet | None = None) -> Path:
+        """Thumbnails of all certificates, one PDF for .pdf `path`, PNG pages in it otherwise."""
+        logger.info("saving certificates proof sheet")
+        proof = proof or ProofSheet()
+        certificates = (
+            self.generate_certificate(fio) for fio, *_ in self.cert_sheet.get_all_values()
+        )
+        tiles = (
+            (certificate.name, content)
+            for certificate, content in self.certificate_service.render_batch(certificates)
+        )
+        if path.suffix == ".pdf":
+            pages = proof.write_pdf(path, tiles)
+        else:
+            pages = len(proof.write_images(path, tiles))
+        logger.info(f"certificates proof sheet saved to {path}, {pages} pages")
+        return path
 
     def get_group_name(self) -> str:
         short_title = {
@@ -1,17 +1,28 @@
+from base64 import b64encode
+from hashlib import sha256
+from smtplib import SMTP as SMTPConnection
+from smtplib import SMTPServerDisconnected
 from typing import Generator
 from unittest.mock import Mock
 from unittest.mock import patch
 
 import pytest
+from yagmail import SMTP
 
+from lib.clients.email import Attachment
+from lib.clients.email import AttachmentDigest
 from lib.clients.email import GMailClient
 from lib.clients.email import TestEmailClient
+from lib.resilience import ConnectError
 from tests.common import randstr
 
 
 @pytest.fixture
 def smtp_mock() -> Generator[Mock, None, None]:
     with patch("lib.clients.email.SMTP") as smtp_mock:
+        smtp_mock.return_value.user = "sender@gmail.com"
+        smtp_mock.return_value.prepare_send.return_value = (["to@gmail.com"], "message")
+        smtp_mock.return_value.smtp.noop.return_value = (250, b"OK")
         yield smtp_mock
 
 
@@ -34,7 +45,14 @@ def test_gmail_creates_smtp_with_correct_credentials(smtp_mock: Mock) -> None:
     user = randstr()
     password = randstr()
     GMailClient(user=user, password=password).send(to="")
-    smtp_mock.assert_called_once_with(user=user, password=password)
+    smtp_mock.assert_called_once_with(
+        user=user,
+        password=password,
+        host="smtp.gmail.com",
+        port=465,
+        smtp_ssl=True,
+        smtp_starttls=False,
+    )
 
 
 def test_gmail_uses_same_connection_for_all_sends(
@@ -43,7 +61,99 @@ def test_gmail_uses_same_connection_for_all_sends(
 ) -> None:
     gmail.send(to="")
     gmail.send(to="")
-    assert smtp_mock.return_value.send.call_count == 2
+    smtp_mock.return_value.login.assert_called_once_with()
+    assert smtp_mock.return_value.smtp.sendmail.call_count == 2
+    assert gmail.stats["opened"] == 1
+    assert gmail.stats["sent"] == 2
+
+
+def test_gmail_reconnects_when_server_drops_connection(
+    smtp_mock: Mock,
+    gmail: GMailClient,
+) -> None:
+    smtp_mock.return_value.smtp.sendmail.side_effect = [SMTPServerDisconnected(), {}]
+    gmail.send(to="")
+    assert smtp_mock.return_value.login.call_count == 2
+    smtp_mock.return_value.close.assert_called_once_with()
+    assert gmail.stats["reconnects"] == 1
+    assert gmail.stats["sent"] == 1
+
+
+def drop_during_data(*args: object) -> None:
+    connection = Mock(spec=SMTPConnection)
+    connection.getreply.side_effect = SMTPServerDisconnected("Connection unexpectedly closed")
+    SMTPConnection.data(connection, "message")
+
+
+def test_gmail_does_not_resend_when_connection_drops_during_data(
+    smtp_mock: Mock,
+    gmail: GMailClient,
+) -> None:
+    smtp_mock.return_value.smtp.sendmail.side_effect = drop_during_data
+    with pytest.raises(SMTPServerDisconnected):
+        gmail.send(to="")
+    smtp_mock.return_value.smtp.sendmail.assert_called_once()
+    smtp_mock.return_value.close.assert_called_once_with()
+    assert gmail.stats["dropped"] == 1
+    assert gmail.stats["sent"] == 0
+
+
+def test_gmail_marks_failed_connect_as_not_sent(smtp_mock: Mock, gmail: GMailClient) -> None:
+    smtp_mock.return_value.login.side_effect = ConnectionRefusedError()
+    with pytest.raises(ConnectError) as error:
+        gmail.send(to="")
+    assert isinstance(error.value.__cause__, ConnectionRefusedError)
+    smtp_mock.return_value.smtp.sendmail.assert_not_called()
+
+
+def test_gmail_checks_idle_connection_with_noop(smtp_mock: Mock) -> None:
+    gmail = GMailClient(user="", password="")
+    gmail.send(to="")
+    with gmail.pool.session() as session:
+        session.keepalive_seconds = 0
+        session._used_at = -1.0  # pylint: disable=protected-access
+    gmail.send(to="")
+    smtp_mock.return_value.smtp.noop.assert_called_once_with()
+    assert gmail.stats["opened"] == 1
+    smtp_mock.return_value.smtp.noop.side_effect = SMTPServerDisconnected()
+    with gmail.pool.session() as session:
+        session._used_at = -1.0  # pylint: disable=protected-access
+    gmail.send(to="")
+    smtp_mock.return_value.close.assert_called_once_with()
+    assert gmail.stats["opened"] == 2
+    assert gmail.stats["reconnects"] == 1
+
+
+def test_gmail_close_closes_connection_and_next_send_opens_it(
+    smtp_mock: Mock,
+    gmail: GMailClient,
+) -> None:
+    gmail.send(to="")
+    gmail.close()
+    smtp_mock.return_value.close.assert_called_once_with()
+    gmail.send(to="")
+    assert gmail.stats["opened"] == 2
+
+
+def test_gmail_opens_up_to_pool_size_connections(smtp_mock: Mock) -> None:
+    gmail = GMailClient(user="", password="", connections=2)
+    with gmail.pool.session() as first, gmail.pool.session() as second:
+        assert first is not second
+    with gmail.pool.session() as session:
+        assert session is first  # returned last, so it is the most recently used
+    assert gmail.pool._created == 2  # pylint: disable=protected-access
+
+
+def test_gmail_close_keeps_sessions_in_use_counted(smtp_mock: Mock) -> None:
+    gmail = GMailClient(user="", password="", connections=2)
+    with gmail.pool.session():
+        with gmail.pool.session():
+            pass
+        gmail.close()
+        assert gmail.pool._created == 1  # pylint: disable=protected-access
+    with gmail.pool.session() as first, gmail.pool.session() as second:
+        assert first is not second
+    assert gmail.pool._created == 2  # pylint: disable=protected-access
 
 
 def test_gmail_calls_smtp_send_with_correct_arguments(
@@ -55,19 +165,27 @@ def test_gmail_calls_smtp_send_with_correct_arguments(
     subject = randstr()
     contents = randstr()
     attachments = [randstr(), randstr()]
+    message_id = f"<{randstr()}@gmail.com>"
     gmail.send(
         to=to,
         bcc=bcc,
         subject=subject,
         contents=contents,
         attachments=attachments,
+        message_id=message_id,
     )
-    smtp_mock.return_value.send.assert_called_once_with(
+    smtp_mock.return_value.prepare_send.assert_called_once_with(
         to=to,
         bcc=bcc,
         subject=subject,
         contents=contents,
         attachments=attachments,
+        message_id=message_id,
+    )
+    smtp_mock.return_value.smtp.sendmail.assert_called_once_with(
+        "sender@gmail.com",
+        ["to@gmail.com"],
+        "message",
     )
 
 
@@ -82,3 +200,47 @@ def test_mailstub_keeps_all_calls(size: int) -> None:
     for email in emails:
         assert mail_stub.is_sent_to(to=email)
         assert mail_stub.sent_count(to=email) == 1
+
+
+def test_gmail_sends_in_memory_attachment_with_its_name() -> None:
+    content = randstr().encode()
+    attachment = Attachment("certificate.png", content)
+    smtp = SMTP(user="sender@gmail.com", password="", soft_email_validation=False)
+    _, message = smtp.prepare_send(to="to@gmail.com", attachments=[attachment])
+    assert "Content-Type: image/png; name*=utf-8''certificate.png" in message
+    assert b64encode(content).decode() in message
+
+
+def test_test_client_indexes_emails_by_recipient() -> None:
+    client = TestEmailClient(max_calls=2)
+    for i in range(5):
+        client.send(to=f"{i % 2}@ya.ru", attachments=[Attachment(f"{i}.png", b"png")])
+    assert client.total_send_count == 5
+    assert client.sent_count("0@ya.ru") == 3
+    assert client.is_sent_to("1@ya.ru")
+    assert not client.is_sent_to("2@ya.ru")
+    names = [attachment.name for attachment in client.get_attachments("1@ya.ru")]  # type: ignore
+    assert names == ["1.png", "3.png"]
+    assert [call["to"] for call in client.get_calls()] == ["1@ya.ru", "0@ya.ru"]
+
+
+def test_test_client_keeps_attachments_of_last_recipients() -> None:
+    client = TestEmailClient(max_calls=2)
+    for i in range(3):
+        client.send(to=f"{i}@ya.ru", attachments=[Attachment(f"{i}.png", b"png")])
+    client.send(to="1@ya.ru")
+    assert client.get_attachments("0@ya.ru") == []
+    assert client.sent_count("0@ya.ru") == 1
+    assert len(client.get_attachments("1@ya.ru")) == 1
+    assert [call["to"] for call in client.get_calls(to="1@ya.ru")] == ["1@ya.ru"]
+
+
+def test_test_client_keeps_only_attachment_digests() -> None:
+    client = TestEmailClient(keep_attachments=False)
+    client.send(to="a@ya.ru", attachments=[Attachment("certificate.png", b"png")])
+    (digest,) = client.get_attachments("a@ya.ru")
+    assert digest == AttachmentDigest(
+        name="certificate.png",
+        size=3,
+        sha256=sha256(b"png").hexdigest(),
+    )
@@ -0,0 +1,51 @@
+from email import message_from_string
+from email.message import Message
+
+from lib.clients.mime import EncodedAttachment
+from lib.clients.mime import MessageTemplate
+
+
+def get_parts(message: Message) -> list[Message]:
+    return [part for part in message.walk() if not part.is_multipart()]
+
+
+def get_content(part: Message) -> bytes:
+    payload = part.get_payload(decode=True)
+    assert isinstance(payload, bytes)
+    return payload
+
+
+def test_rendered_message_is_parsed_by_email_package() -> None:
+    template = MessageTemplate(sender="webinar@localhost.test", subject="Тестовый вебинар")
+    content = b"\x89PNG" * 1000
+    message = message_from_string(
+        template.render(
+            to="participant@localhost.test",
+            contents="Здравствуйте!\nСпасибо за участие.",
+            attachments=[EncodedAttachment.from_bytes("Сертификат.png", content)],
+        )
+    )
+    assert not message.defects
+    assert message["To"] == "participant@localhost.test"
+    assert message["Message-ID"].endswith("@localhost.test>")
+    plain, html, attachment = get_parts(message)
+    assert get_content(plain).decode() == "Здравствуйте!\nСпасибо за участие."
+    assert "Спасибо за участие.</div>" in get_content(html).decode()
+    assert attachment.get_content_type() == "image/png"
+    assert attachment.get_filename() == "Сертификат.png"
+    assert get_content(attachment) == content
+
+
+def test_html_body_is_escaped() -> None:
+    template = MessageTemplate(sender="webinar@localhost.test", subject="subject")
+    message = message_from_string(template.render(to="a@b.c", contents="<b>"))
+    _, html = get_parts(message)
+    assert "&lt;b&gt;" in get_content(html).decode()
+
+
+def test_boundaries_are_kept_between_messages() -> None:
+    template = MessageTemplate(sender="webinar@localhost.test", subject="subject")
+    first = message_from_string(template.render(to="a@b.c", contents="1"))
+    second = message_from_string(template.render(to="a@b.c", contents="2"))
+    assert first.get_boundary() == second.get_boundary()
+    assert first["Message-ID"] != second["Message-ID"]
@@ -0,0 +1,80 @@
+from base64 import b64encode
+from smtplib import SMTP
+from smtplib import SMTPDataError
+from typing import Generator
+
+import pytest
+
+from lib.clients.email import Attachment
+from lib.clients.email import SMTPClient
+from lib.clients.smtp_sink import SinkBehaviour
+from lib.clients.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def sink() -> Generator[SMTPSink, None, None]:
+    with SMTPSink(keep_messages=10) as sink:
+        yield sink
+
+
+def send(client: SMTPClient, count: int = 1) -> None:
+    for i in range(count):
+        client.send(
+            to=f"participant{i}@localhost.test",
+            bcc=["bcc@localhost.test"],
+            subject="Тестовый вебинар",
+            contents="Здравствуйте!",
+            attachments=[Attachment("certificate.png", b"\x89PNG" * 100)],
+        )
+
+
+def test_smtp_client_sends_mime_message_to_sink(sink: SMTPSink) -> None:
+    client = SMTPClient(port=sink.port)
+    send(client)
+    client.close()
+    (message,) = sink.messages
+    assert b"certificate.png" in message
+    assert b64encode(b"\x89PNG" * 100)[:64] in message
+    assert sink.stats["messages"] == 1
+    assert sink.stats["recipients"] == 2
+    assert sink.stats["bytes"] > len(b"\x89PNG" * 100)
+
+
+def test_smtp_client_reuses_connection(sink: SMTPSink) -> None:
+    client = SMTPClient(port=sink.port)
+    send(client, count=5)
+    client.close()
+    assert sink.stats["connections"] == 1
+    assert sink.stats["logins"] == 1
+    assert client.stats["opened"] == 1
+
+
+def test_smtp_client_reconnects_when_sink_drops_connection() -> None:
+    with SMTPSink(behaviour=SinkBehaviour(drop_every=2)) as sink:
+        client = SMTPClient(port=sink.port)
+        send(client, count=5)
+        client.close()
+    assert sink.stats["messages"] == 5
+    assert sink.stats["dropped"] == 2
+    assert client.stats["reconnects"] == 2
+
+
+def test_sink_rejects_every_nth_message_with_error_code() -> None:
+    with SMTPSink(behaviour=SinkBehaviour(fail_every=2, error_code=554)) as sink:
+        client = SMTPClient(port=sink.port)
+        send(client)
+        with pytest.raises(SMTPDataError) as error:
+            send(client)
+        client.close()
+    assert error.value.smtp_code == 554
+    assert sink.stats["rejected"] == 1
+
+
+def test_sink_accepts_login_auth(sink: SMTPSink) -> None:
+    with SMTP("127.0.0.1", sink.port) as smtp:
+        smtp.ehlo()
+        smtp.login("user", "password")
+        smtp.user, smtp.password = "user", "password"
+        code, _ = smtp.auth("LOGIN", smtp.auth_login, initial_response_ok=False)
+    assert code == 235
+    assert sink.stats["logins"] == 2
@@ -1,17 +1,29 @@
+import re
 from collections import namedtuple
+from datetime import date
 from datetime import datetime
 from os import urandom
+from typing import Any
 from typing import Callable
 
 from gspread.exceptions import WorksheetNotFound
 
+from lib.clients.email import TestEmailClient
+from lib.domain.certificate.service import CertificateService
+from lib.domain.contact.service import ContactService
+from lib.domain.email.service import EmailService
+from lib.domain.webinar.enums import WebinarTitle
 from lib.participants import GOOGLE_TIMESTAMP_FORMAT
+from lib.participants import Participant
 from lib.protocols import ProtoCell
 from lib.protocols import ProtoDocument
 from lib.protocols import ProtoSheet
 from lib.protocols import RowsT
 from lib.protocols import RowT
+from lib.rate_limit import TokenBucket
 from lib.sheets import open_spreadsheet
+from lib.webinar import PARTICIPANTS
+from lib.webinar import Webinar
 
 cell = namedtuple("cell", ["value"])
 
@@ -113,6 +125,16 @@ class SpreadsheetStub:
         self.row_values(row)[col - 1] = value
         return {}  # mimic gspread
 
+    def batch_update(self, data: list[dict]) -> dict:
+        """Only single cell ranges like "C2" are supported."""
+        for update in data:
+            match = re.fullmatch(r"([A-Z])(\d+)", update["range"])
+            assert match is not None, update["range"]
+            column, row = match.groups()
+            ((value,),) = update["values"]
+            self.update_cell(int(row), ord(column) - ord("A") + 1, value)
+        return {}  # mimic gspread
+
     def get_all_values(self) -> RowsT:
         return self._rows
 
@@ -139,6 +161,10 @@ class WorksheetStub:
     def title(self) -> str:
         return self._title
 
+    @property
+    def url(self) -> str:
+        return f"https://docs.google.com/spreadsheets/d/stub-{id(self)}"
+
     def add_worksheet(
         self,
         title: str,
@@ -169,3 +195,27 @@ def randstr() -> str:
 
 def randint() -> int:
     return int.from_bytes(urandom(4), byteorder="big")
+
+
+def create_stub_webinar(
+    document: ProtoDocument,
+    email_service: EmailService | None = None,
+    **kwargs: Any,
+) -> Webinar:
+    """Test webinar of the participants in `document` with no rate limits."""
+    return Webinar(
+        document=document,  # type: ignore
+        participants=[
+            Participant.from_row(row)
+            for row in document.worksheet(PARTICIPANTS).get_all_values()[1:]
+        ],
+        title=WebinarTitle.TEST,
+        started_at=date(2024, 12, 31),
+        finished_at=date(2025, 1, 1),
+        certificate_service=CertificateService(),
+        contact_service=ContactService(),
+        email_service=email_service or EmailService(email_client=TestEmailClient(), bcc_emails=()),
+        email_rate_limit=TokenBucket.unlimited(),
+        sheet_rate_limit=TokenBucket.unlimited(),
+        **kwargs,
+    )
@@ -1,4 +1,6 @@
+from pathlib import Path
 from typing import Any
+from typing import Iterator
 
 import pytest
 
@@ -26,6 +28,15 @@ def create_sheet(request: Any) -> CreateSheetT:
     return request.param
 
 
+@pytest.fixture(scope="session", autouse=True)
+def template_cache(tmp_path_factory) -> Iterator[Path]:
+    """Raw template copies are written once per session and not into the project."""
+    path = tmp_path_factory.mktemp("templates")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("TEMPLATE_CACHE_PATH", str(path))
+        yield path
+
+
 @pytest.fixture(scope="session")
 def db(tmp_path_factory) -> DB:
     tmp_path = tmp_path_factory.mktemp("data")
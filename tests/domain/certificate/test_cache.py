@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import date
+from io import BytesIO
+from os import utime
+from pathlib import Path
+from typing import IO
+from typing import ClassVar
+
+import pytest
+
+from lib.domain.certificate.cache import CertificateCache
+from lib.domain.certificate.model import Certificate
+from lib.domain.certificate.serializer.cached_serializer import CachedSerializer
+from lib.domain.certificate.service import CertificateService
+from lib.domain.webinar.enums import WebinarTitle
+from tests.common import randstr
+
+
+@dataclass(frozen=True)
+class CountingSerializer:
+    extension: ClassVar[str] = "txt"
+    calls: list[str] = field(default_factory=list, compare=False, repr=False)
+
+    def serialize(
+        self,
+        buffer: IO[bytes],
+        title: str,
+        name: str,
+        date_text: str,
+    ) -> None:
+        self.calls.append(name)
+        buffer.write(f"{title} {name} {date_text}".encode("utf-8"))
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> CertificateCache:
+    return CertificateCache(path=tmp_path, max_size=1024)
+
+
+def test_cache_returns_stored_content(cache: CertificateCache) -> None:
+    key = cache.key(randstr())
+    content = randstr().encode()
+    assert cache.get(key) is None
+    cache.put(key, content)
+    assert cache.contains(key)
+    assert cache.get(key) == content
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_cache_entry_is_written_by_many_threads_at_once(cache: CertificateCache) -> None:
+    key = cache.key(randstr())
+    content = randstr().encode()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: cache.put(key, content), range(50)))
+    assert cache.get(key) == content
+    assert [path.name for path in cache._get_path(key).parent.iterdir()] == [key]
+
+
+def test_cache_size_is_not_counted_twice_for_overwritten_entry(cache: CertificateCache) -> None:
+    key = cache.key(randstr())
+    cache.put(key, b"0123456789")
+    cache.put(key, b"0123456789")
+    cache.put(key, b"01234")
+    assert cache.stats["size"] == 5
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = CertificateCache(path=tmp_path, max_size=25)
+    keys = [cache.key(str(i)) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, b"0123456789")
+        utime(cache._get_path(key), (i, i))
+    cache.get(keys[0])  # the first one is used recently now
+    cache.put(keys[2], b"0123456789")
+    assert cache.contains(keys[0])
+    assert not cache.contains(keys[1])
+    assert cache.contains(keys[2])
+    assert cache.stats["evictions"] == 1
+
+
+def test_cached_serializer_renders_certificate_once(cache: CertificateCache) -> None:
+    inner = CountingSerializer()
+    serializer = CachedSerializer(serializer=inner, cache=cache)
+    buffers = [BytesIO(), BytesIO()]
+    for buffer in buffers:
+        serializer.serialize(buffer, title="title", name="name", date_text="date")
+    assert inner.calls == ["name"]
+    assert buffers[0].getvalue() == buffers[1].getvalue() == b"title name date"
+
+
+def test_cache_key_depends_on_serializer_settings(cache: CertificateCache) -> None:
+    first = CachedSerializer(serializer=CountingSerializer(), cache=cache)
+    second = CachedSerializer(serializer=CertificateService().serializer, cache=cache)
+    assert first.get_key("title", "name", "date") != second.get_key("title", "name", "date")
+
+
+def generate_certificates(service: CertificateService, names: list[str]) -> list[Certificate]:
+    return [
+        service.generate(
+            title=WebinarTitle.TEST,
+            started_at=date(2025, 1, 3),
+            finished_at=date(2025, 1, 4),
+            name=name,
+        )
+        for name in names
+    ]
+
+
+def test_prerender_renders_only_missing_certificates(cache: CertificateCache) -> None:
+    inner = CountingSerializer()
+    service = CertificateService(serializer=inner, cache=cache)
+    certificates = generate_certificates(service, ["first", "second"])
+    service.prerender(certificates[:1])
+    service.prerender(certificates)
+    assert inner.calls == ["first", "second"]
+    assert all(service.is_cached(certificate) for certificate in certificates)
+
+
+def test_prerender_collects_cache_stats_of_workers(cache: CertificateCache) -> None:
+    service = CertificateService(serializer=CountingSerializer(), cache=cache)
+    certificates = generate_certificates(service, ["first", "second", "third"])
+    service.prerender(certificates, workers=2)
+    assert all(service.is_cached(certificate) for certificate in certificates)
+    assert cache.stats["misses"] == 3
+    assert cache.stats["writes"] == 3
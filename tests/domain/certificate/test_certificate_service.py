@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from datetime import date
 from io import BytesIO
 from typing import IO
+from typing import ClassVar
 
 import pytest
 from PIL import Image
@@ -53,6 +54,8 @@ def test_certificate_service_generates_certificate(
 
 @dataclass
 class CertificateTextSerializer:
+    extension: ClassVar[str] = "txt"
+
     def serialize(
         self,
         buffer: IO[bytes],
@@ -115,3 +118,34 @@ def test_serialized_certificate_can_be_decoded_as_png_image() -> None:
     buffer.seek(0)
     image = Image.open(buffer)
     assert image.format == "PNG"
+
+
+def make_certificates(size: int) -> list[Certificate]:
+    return [
+        Certificate(
+            title=WebinarTitle.TEST,
+            name=f"Участник {i}",
+            started_at=date(2025, 1, 3),
+            finished_at=date(2025, 1, 4),
+            serializer=CertificateTextSerializer(),
+        )
+        for i in range(size)
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_render_batch_keeps_input_order(workers: int) -> None:
+    certificates = make_certificates(10)
+    rendered = list(
+        CertificateService().render_batch(certificates, workers=workers, max_in_flight=3)
+    )
+    assert [certificate for certificate, _ in rendered] == certificates
+    for certificate, content in rendered:
+        assert certificate.name in content.decode("utf-8")
+
+
+def test_render_batch_as_completed_renders_every_certificate() -> None:
+    certificates = make_certificates(10)
+    rendered = CertificateService(workers=2).render_batch(certificates, ordered=False)
+    names = sorted(certificate.name for certificate, _ in rendered)
+    assert names == sorted(certificate.name for certificate in certificates)
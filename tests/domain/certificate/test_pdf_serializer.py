@@ -0,0 +1,54 @@
+import re
+from datetime import date
+from io import BytesIO
+
+import pytest
+
+from lib.domain.certificate.serializer.pdf_serializer import CertificatePDFSerializer
+from lib.domain.certificate.serializer.png_serializer import CertificatePNGSerializer
+from lib.domain.certificate.service import CertificateService
+from lib.domain.certificate.service import RosterNotSupportedError
+from lib.domain.webinar.enums import WebinarTitle
+
+NAMES = [
+    "Мельникова Людмила Андреевна",
+    "Мельникова-Дёмкина Людмила Андреевна",
+    "Ким Алла Кимовна",
+]
+
+
+def write_roster(service: CertificateService) -> bytes:
+    certificates = [
+        service.generate(
+            title=WebinarTitle.TEST,
+            started_at=date(2025, 1, 3),
+            finished_at=date(2025, 1, 4),
+            name=name,
+        )
+        for name in NAMES
+    ]
+    buffer = BytesIO()
+    service.write_roster(buffer, certificates)
+    return buffer.getvalue()
+
+
+def test_pdf_certificate_is_written() -> None:
+    buffer = BytesIO()
+    CertificatePDFSerializer().serialize(
+        buffer=buffer,
+        title="Тестовый вебинар",
+        name="Мельникова Людмила Андреевна",
+        date_text="3 - 4 января\n2025 г.",
+    )
+    assert buffer.getvalue().startswith(b"%PDF")
+
+
+def test_roster_has_page_per_certificate_and_shares_template_image() -> None:
+    content = write_roster(CertificateService(serializer=CertificatePDFSerializer()))
+    assert len(re.findall(rb"/Type /Page\b", content)) == len(NAMES)
+    assert content.count(b"/Subtype /Image") == 1
+
+
+def test_roster_is_not_supported_by_png_serializer() -> None:
+    with pytest.raises(RosterNotSupportedError):
+        write_roster(CertificateService(serializer=CertificatePNGSerializer()))
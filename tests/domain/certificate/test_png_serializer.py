@@ -0,0 +1,115 @@
+from datetime import date
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from PIL.ImageChops import difference
+
+from lib.domain.certificate.serializer.image_serializer import FONT
+from lib.domain.certificate.serializer.image_serializer import OutputTarget
+from lib.domain.certificate.serializer.image_serializer import get_font
+from lib.domain.certificate.serializer.jpeg_serializer import CertificateJPEGSerializer
+from lib.domain.certificate.serializer.pdf_serializer import CertificatePDFSerializer
+from lib.domain.certificate.serializer.png_serializer import CertificatePNGSerializer
+from lib.domain.certificate.serializer.webp_serializer import CertificateWebPSerializer
+from lib.domain.certificate.service import CertificateService
+from lib.domain.certificate.service import TargetsNotSupportedError
+from lib.domain.webinar.enums import WebinarTitle
+
+TITLE = "Тестовый вебинар"
+DATE_TEXT = "3 - 4 января\n2025 г."
+
+
+def test_base_image_is_rendered_once_per_webinar() -> None:
+    serializer = CertificatePNGSerializer()
+    base = serializer.get_base_image(TITLE, DATE_TEXT)
+    assert serializer.get_base_image(TITLE, DATE_TEXT) is base
+    assert serializer.get_base_image(TITLE, "другая дата") is not base
+
+
+def test_drawing_name_does_not_change_base_image() -> None:
+    serializer = CertificatePNGSerializer()
+    base = serializer.get_base_image(TITLE, DATE_TEXT)
+    base_copy = base.copy()
+    first = serializer.get_image(TITLE, "Мельникова Людмила Андреевна", DATE_TEXT)
+    second = serializer.get_image(TITLE, "Ким Алла Кимовна", DATE_TEXT)
+    assert difference(base, base_copy).getbbox() is None
+    assert difference(first, second).getbbox() is not None
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "Ким Алла Кимовна",
+        "Мельникова Людмила Андреевна",
+        "Мельникова-Дёмкина Людмила Андреевна",
+        "Константинопольская-Преображенская Александра Вячеславовна",
+        "",
+    ],
+)
+def test_name_font_matches_linear_search(name: str) -> None:
+    serializer = CertificatePNGSerializer()
+    image = serializer.get_base_image(TITLE, DATE_TEXT)
+    max_text_width = image.width * 0.81
+    for expected in range(100, 150):
+        if get_font(FONT, expected).getlength(name) > max_text_width:
+            break
+    assert serializer._get_name_font(image, name).size == expected
+
+
+def test_fonts_are_cached() -> None:
+    assert get_font(FONT, 82) is get_font(FONT, 82)
+
+
+@pytest.mark.parametrize("scale", [0.1, 0.25, 0.5])
+def test_preview_is_rendered_at_scale(scale: float) -> None:
+    full = CertificatePNGSerializer()
+    preview = CertificatePNGSerializer(scale=scale)
+    name = "Мельникова Людмила Андреевна"
+    full_image = full.get_image(TITLE, name, DATE_TEXT)
+    preview_image = preview.get_image(TITLE, name, DATE_TEXT)
+    assert preview_image.width == round(full_image.width * scale)
+    assert preview_image.height == round(full_image.height * scale)
+    full_size = full._get_name_font(full_image, name).size
+    preview_size = preview._get_name_font(preview_image, name).size
+    assert abs(preview_size - full_size * scale) <= 2
+
+
+def test_all_output_targets_are_rendered_from_one_image() -> None:
+    serializer = CertificatePNGSerializer()
+    service = CertificateService(serializer=serializer)
+    certificate = service.generate(
+        title=WebinarTitle.TEST,
+        started_at=date(2025, 1, 3),
+        finished_at=date(2025, 1, 4),
+        name="Ким Алла Кимовна",
+    )
+    targets = [
+        OutputTarget(encoder=CertificateJPEGSerializer(), width=800),
+        OutputTarget(encoder=serializer),
+        OutputTarget(encoder=CertificateWebPSerializer(), width=200),
+        OutputTarget(encoder=serializer, width=100_000),
+    ]
+    outputs = [
+        Image.open(BytesIO(output)) for output in service.render_targets(certificate, targets)
+    ]
+    full = serializer.load_template()
+    assert [(image.format, image.width) for image in outputs] == [
+        ("JPEG", 800),
+        ("PNG", full.width),
+        ("WEBP", 200),
+        ("PNG", full.width),
+    ]
+    assert outputs[0].height == round(full.height * 800 / full.width)
+
+
+def test_output_targets_are_not_supported_by_pdf_serializer() -> None:
+    service = CertificateService(serializer=CertificatePDFSerializer())
+    certificate = service.generate(
+        title=WebinarTitle.TEST,
+        started_at=date(2025, 1, 3),
+        finished_at=date(2025, 1, 4),
+        name="Ким Алла Кимовна",
+    )
+    with pytest.raises(TargetsNotSupportedError):
+        service.render_targets(certificate, [OutputTarget(encoder=CertificatePNGSerializer())])
@@ -0,0 +1,36 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from lib.domain.certificate.serializer.png_serializer import CertificatePNGSerializer
+from lib.domain.certificate.serializer.profiles import PROFILES
+from lib.domain.certificate.serializer.profiles import UnknownProfileError
+from lib.domain.certificate.serializer.profiles import get_serializer
+
+
+@pytest.mark.parametrize("profile", [profile for profile in PROFILES if profile != "pdf"])
+def test_profile_serializer_produces_image_of_its_format(profile: str) -> None:
+    serializer = get_serializer(profile)
+    buffer = BytesIO()
+    serializer.serialize(
+        buffer=buffer,
+        title="Тестовый вебинар",
+        name="Мельникова Людмила Андреевна",
+        date_text="3 - 4 января\n2025 г.",
+    )
+    buffer.seek(0)
+    image = Image.open(buffer)
+    assert image.format.lower() == serializer.extension
+
+
+def test_unknown_profile_raises() -> None:
+    with pytest.raises(UnknownProfileError):
+        get_serializer("bmp")
+
+
+def test_image_profile_can_render_preview() -> None:
+    serializer = get_serializer("png-fast", scale=0.25)
+    assert isinstance(serializer, CertificatePNGSerializer)
+    assert serializer.scale == 0.25
+    assert serializer.compress_level == 1
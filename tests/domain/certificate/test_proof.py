@@ -0,0 +1,76 @@
+import re
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from lib.domain.certificate.proof import ProofSheet
+
+NAMES = [f"Участник {i}" for i in range(7)]
+
+
+def make_tiles(names: list[str], size: tuple[int, int] = (40, 56)) -> list[tuple[str, bytes]]:
+    tiles = []
+    for name in names:
+        buffer = BytesIO()
+        Image.new("RGB", size, (255, 0, 0)).save(buffer, format="png")
+        tiles.append((name, buffer.getvalue()))
+    return tiles
+
+
+def test_pages_are_filled_with_tiles_and_last_page_is_partial() -> None:
+    proof = ProofSheet(columns=2, rows=2, margin=4, label_size=10)
+    sizes = [page.size for page in proof.get_pages(make_tiles(NAMES))]
+    assert sizes == [(2 * 44 + 4, 2 * (56 + 20 + 4) + 4)] * 2
+
+
+def test_pages_are_generated_lazily() -> None:
+    proof = ProofSheet(columns=2, rows=1)
+    consumed = []
+
+    def tiles():
+        for tile in make_tiles(NAMES):
+            consumed.append(tile[0])
+            yield tile
+
+    next(proof.get_pages(tiles()))
+    assert consumed == NAMES[:2]
+
+
+def test_tiles_of_other_size_are_resized_to_the_first_one() -> None:
+    proof = ProofSheet(columns=2, rows=1, margin=0, label_size=10)
+    tiles = make_tiles(NAMES[:1]) + make_tiles(NAMES[1:2], size=(80, 112))
+    (page,) = proof.get_pages(tiles)
+    assert page.size == (80, 56 + 20)
+    assert page.getpixel((79, 55)) == (255, 0, 0)
+
+
+def test_long_names_are_shortened_to_fit_the_tile() -> None:
+    label = ProofSheet()._fit_label("Ш" * 100, 200)
+    assert label.endswith("…")
+    assert len(label) < 100
+
+
+def test_proof_sheet_is_written_to_pdf(tmp_path: Path) -> None:
+    path = tmp_path / "proof.pdf"
+    path.write_bytes(b"stale")
+    pages = ProofSheet(columns=2, rows=2).write_pdf(path, make_tiles(NAMES))
+    content = path.read_bytes()
+    assert pages == 2
+    assert content.startswith(b"%PDF")
+    assert int(re.findall(rb"/Count (\d+)", content)[-1]) == 2
+
+
+def test_proof_sheet_is_written_to_images(tmp_path: Path) -> None:
+    paths = ProofSheet(columns=4, rows=1).write_images(tmp_path / "proof", make_tiles(NAMES))
+    assert [path.name for path in paths] == ["proof-001.png", "proof-002.png"]
+    assert all(Image.open(path).format == "PNG" for path in paths)
+
+
+def test_proof_sheet_is_written_to_buffer() -> None:
+    buffer = BytesIO()
+    pages = ProofSheet(columns=2, rows=2).write_pdf(buffer, make_tiles(NAMES))
+    content = buffer.getvalue()
+    assert pages == 2
+    assert content.startswith(b"%PDF")
+    assert int(re.findall(rb"/Count (\d+)", content)[-1]) == 2
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+from os import utime
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from PIL.ImageChops import difference
+
+from lib.domain.certificate.serializer.paths import get_png_template_path
+from lib.domain.certificate.serializer.png_serializer import CertificatePNGSerializer
+from lib.domain.certificate.serializer.template_cache import _write_raw_template
+from lib.domain.certificate.serializer.template_cache import map_template
+
+
+def create_template(
+    path: Path,
+    color: tuple[int, int, int],
+    mtime: int,
+    size: tuple[int, int] = (4, 3),
+) -> Path:
+    Image.new("RGB", size, color).save(path, format="png")
+    utime(path, (mtime, mtime))
+    return path
+
+
+def test_mapped_template_has_same_pixels_as_decoded(tmp_path: Path) -> None:
+    template = get_png_template_path()
+    mapped = map_template(template, tmp_path)
+    assert mapped.mode == "RGB"
+    assert not mapped.readonly
+    decoded = Image.open(template).convert("RGB")
+    assert difference(mapped, decoded).getbbox() is None
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_changed_template_is_decoded_again(tmp_path: Path) -> None:
+    red, blue = (255, 0, 0), (0, 0, 255)
+    template = create_template(tmp_path / "template.png", red, mtime=1)
+    cache_dir = tmp_path / "cache"
+    assert map_template(template, cache_dir).getpixel((0, 0)) == red
+    create_template(template, blue, mtime=2)
+    assert map_template(template, cache_dir).getpixel((0, 0)) == blue
+    assert len(list(cache_dir.iterdir())) == 1  # the copy of the old version is removed
+
+
+def test_copies_of_other_templates_are_kept(tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    unnamed = cache_dir / f"{'0' * 64}-4x3.rgbx"  # written before copies were named
+    unnamed.write_bytes(b"")
+    map_template(create_template(tmp_path / "other.png", (0, 0, 255), mtime=1), cache_dir)
+    map_template(create_template(tmp_path / "template.png", (255, 0, 0), mtime=1), cache_dir)
+    names = sorted(path.name.split("-")[0] for path in cache_dir.iterdir())
+    assert names == ["other", "template"]
+
+
+def test_template_is_mapped_by_many_threads_at_once(tmp_path: Path) -> None:
+    red = (255, 0, 0)
+    # large enough for the threads to write the copy at the same time
+    template = create_template(tmp_path / "template.png", red, mtime=1, size=(2000, 2000))
+    cache_dir = tmp_path / "cache"
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        images = list(executor.map(lambda _: map_template(template, cache_dir), range(32)))
+    assert all(image.getpixel((0, 0)) == red for image in images)
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+def test_raw_copy_written_by_another_process_is_used(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    red = (255, 0, 0)
+    template = create_template(tmp_path / "template.png", red, mtime=1)
+    cache_dir = tmp_path / "cache"
+    map_template(template, cache_dir)
+    (path,) = cache_dir.iterdir()
+
+    def replace(self: Path, target: Path) -> Path:  # the copy is open in another process
+        raise PermissionError(f"{target} is in use")
+
+    monkeypatch.setattr(Path, "replace", replace)
+    _write_raw_template(template, path)
+    assert list(cache_dir.iterdir()) == [path]
+    assert map_template(template, cache_dir).getpixel((0, 0)) == red
+
+
+def test_base_image_is_drawn_once_by_render_threads(tmp_path: Path) -> None:
+    serializer = CertificatePNGSerializer(template_cache=tmp_path, scale=0.1)
+    args = ("Тестовый вебинар", "3 - 4 января\n2025 г.")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        images = list(executor.map(lambda _: serializer.get_base_image(*args), range(8)))
+    assert all(image is images[0] for image in images)
+
+
+def test_serializer_renders_same_image_with_and_without_template_cache(tmp_path: Path) -> None:
+    args = ("Тестовый вебинар", "Ким Алла Кимовна", "3 - 4 января\n2025 г.")
+    cached = CertificatePNGSerializer(template_cache=tmp_path).get_image(*args)
+    decoded = CertificatePNGSerializer(template_cache=None).get_image(*args)
+    assert difference(cached, decoded).getbbox() is None
@@ -4,8 +4,14 @@ from random import choice
 
 import pytest
 
+from lib.clients.email import Attachment
 from lib.clients.email import TestEmailClient
+from lib.clients.mime import EncodedAttachment
+from lib.clients.mime import encode_base64
+from lib.domain.certificate.cache import CertificateCache
 from lib.domain.certificate.model import Certificate
+from lib.domain.certificate.service import CertificateService
+from lib.domain.email.service import BccMode
 from lib.domain.email.service import EmailService
 from lib.domain.webinar.enums import WebinarTitle
 from lib.environment import EnvironmentVariableNotSetError
@@ -69,3 +75,120 @@ def test_email_service_send_certificate_email(
     assert email_client.total_send_count == 1
     assert email_client.is_sent_to(email)
     assert email_client.sent_count(email) == 1
+
+
+def test_certificate_is_attached_from_memory(
+    email_service: EmailService,
+    email_client: TestEmailClient,
+) -> None:
+    email = "participant@somemail.com"
+    certificate = Certificate(
+        title=WebinarTitle.TEST,
+        name="Мельникова Людмила Андреевна",
+        started_at=date(2024, 12, 30),
+        finished_at=date(2024, 12, 31),
+    )
+    email_service.send_certificate_email(
+        title=WebinarTitle.TEST,
+        email=email,
+        message=randstr(),
+        certificate=certificate,
+    )
+    (attachment,) = email_client.get_attachments(email)
+    assert isinstance(attachment, Attachment)
+    assert attachment.name == "certificate.png"
+    assert attachment.read().startswith(b"\x89PNG")
+
+
+def test_digest_mode_sends_one_summary_to_bcc_emails(
+    email_client: TestEmailClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("BCC_MODE", "digest")
+    email_service = EmailService(email_client=email_client, bcc_emails=("a@bcc.com", "b@bcc.com"))
+    assert email_service.bcc_mode == BccMode.DIGEST
+    names = ["Мельникова Людмила Андреевна", "Ким Алла Кимовна"]
+    for i, name in enumerate(names):
+        certificate = Certificate(
+            title=WebinarTitle.TEST,
+            name=name,
+            started_at=date(2024, 12, 30),
+            finished_at=date(2024, 12, 31),
+        )
+        email_service.send_certificate_email(
+            title=WebinarTitle.TEST,
+            email=f"{i}@somemail.com",
+            message=randstr(),
+            certificate=certificate,
+        )
+        email_service.add_to_digest(f"{i}@somemail.com", certificate)
+    assert all(call["bcc"] is None for call in email_client.get_calls())
+    email_service.send_bcc_digest()
+    assert email_client.total_send_count == len(names) + 1
+    digest = email_client.get_calls()[-1]
+    assert digest["to"] == "a@bcc.com"
+    assert digest["bcc"] == ("b@bcc.com",)
+    assert all(name in digest["contents"] for name in names)
+    (attachment,) = email_client.get_attachments("a@bcc.com")
+    assert isinstance(attachment, Attachment)
+    assert attachment.name == "certificates.pdf"
+    assert attachment.read().startswith(b"%PDF")
+    # digest is sent only once
+    email_service.send_bcc_digest()
+    assert email_client.total_send_count == len(names) + 1
+
+
+def test_copy_mode_does_not_send_digest(email_service: EmailService) -> None:
+    assert email_service.bcc_mode == BccMode.COPY
+    email_service.send_bcc_digest()
+    assert email_service.email_client.total_send_count == 0  # type: ignore
+
+
+def test_attachment_base64_is_taken_from_cache(
+    email_client: TestEmailClient,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("BCC_EMAILS", "bcc@test.com")
+    cache = CertificateCache(path=tmp_path)
+    email_service = EmailService(email_client=email_client)
+    certificate = CertificateService(cache=cache).generate(
+        title=WebinarTitle.TEST,
+        started_at=date(2024, 12, 30),
+        finished_at=date(2024, 12, 31),
+        name="Мельникова Людмила Андреевна",
+    )
+    for _ in range(2):
+        email_service.send_certificate_email(
+            title=WebinarTitle.TEST,
+            email="participant@somemail.com",
+            message=randstr(),
+            certificate=certificate,
+            content=b"\x89PNG" * 100,
+        )
+    assert cache.stats["writes"] == 1
+    assert cache.stats["hits"] == 1
+    attachment = email_client.get_attachments("participant@somemail.com")[-1]
+    assert isinstance(attachment, Attachment)
+    assert attachment.base64 == encode_base64(b"\x89PNG" * 100)
+
+
+def test_attachment_is_encoded_when_sent_without_cache(email_client: TestEmailClient) -> None:
+    email_service = EmailService(email_client=email_client, bcc_emails=())
+    certificate = Certificate(
+        title=WebinarTitle.TEST,
+        name="Мельникова Людмила Андреевна",
+        started_at=date(2024, 12, 30),
+        finished_at=date(2024, 12, 31),
+    )
+    email_service.send_certificate_email(
+        title=WebinarTitle.TEST,
+        email="participant@somemail.com",
+        message=randstr(),
+        certificate=certificate,
+        content=b"\x89PNG",
+    )
+    (attachment,) = email_client.get_attachments("participant@somemail.com")
+    assert isinstance(attachment, Attachment)
+    assert attachment.base64 is None
+    assert attachment.encode() == EncodedAttachment.from_bytes(attachment.name, b"\x89PNG")
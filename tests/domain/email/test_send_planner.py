@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from lib.clients.db import DB
+from lib.domain.email.planner import HOUR_SECONDS
+from lib.domain.email.planner import SendPlanner
+from lib.domain.email.repository import DAY_SECONDS
+from lib.domain.email.repository import SenderUsageRepository
+
+NOW = 1_700_000_000.0
+
+
+def test_everything_is_sent_now_within_quota() -> None:
+    plan = SendPlanner(daily_quota=500).plan(pending=100, sent_times=[], now=NOW)
+    assert plan.budget == 100
+    assert [(window.starts_at, window.count) for window in plan.windows] == [(NOW, 100)]
+    assert plan.resume_at is None
+
+
+def test_large_cohort_is_spread_over_days() -> None:
+    plan = SendPlanner(daily_quota=500).plan(pending=1200, sent_times=[], now=NOW)
+    assert plan.budget == 500
+    assert [window.count for window in plan.windows] == [500, 500, 200]
+    assert [window.starts_at - NOW for window in plan.windows] == [0, DAY_SECONDS, 2 * DAY_SECONDS]
+    assert plan.resume_at == plan.windows[1].start
+    assert plan.last_start == plan.windows[2].start
+
+
+def test_quota_is_freed_24_hours_after_each_send() -> None:
+    sent_times = [NOW - 20 * HOUR_SECONDS] * 300 + [NOW - 2 * HOUR_SECONDS] * 200
+    plan = SendPlanner(daily_quota=500).plan(pending=400, sent_times=sent_times, now=NOW)
+    assert plan.budget == 0
+    assert [(window.starts_at - NOW, window.count) for window in plan.windows] == [
+        (4 * HOUR_SECONDS, 300),
+        (22 * HOUR_SECONDS, 100),
+    ]
+
+
+def test_hourly_quota_splits_day_into_windows() -> None:
+    planner = SendPlanner(daily_quota=500, hourly_quota=100)
+    sent_times = [NOW - HOUR_SECONDS / 2] * 40
+    plan = planner.plan(pending=250, sent_times=sent_times, now=NOW)
+    assert plan.budget == 60
+    assert [window.count for window in plan.windows] == [60, 100, 90]
+
+
+def test_daily_quota_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        SendPlanner(daily_quota=0)
+
+
+def test_planner_quota_is_read_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GMAILACCOUNTS", "a@gmail.com:a,b@gmail.com:b")
+    monkeypatch.setenv("GMAIL_DAILY_QUOTA", "400")
+    monkeypatch.setenv("SEND_HOURLY_QUOTA", "0")
+    assert SendPlanner.from_environment() == SendPlanner(daily_quota=800, hourly_quota=None)
+
+
+def test_plan_uses_recorded_sender_usage(tmp_path: Path) -> None:
+    usage = SenderUsageRepository(db=DB(path=tmp_path / "test.db"))
+    for _ in range(3):
+        usage.record("a@gmail.com", sent_at=NOW - HOUR_SECONDS)
+    usage.record("b@gmail.com", sent_at=NOW - 2 * DAY_SECONDS)
+    sent_times = usage.get_sent_times(since=NOW - DAY_SECONDS)
+    assert SendPlanner(daily_quota=10).plan(20, sent_times, NOW).budget == 7
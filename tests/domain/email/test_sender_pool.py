@@ -0,0 +1,188 @@
+from pathlib import Path
+from smtplib import SMTPDataError
+from smtplib import SMTPRecipientsRefused
+from smtplib import SMTPSenderRefused
+from smtplib import SMTPServerDisconnected
+
+import pytest
+
+from lib.clients.db import DB
+from lib.clients.email import TestEmailClient
+from lib.domain.email.accounts import NoSenderAvailableError
+from lib.domain.email.accounts import SenderAccount
+from lib.domain.email.accounts import SenderPool
+from lib.domain.email.accounts import is_not_sent
+from lib.domain.email.accounts import is_quota_error
+from lib.domain.email.accounts import is_throttling_error
+from lib.domain.email.repository import DAY_SECONDS
+from lib.domain.email.repository import SenderUsageRepository
+from lib.resilience import ConnectError
+
+QUOTA_ERROR = SMTPDataError(550, b"5.4.5 Daily user sending limit exceeded.")
+THROTTLING_ERROR = SMTPSenderRefused(421, b"4.7.0 Try again later", "a@gmail.com")
+REFUSED_ERROR = SMTPRecipientsRefused({"a@ya.ru": (550, b"5.1.1 No such user")})
+
+
+class FailingClient(TestEmailClient):
+    def __init__(self, error: Exception) -> None:
+        super().__init__()
+        object.__setattr__(self, "error", error)
+
+    def send(self, *args, **kwargs) -> None:
+        raise self.error  # type: ignore[attr-defined]
+
+
+@pytest.fixture
+def usage(tmp_path: Path) -> SenderUsageRepository:
+    return SenderUsageRepository(db=DB(path=tmp_path / "test.db"))
+
+
+def create_pool(*quotas: int, usage: SenderUsageRepository | None = None) -> SenderPool:
+    accounts = [
+        SenderAccount(f"sender{i}@gmail.com", TestEmailClient(), quota)
+        for i, quota in enumerate(quotas)
+    ]
+    return SenderPool(accounts=accounts, usage=usage)
+
+
+def send(pool: SenderPool, count: int) -> None:
+    for i in range(count):
+        pool.send(to=f"{i}@ya.ru", subject="subject", contents="contents")
+
+
+def test_errors_are_classified() -> None:
+    assert is_quota_error(QUOTA_ERROR)
+    assert not is_quota_error(THROTTLING_ERROR)
+    assert is_throttling_error(THROTTLING_ERROR)
+    assert not is_throttling_error(SMTPDataError(451, b"4.3.0 Temporary error"))
+
+
+def test_recipients_are_spread_over_accounts() -> None:
+    pool = create_pool(100, 100, 100)
+    send(pool, 60)
+    assert sum(pool.stats.values()) == 60
+    assert all(10 <= pool.stats[account.name] <= 30 for account in pool.accounts)
+    # the same recipient is sent from the same account
+    pool.send(to="0@ya.ru")
+    pool.send(to="0@ya.ru")
+    clients = [account.client for account in pool.accounts]
+    assert sorted(client.sent_count("0@ya.ru") for client in clients) == [0, 0, 3]  # type: ignore
+
+
+def test_accounts_are_used_within_quota() -> None:
+    pool = create_pool(3, 5)
+    send(pool, 8)
+    assert pool.get_remaining() == {"sender0@gmail.com": 0, "sender1@gmail.com": 0}
+    with pytest.raises(NoSenderAvailableError):
+        pool.send(to="late@ya.ru")
+
+
+def test_quota_error_fails_over_to_next_account() -> None:
+    pool = create_pool(100, 100)
+    pool.accounts = [SenderAccount("spent@gmail.com", FailingClient(QUOTA_ERROR)), pool.accounts[1]]
+    send(pool, 10)
+    assert pool.stats == {"sender1@gmail.com": 10}
+    assert pool.get_remaining()["spent@gmail.com"] == 0
+
+
+def test_quota_error_does_not_count_as_sent(usage: SenderUsageRepository) -> None:
+    pool = create_pool(100, usage=usage)
+    pool.accounts = [SenderAccount("spent@gmail.com", FailingClient(QUOTA_ERROR), 100)]
+    with pytest.raises(NoSenderAvailableError):
+        pool.send(to="a@ya.ru")
+    assert pool.get_report() == {"spent@gmail.com": {"sent": 0, "sent_24h": 0, "remaining": 0}}
+
+
+def test_throttled_account_is_used_again_later() -> None:
+    now = [0.0]
+    client = TestEmailClient()
+    pool = SenderPool(
+        accounts=[SenderAccount("throttled@gmail.com", FailingClient(THROTTLING_ERROR))],
+        clock=lambda: now[0],
+        throttle_seconds=60,
+    )
+    with pytest.raises(NoSenderAvailableError):
+        pool.send(to="a@ya.ru")
+    with pytest.raises(NoSenderAvailableError):
+        pool.send(to="a@ya.ru")
+    pool.accounts = [SenderAccount("throttled@gmail.com", client)]
+    now[0] = 61
+    pool.send(to="a@ya.ru")
+    assert client.sent_count("a@ya.ru") == 1
+
+
+def test_refused_email_is_raised_and_quota_is_returned(usage: SenderUsageRepository) -> None:
+    pool = create_pool(1, usage=usage)
+    pool.accounts = [SenderAccount("sender0@gmail.com", FailingClient(REFUSED_ERROR), 1)]
+    with pytest.raises(SMTPRecipientsRefused):
+        pool.send(to="a@ya.ru")
+    assert pool.get_remaining() == {"sender0@gmail.com": 1}
+
+
+def test_email_with_unknown_outcome_keeps_its_quota(usage: SenderUsageRepository) -> None:
+    pool = create_pool(1, usage=usage)
+    pool.accounts = [SenderAccount("sender0@gmail.com", FailingClient(TimeoutError()), 1)]
+    with pytest.raises(TimeoutError):
+        pool.send(to="a@ya.ru")
+    assert pool.get_remaining() == {"sender0@gmail.com": 0}
+    assert usage.get_counts(since=0) == {"sender0@gmail.com": 1}
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (REFUSED_ERROR, True),
+        (QUOTA_ERROR, True),
+        (ConnectError(), True),
+        (SMTPServerDisconnected(), True),  # raised before smtplib sent DATA
+        (TimeoutError(), False),
+        (ConnectionResetError(), False),
+    ],
+)
+def test_unsent_emails_are_classified(error: Exception, expected: bool) -> None:
+    assert is_not_sent(error) is expected
+
+
+def test_usage_is_kept_between_runs(usage: SenderUsageRepository) -> None:
+    send(create_pool(10, 10, usage=usage), 6)
+    pool = create_pool(10, 10, usage=usage)
+    assert sum(pool.get_remaining().values()) == 14
+    report = pool.get_report()
+    assert sum(item["sent_24h"] for item in report.values()) == 6
+    assert sum(item["sent"] for item in report.values()) == 0
+
+
+def test_pools_sharing_usage_stay_within_quota(usage: SenderUsageRepository) -> None:
+    first = create_pool(5, 5, usage=usage)
+    second = create_pool(5, 5, usage=usage)
+    assert sum(first.get_remaining().values()) == 10  # both have read usage before sending
+    send(first, 6)
+    send(second, 4)
+    with pytest.raises(NoSenderAvailableError):
+        first.send(to="late@ya.ru")
+    assert sum(first.stats.values()) + sum(second.stats.values()) == 10
+    assert usage.get_counts(since=0) == {"sender0@gmail.com": 5, "sender1@gmail.com": 5}
+
+
+def test_reserved_place_is_cancelled(usage: SenderUsageRepository) -> None:
+    reservation = usage.reserve("a@gmail.com", quota=1, sent_at=1000.0)
+    assert reservation is not None
+    assert usage.reserve("a@gmail.com", quota=1, sent_at=1001.0) is None
+    usage.cancel(reservation)
+    assert usage.reserve("a@gmail.com", quota=1, sent_at=1002.0) is not None
+    assert usage.get_counts(since=0) == {"a@gmail.com": 1}
+
+
+def test_usage_older_than_a_day_is_not_counted(usage: SenderUsageRepository) -> None:
+    usage.record("a@gmail.com", sent_at=1000.0)
+    usage.record("a@gmail.com", sent_at=1000.0 + DAY_SECONDS)
+    assert usage.get_counts(since=1000.0) == {"a@gmail.com": 1}
+    assert usage.delete_older(before=2000.0) == 1
+
+
+def test_accounts_are_read_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GMAILACCOUNTS", "a@gmail.com:password a, b@gmail.com:password b")
+    monkeypatch.setenv("GMAIL_DAILY_QUOTA", "2000")
+    pool = SenderPool.from_environment(connections=2)
+    assert [account.name for account in pool.accounts] == ["a@gmail.com", "b@gmail.com"]
+    assert [account.daily_quota for account in pool.accounts] == [2000, 2000]
@@ -0,0 +1,127 @@
+from datetime import date
+from multiprocessing import get_context
+from pathlib import Path
+
+import pytest
+
+from lib.clients.db import DB
+from lib.domain.job.model import JobStatus
+from lib.domain.job.model import SendJob
+from lib.domain.job.repository import SendJobRepository
+from lib.domain.webinar.enums import WebinarTitle
+from lib.paths import DB_PATH
+
+URL = "https://docs.google.com/spreadsheets/d/test"
+WORKER = "worker-1"
+
+
+def create_job(row_number: int, url: str = URL) -> SendJob:
+    return SendJob(
+        url=url,
+        row_number=row_number,
+        fio=f"Мельникова Людмила {row_number}",
+        email=f"{row_number}@ya.ru",
+        message="Здравствуйте!",
+        title=WebinarTitle.TEST,
+        started_at=date(2025, 1, 3),
+        finished_at=date(2025, 1, 4),
+    )
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> SendJobRepository:
+    return SendJobRepository(db=DB(path=tmp_path / "test.db"), lease_seconds=60, max_attempts=2)
+
+
+def test_migrations_create_send_job_table(tmp_path: Path) -> None:
+    db = DB(path=tmp_path / "test.db")
+    assert any("send_job" in migration for migration in db.migrations)
+    assert (DB_PATH / "migrations" / "003-create-send-job-table.sql").exists()
+
+
+def test_enqueue_skips_rows_already_in_queue(repository: SendJobRepository) -> None:
+    assert repository.enqueue([create_job(1), create_job(2)]) == 2
+    assert repository.enqueue([create_job(2), create_job(3), create_job(2, url="other")]) == 2
+    assert repository.count_by_status(URL) == {JobStatus.PENDING: 3}
+    assert repository.count_by_status() == {JobStatus.PENDING: 4}
+
+
+def test_lease_returns_jobs_in_order_once(repository: SendJobRepository) -> None:
+    repository.enqueue([create_job(1), create_job(2)])
+    first = repository.lease(WORKER)
+    second = repository.lease("worker-2")
+    assert first is not None and second is not None
+    assert first.row_number == 1
+    assert second.row_number == 2
+    assert first.attempts == 1
+    assert first.title == WebinarTitle.TEST
+    assert first.started_at == date(2025, 1, 3)
+    assert repository.lease(WORKER) is None
+
+
+def test_completed_job_is_synced_once(repository: SendJobRepository) -> None:
+    repository.enqueue([create_job(1), create_job(2)])
+    job = repository.lease(WORKER)
+    assert repository.complete(job, WORKER)
+    assert [job.row_number for job in repository.get_unsynced_done(URL)] == [1]
+    repository.mark_synced(repository.get_unsynced_done(URL))
+    assert repository.get_unsynced_done(URL) == []
+    assert repository.count_by_status(URL) == {JobStatus.DONE: 1, JobStatus.PENDING: 1}
+
+
+def test_expired_lease_is_taken_by_another_worker(repository: SendJobRepository) -> None:
+    repository = SendJobRepository(db=repository.db, lease_seconds=-1, max_attempts=2)
+    repository.enqueue([create_job(1)])
+    crashed = repository.lease(WORKER)
+    job = repository.lease("worker-2")
+    assert job is not None
+    assert job.id == crashed.id
+    assert job.attempts == 2
+    assert not repository.complete(crashed, WORKER)
+    assert repository.complete(job, "worker-2")
+
+
+def test_expired_lease_without_attempts_left_is_failed(repository: SendJobRepository) -> None:
+    repository = SendJobRepository(db=repository.db, lease_seconds=-1, max_attempts=1)
+    repository.enqueue([create_job(1)])
+    repository.lease(WORKER)
+    assert repository.lease("worker-2") is None
+    assert repository.count_by_status(URL) == {JobStatus.FAILED: 1}
+
+
+def test_failed_job_is_retried_until_attempts_are_exhausted(
+    repository: SendJobRepository,
+) -> None:
+    repository.enqueue([create_job(1)])
+    repository.fail(repository.lease(WORKER), WORKER, "error")
+    assert repository.count_by_status(URL) == {JobStatus.PENDING: 1}
+    repository.fail(repository.lease(WORKER), WORKER, "error")
+    assert repository.count_by_status(URL) == {JobStatus.FAILED: 1}
+    assert repository.lease(WORKER) is None
+
+
+def test_abandoned_job_is_sent_again_only_after_requeue(repository: SendJobRepository) -> None:
+    repository.enqueue([create_job(1)])
+    repository.abandon(repository.lease(WORKER), WORKER, "SMTPServerDisconnected()")
+    assert repository.count_by_status(URL) == {JobStatus.SENDING: 1}
+    assert repository.lease(WORKER) is None
+    assert repository.requeue_sending(URL) == 1
+    assert repository.lease(WORKER) is not None
+
+
+def lease_all(path: Path, worker: str) -> list[int]:
+    repository = SendJobRepository(db=DB(path=path, timeout=30))
+    rows = []
+    while (job := repository.lease(worker)) is not None:
+        rows.append(job.row_number)
+        repository.complete(job, worker)
+    return rows
+
+
+def test_jobs_are_leased_once_by_concurrent_processes(tmp_path: Path) -> None:
+    path = tmp_path / "test.db"
+    SendJobRepository(db=DB(path=path)).enqueue(create_job(i) for i in range(1, 101))
+    with get_context("fork").Pool(4) as pool:
+        results = pool.starmap(lease_all, [(path, f"worker-{i}") for i in range(4)])
+    rows = [row for result in results for row in result]
+    assert sorted(rows) == list(range(1, 101))
@@ -0,0 +1,99 @@
+from datetime import date
+from pathlib import Path
+from smtplib import SMTPRecipientsRefused
+
+import pytest
+
+from lib.clients.db import DB
+from lib.clients.email import TestEmailClient
+from lib.domain.email.service import EmailService
+from lib.domain.job.model import JobStatus
+from lib.domain.job.model import SendJob
+from lib.domain.job.repository import SendJobRepository
+from lib.domain.job.service import SendJobWorker
+from lib.domain.webinar.enums import WebinarTitle
+
+URL = "https://docs.google.com/spreadsheets/d/test"
+
+
+def create_jobs(count: int) -> list[SendJob]:
+    return [
+        SendJob(
+            url=URL,
+            row_number=i,
+            fio=f"Мельникова Людмила {i}",
+            email=f"{i}@ya.ru",
+            message="Здравствуйте!",
+            title=WebinarTitle.TEST,
+            started_at=date(2025, 1, 3),
+            finished_at=date(2025, 1, 4),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> SendJobRepository:
+    return SendJobRepository(db=DB(path=tmp_path / "test.db"), max_attempts=2)
+
+
+class FailingEmailClient(TestEmailClient):
+    def __init__(self, error: Exception) -> None:
+        super().__init__()
+        object.__setattr__(self, "error", error)
+
+    def send(self, to, *args, **kwargs) -> None:
+        if to == "2@ya.ru":
+            raise self.error  # type: ignore[attr-defined]
+        super().send(to, *args, **kwargs)
+
+
+class LeaseLosingRepository(SendJobRepository):
+    def complete(self, job: SendJob, worker: str) -> bool:
+        return False
+
+
+def test_worker_sends_all_jobs(repository: SendJobRepository) -> None:
+    repository.enqueue(create_jobs(3))
+    client = TestEmailClient()
+    worker = SendJobWorker(repository=repository, email_service=EmailService(client, ()))
+    assert worker.run() == 3
+    assert client.total_send_count == 3
+    assert len(client.get_attachments("1@ya.ru")) == 1
+    assert repository.count_by_status(URL) == {JobStatus.DONE: 3}
+
+
+def test_worker_stops_after_max_jobs(repository: SendJobRepository) -> None:
+    repository.enqueue(create_jobs(3))
+    worker = SendJobWorker(repository=repository, email_service=EmailService(TestEmailClient(), ()))
+    assert worker.run(max_jobs=2) == 2
+    assert repository.count_by_status(URL) == {JobStatus.DONE: 2, JobStatus.PENDING: 1}
+
+
+def test_worker_continues_after_failed_job(repository: SendJobRepository) -> None:
+    repository.enqueue(create_jobs(3))
+    client = FailingEmailClient(SMTPRecipientsRefused({"2@ya.ru": (450, b"4.2.1 Try later")}))
+    worker = SendJobWorker(repository=repository, email_service=EmailService(client, ()))
+    assert worker.run() == 2  # the refused job is tried again until attempts are exhausted
+    assert not client.is_sent_to("2@ya.ru")
+    assert repository.count_by_status(URL) == {JobStatus.DONE: 2, JobStatus.FAILED: 1}
+
+
+def test_worker_does_not_send_again_after_unknown_outcome(
+    repository: SendJobRepository,
+) -> None:
+    repository.enqueue(create_jobs(3))
+    client = FailingEmailClient(TimeoutError("timed out waiting for the reply to DATA"))
+    worker = SendJobWorker(repository=repository, email_service=EmailService(client, ()))
+    assert worker.run() == 2
+    assert client.total_send_count == 2
+    assert repository.count_by_status(URL) == {JobStatus.DONE: 2, JobStatus.SENDING: 1}
+
+
+def test_worker_does_not_count_jobs_with_lost_lease(tmp_path: Path) -> None:
+    repository = LeaseLosingRepository(db=DB(path=tmp_path / "test.db"))
+    repository.enqueue(create_jobs(2))
+    client = TestEmailClient()
+    worker = SendJobWorker(repository=repository, email_service=EmailService(client, ()))
+    assert worker.run() == 0
+    assert client.total_send_count == 2
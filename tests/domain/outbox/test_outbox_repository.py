@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pytest
+
+from lib.clients.db import DB
+from lib.domain.outbox.model import OutboxMessage
+from lib.domain.outbox.model import OutboxStatus
+from lib.domain.outbox.repository import OutboxRepository
+
+URL = "https://docs.google.com/spreadsheets/d/test"
+
+
+def create_message(i: int) -> OutboxMessage:
+    return OutboxMessage(fio=f"Мельникова Людмила {i}", email=f"{i}@ya.ru")
+
+
+@pytest.fixture
+def outbox(tmp_path: Path) -> OutboxRepository:
+    return OutboxRepository(db=DB(path=tmp_path / "test.db"))
+
+
+def test_add_keeps_status_of_messages_already_in_outbox(outbox: OutboxRepository) -> None:
+    assert outbox.add(URL, [create_message(1), create_message(2)]) == 2
+    assert outbox.start(URL, create_message(1), "<1@test>")
+    assert outbox.add(URL, [create_message(1), create_message(3)]) == 1
+    assert outbox.add("other", [create_message(1)]) == 1
+    assert outbox.count_by_status(URL) == {OutboxStatus.QUEUED: 2, OutboxStatus.SENDING: 1}
+
+
+def test_message_is_started_once(outbox: OutboxRepository) -> None:
+    outbox.add(URL, [create_message(1)])
+    assert outbox.start(URL, create_message(1), "<1@test>")
+    assert not outbox.start(URL, create_message(1), "<2@test>")
+    message = outbox.get_all(URL)[create_message(1).key]
+    assert message.status == OutboxStatus.SENDING
+    assert message.message_id == "<1@test>"
+
+
+def test_complete_and_mark_synced(outbox: OutboxRepository) -> None:
+    outbox.add(URL, [create_message(1)])
+    outbox.start(URL, create_message(1), "<1@test>")
+    outbox.complete(URL, create_message(1))
+    assert not outbox.get_all(URL)[create_message(1).key].synced
+    outbox.mark_synced(URL, [create_message(1)])
+    message = outbox.get_all(URL)[create_message(1).key]
+    assert message.status == OutboxStatus.SENT
+    assert message.synced
+
+
+def test_released_message_is_queued_again(outbox: OutboxRepository) -> None:
+    outbox.add(URL, [create_message(1)])
+    outbox.start(URL, create_message(1), "<1@test>")
+    outbox.release(URL, create_message(1), "SMTPDataError(451)")
+    assert outbox.start(URL, create_message(1), "<2@test>")
+
+
+def test_requeue_sending(outbox: OutboxRepository) -> None:
+    outbox.add(URL, [create_message(1), create_message(2)])
+    outbox.start(URL, create_message(1), "<1@test>")
+    assert outbox.requeue_sending(URL) == 1
+    assert outbox.count_by_status(URL) == {OutboxStatus.QUEUED: 2}
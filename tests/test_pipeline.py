@@ -0,0 +1,85 @@
+from threading import Event
+from threading import Thread
+from time import perf_counter
+from time import sleep
+
+import pytest
+
+from lib.pipeline import Pipeline
+from lib.pipeline import Stage
+
+
+def test_items_pass_all_stages() -> None:
+    pipeline = Pipeline(
+        [
+            Stage("double", func=lambda item: item * 2, workers=3),
+            Stage("increment", func=lambda item: item + 1, workers=2),
+        ]
+    )
+    assert sorted(pipeline.run(range(100))) == [i * 2 + 1 for i in range(100)]
+    assert pipeline.stats["double.items"] == 100
+    assert pipeline.stats["increment.items"] == 100
+
+
+def test_stages_run_at_the_same_time() -> None:
+    def slow(item: int) -> int:
+        sleep(0.02)
+        return item
+
+    pipeline = Pipeline([Stage("first", func=slow), Stage("second", func=slow)])
+    started_at = perf_counter()
+    assert len(list(pipeline.run(range(10)))) == 10
+    # strictly alternating stages would take 0.4 seconds
+    assert perf_counter() - started_at < 0.35
+
+
+def test_slow_stage_blocks_reading_of_new_items() -> None:
+    read = []
+    release = Event()
+
+    def items():
+        for i in range(100):
+            read.append(i)
+            yield i
+
+    pipeline = Pipeline([Stage("wait", func=lambda item: release.wait() and item, queue_size=2)])
+    results = pipeline.run(items())
+    next_result = Thread(target=lambda: next(results))
+    next_result.start()
+    sleep(0.1)
+    # one item in the worker, two in its queue and one blocked on put
+    assert len(read) <= 4
+    release.set()
+    next_result.join()
+    assert len(list(results)) == 99
+
+
+def test_error_stops_pipeline_and_is_raised_after_finished_items() -> None:
+    def fail_on_five(item: int) -> int:
+        if item == 5:
+            raise ValueError(item)
+        return item
+
+    pipeline = Pipeline([Stage("fail", func=fail_on_five), Stage("pass", func=lambda item: item)])
+    results = []
+    with pytest.raises(ValueError):
+        for result in pipeline.run(range(1000)):
+            results.append(result)
+    # items that were not passed to the next stage before the error are dropped
+    assert results == list(range(len(results)))
+    assert len(results) <= 5
+
+
+def test_error_while_reading_is_raised() -> None:
+    def items():
+        yield 1
+        raise KeyError("row")
+
+    with pytest.raises(KeyError):
+        list(Pipeline([Stage("pass", func=lambda item: item)]).run(items()))
+
+
+def test_consumer_can_stop_early() -> None:
+    results = Pipeline([Stage("pass", func=lambda item: item, workers=2)]).run(range(1000))
+    assert next(results) in range(1000)
+    results.close()  # does not hang on blocked threads
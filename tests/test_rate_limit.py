@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+import pytest
+
+from lib.rate_limit import TokenBucket
+from lib.rate_limit import smtp_rate_limit
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def test_bucket_allows_burst_then_waits(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_bucket_refills_up_to_capacity(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=1, capacity=2, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 100
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_waiting_callers_reserve_tokens_in_order(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock, sleep=lambda _: None)
+    waits = [bucket.acquire() for _ in range(4)]
+    assert waits == pytest.approx([0.0, 1.0, 2.0, 3.0])
+
+
+def test_per_minute_rate() -> None:
+    bucket = TokenBucket.per_minute(30, burst=5)
+    assert bucket.rate == pytest.approx(0.5)
+    assert bucket.capacity == 5
+
+
+def test_unlimited_bucket_never_waits() -> None:
+    bucket = TokenBucket.unlimited()
+    assert all(bucket.acquire() == 0.0 for _ in range(1000))
+
+
+def test_rate_limit_is_configured_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SMTP_PER_MINUTE", "120")
+    monkeypatch.setenv("SMTP_BURST", "7")
+    bucket = smtp_rate_limit()
+    assert bucket.rate == pytest.approx(2.0)
+    assert bucket.capacity == 7
+
+
+def test_bucket_limits_concurrent_threads() -> None:
+    bucket = TokenBucket(rate=500, capacity=1)
+    started_at = monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: bucket.acquire(), range(51)))
+    assert monotonic() - started_at >= 0.09
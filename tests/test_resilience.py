@@ -0,0 +1,164 @@
+from smtplib import SMTPAuthenticationError
+from smtplib import SMTPConnectError
+from smtplib import SMTPDataError
+from smtplib import SMTPRecipientsRefused
+from smtplib import SMTPSenderRefused
+from smtplib import SMTPServerDisconnected
+from typing import Callable
+from unittest.mock import Mock
+
+import pytest
+from gspread.exceptions import APIError
+
+from lib.clients.email import RetryingEmailClient
+from lib.clients.email import TestEmailClient
+from lib.resilience import CircuitBreaker
+from lib.resilience import ConnectError
+from lib.resilience import Retry
+from lib.resilience import get_retry_after
+from lib.resilience import is_transient_sheets_error
+from lib.resilience import is_transient_smtp_error
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def create_api_error(code: int, headers: dict[str, str] | None = None) -> APIError:
+    response = Mock(headers=headers or {})
+    response.json.return_value = {"error": {"code": code, "message": "error"}}
+    return APIError(response)
+
+
+def create_retry(clock: FakeClock, attempts: int = 5, failures: int = 100) -> Retry:
+    return Retry(
+        name="test",
+        is_transient=is_transient_smtp_error,
+        attempts=attempts,
+        breaker=CircuitBreaker(failures, reset_seconds=30, clock=clock, sleep=clock.sleep),
+        sleep=clock.sleep,
+        random=lambda: 1.0,
+    )
+
+
+def failing(errors: list[Exception]) -> Callable[[], str]:
+    def func() -> str:
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    return func
+
+
+@pytest.mark.parametrize(
+    "error, transient",
+    [
+        (ConnectError("connection refused"), True),
+        (SMTPConnectError(421, b"busy"), True),
+        (SMTPAuthenticationError(454, b"4.7.0 too many login attempts"), True),
+        (SMTPAuthenticationError(535, b"bad credentials"), False),
+        (SMTPSenderRefused(451, b"try later", "me@b.c"), True),
+        (SMTPSenderRefused(553, b"not allowed", "me@b.c"), False),
+        (SMTPRecipientsRefused({"a@b.c": (450, b"busy")}), True),
+        (SMTPRecipientsRefused({"a@b.c": (550, b"no such user")}), False),
+        # the message may be accepted already
+        (SMTPDataError(451, b"try later"), False),
+        (SMTPDataError(554, b"rejected"), False),
+        (SMTPServerDisconnected(), False),
+        (ConnectionResetError(), False),
+        (TimeoutError(), False),
+        (ValueError(), False),
+    ],
+)
+def test_smtp_errors_are_classified(error: Exception, transient: bool) -> None:
+    assert is_transient_smtp_error(error) is transient
+
+
+@pytest.mark.parametrize("code, transient", [(429, True), (500, True), (503, True), (404, False)])
+def test_sheets_errors_are_classified(code: int, transient: bool) -> None:
+    assert is_transient_sheets_error(create_api_error(code)) is transient
+
+
+def test_retry_after_is_read_from_response() -> None:
+    assert get_retry_after(create_api_error(429, {"Retry-After": "7"})) == 7.0
+    assert get_retry_after(create_api_error(429)) is None
+    assert get_retry_after(ConnectionError()) is None
+
+
+def test_retry_backs_off_exponentially(clock: FakeClock) -> None:
+    retry = create_retry(clock)
+    errors: list[Exception] = [ConnectError()] * 3
+    assert retry.call(failing(errors)) == "ok"
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+    assert retry.stats == {"calls": 4, "retries": 3}
+
+
+def test_retry_honors_retry_after(clock: FakeClock) -> None:
+    retry = create_retry(clock)
+    retry.is_transient = is_transient_sheets_error
+    assert retry.call(failing([create_api_error(429, {"Retry-After": "20"})])) == "ok"
+    assert clock.sleeps == [20.0]
+
+
+def test_permanent_error_is_not_retried(clock: FakeClock) -> None:
+    retry = create_retry(clock)
+    with pytest.raises(SMTPDataError):
+        retry.call(failing([SMTPDataError(554, b"rejected")]))
+    assert retry.stats == {"calls": 1}
+
+
+def test_retry_gives_up_after_attempts(clock: FakeClock) -> None:
+    retry = create_retry(clock, attempts=3)
+    with pytest.raises(ConnectError):
+        retry.call(failing([ConnectError()] * 5))
+    assert retry.stats == {"calls": 3, "retries": 2, "gave_up": 1}
+
+
+def test_circuit_pauses_calls_and_closes_after_probe(clock: FakeClock) -> None:
+    retry = create_retry(clock, attempts=10, failures=2)
+    assert retry.call(failing([ConnectError()] * 3)) == "ok"
+    # opened by the second failure at 1s, the probe at 31s fails and opens it until 61s
+    assert clock.sleeps == [1.0, 2.0, 28.0, 4.0, 26.0]
+    assert not retry.breaker.is_open
+    assert retry.get_stats()["circuit_opened"] == 2
+
+
+def test_failed_probe_opens_circuit_again(clock: FakeClock) -> None:
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock, sleep=clock.sleep)
+    breaker.record_failure()
+    assert breaker.wait() == 10
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.wait() == 10
+    breaker.record_success()
+    assert breaker.wait() == 0
+
+
+def test_retrying_email_client_sends_again_after_failed_connect() -> None:
+    client = TestEmailClient()
+    errors: list[Exception] = [ConnectError()]
+
+    def send(**kwargs: object) -> None:
+        if errors:
+            raise errors.pop()
+        client.send(**kwargs)  # type: ignore[arg-type]
+
+    flaky = Mock(send=send)
+    retry = Retry("smtp", is_transient_smtp_error, sleep=lambda _: None)
+    RetryingEmailClient(flaky, retry).send(to="a@ya.ru", subject="subject", message_id="<1@a>")
+    assert client.sent_count("a@ya.ru") == 1
+    assert retry.stats["retries"] == 1
@@ -0,0 +1,21 @@
+import json
+
+from lib.sheets import chunk_rows
+
+
+def test_rows_are_chunked_by_count() -> None:
+    rows = [[str(i)] for i in range(5)]
+    assert list(chunk_rows(rows, max_rows=2)) == [[["0"], ["1"]], [["2"], ["3"]], [["4"]]]
+    assert list(chunk_rows([], max_rows=2)) == []
+
+
+def test_rows_are_chunked_by_payload_size() -> None:
+    row = ["Мельникова Людмила Андреевна", "-", "no", "l@ya.ru", "Здравствуйте!"]
+    row_size = len(json.dumps(row, ensure_ascii=False).encode()) + 1
+    chunks = list(chunk_rows([row] * 10, max_rows=100, max_bytes=row_size * 3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+
+
+def test_row_larger_than_payload_is_sent_alone() -> None:
+    chunks = list(chunk_rows([["a" * 100], ["b"]], max_rows=100, max_bytes=10))
+    assert chunks == [[["a" * 100]], [["b"]]]
@@ -1,31 +1,41 @@
 from datetime import date
+from smtplib import SMTPRecipientsRefused
 from unittest.mock import patch
 
 import pytest
 
+from lib.clients.db import DB
 from lib.clients.email import TestEmailClient
 from lib.domain.certificate.service import CertificateService
 from lib.domain.contact.repository import VCardRepository
 from lib.domain.contact.service import ContactService
+from lib.domain.email.planner import SendPlanner
+from lib.domain.email.repository import DAY_SECONDS
+from lib.domain.email.repository import SenderUsageRepository
+from lib.domain.email.service import BccMode
 from lib.domain.email.service import EmailService
+from lib.domain.job.repository import SendJobRepository
+from lib.domain.job.service import SendJobWorker
+from lib.domain.outbox.model import OutboxStatus
+from lib.domain.outbox.repository import OutboxRepository
 from lib.domain.webinar.enums import WebinarTitle
 from lib.participants import Participant
+from lib.protocols import ProtoDocument
+from lib.protocols import RowsT
+from lib.resilience import Retry
+from lib.resilience import is_transient_sheets_error
 from lib.webinar import Webinar
 from tests.common import TEST_SHEET_URL
 from tests.common import CreateDocumentT
+from tests.common import SpreadsheetStub
 from tests.common import create_row
-
-
-@pytest.fixture
-def _no_sleep():
-    with patch("lib.webinar.sleep"):
-        yield
+from tests.common import create_stub_document
+from tests.common import create_stub_webinar
 
 
 def test_webinar_integration(  # pylint: disable=too-many-locals
     create_document: CreateDocumentT,
     tmp_path_factory,
-    _no_sleep,
 ) -> None:
     # TODO: split test into steps
     contact_tmp_path = tmp_path_factory.mktemp("contacts")
@@ -100,3 +110,223 @@ def test_webinar_cen_be_created_from_url(
     ]
     create_document(rows)
     Webinar.from_url(TEST_SHEET_URL, test=True)
+
+
+def create_two_rows() -> RowsT:
+    return [
+        create_row("Мазаев", "Антон", "Андреевич", email="a@ya.ru"),
+        create_row("Мельникова", "Людмила", "Андреевна", email="l@ya.ru"),
+    ]
+
+
+def test_webinar_emails_are_sent_by_queue_workers(tmp_path) -> None:
+    rows = create_two_rows()
+    email_service = EmailService(email_client=TestEmailClient(), bcc_emails=())
+    webinar = create_stub_webinar(create_stub_document(rows), email_service)
+    webinar.certificates_sheet_fill()
+    repository = SendJobRepository(db=DB(path=tmp_path / "test.db"))
+    assert webinar.enqueue_send_jobs(repository) == len(rows)
+    assert webinar.enqueue_send_jobs(repository) == 0
+
+    worker = SendJobWorker(repository=repository, email_service=email_service)
+    assert worker.run() == len(rows)
+    original = SpreadsheetStub.batch_update
+    with patch.object(SpreadsheetStub, "batch_update", autospec=True) as batch_update:
+        batch_update.side_effect = original
+        assert webinar.sync_send_jobs(repository) == len(rows)
+    batch_update.assert_called_once()  # all rows are marked with one request
+    assert [row[2] for row in webinar.cert_sheet.get_all_values()] == ["yes", "yes"]
+
+    # rows are marked as sent, so sending again does nothing
+    webinar.send_emails_with_certificates()
+    assert email_service.email_client.total_send_count == len(rows)  # type: ignore
+
+
+def test_webinar_sends_digest_of_queue_workers_on_sync(tmp_path) -> None:
+    email_client = TestEmailClient()
+    email_service = EmailService(
+        email_client=email_client,
+        bcc_emails=("boss@ya.ru",),
+        bcc_mode=BccMode.DIGEST,
+    )
+    webinar = create_stub_webinar(create_stub_document(create_two_rows()), email_service)
+    webinar.certificates_sheet_fill()
+    repository = SendJobRepository(db=DB(path=tmp_path / "test.db"))
+    webinar.enqueue_send_jobs(repository)
+    SendJobWorker(repository=repository, email_service=email_service).run()
+    assert not email_client.is_sent_to("boss@ya.ru")
+    webinar.sync_send_jobs(repository)
+    (digest,) = email_client.get_calls(to="boss@ya.ru")
+    assert "Мазаев Антон Андреевич <a@ya.ru>" in digest["contents"]
+    assert "Мельникова Людмила Андреевна <l@ya.ru>" in digest["contents"]
+
+
+class FailingEmailClient(TestEmailClient):
+    def send(self, to, *args, **kwargs) -> None:
+        if to == "fail@ya.ru":
+            raise ConnectionError("smtp is down")
+        super().send(to, *args, **kwargs)
+
+
+def test_webinar_sends_emails_concurrently_and_marks_sent_rows() -> None:
+    rows = [create_row("Мазаев", "Антон", f"Андреевич{i}", email=f"{i}@ya.ru") for i in range(6)]
+    rows.append(create_row("Мельникова", "Людмила", "Андреевна", email="fail@ya.ru"))
+    email_client = FailingEmailClient()
+    webinar = create_stub_webinar(
+        create_stub_document(rows),
+        EmailService(
+            email_client=email_client, bcc_emails=("boss@ya.ru",), bcc_mode=BccMode.DIGEST
+        ),
+        send_workers=3,
+    )
+    webinar.certificates_sheet_fill()
+    with pytest.raises(ConnectionError):
+        webinar.send_emails_with_certificates()
+    sent = {row[3] for row in webinar.cert_sheet.get_all_values() if row[2] == "yes"}
+    assert sent == {call["to"] for call in email_client.get_calls()}
+    assert "fail@ya.ru" not in sent
+    assert not email_client.is_sent_to("boss@ya.ru")  # digest is sent only if all emails are
+
+
+class RefusingEmailClient(TestEmailClient):
+    def send(self, to, *args, **kwargs) -> None:
+        if to == "fail@ya.ru":
+            raise SMTPRecipientsRefused({to: (550, b"5.1.1 user unknown")})
+        super().send(to, *args, **kwargs)
+
+
+class FailingSheetStub(SpreadsheetStub):
+    def batch_update(self, data: list[dict]) -> dict:
+        raise ConnectionError("sheets api is down")
+
+
+def create_outbox_webinar(
+    document: ProtoDocument,
+    email_client: TestEmailClient,
+    outbox: OutboxRepository,
+) -> Webinar:
+    return create_stub_webinar(
+        document,
+        EmailService(email_client=email_client, bcc_emails=()),
+        send_workers=2,
+        sheet_retry=Retry("sheets", is_transient_sheets_error, attempts=1),
+        outbox=outbox,
+    )
+
+
+def test_webinar_resumes_from_outbox_without_duplicates(tmp_path) -> None:
+    rows = [create_row("Мазаев", "Антон", f"Андреевич{i}", email=f"{i}@ya.ru") for i in range(4)]
+    rows.append(create_row("Мельникова", "Людмила", "Андреевна", email="fail@ya.ru"))
+    document = create_stub_document(rows)
+    outbox = OutboxRepository(db=DB(path=tmp_path / "test.db"))
+    webinar = create_outbox_webinar(document, RefusingEmailClient(), outbox)
+    webinar.certificates_sheet_fill()
+    # sheet is not available, so sent rows are kept only in the outbox
+    failing_sheet = FailingSheetStub(title=webinar.cert_sheet.title)
+    failing_sheet.append_rows([list(row) for row in webinar.cert_sheet.get_all_values()])
+    object.__setattr__(webinar, "cert_sheet", failing_sheet)
+    with pytest.raises(SMTPRecipientsRefused):  # not the error of marking rows
+        webinar.send_emails_with_certificates()
+    first_client = webinar.email_service.email_client
+    assert isinstance(first_client, TestEmailClient)
+    sent_first = {call["to"] for call in first_client.get_calls()}
+    assert all(call["message_id"] for call in first_client.get_calls())
+    assert [row[2] for row in failing_sheet.get_all_values()] == ["no"] * len(rows)
+
+    # next run marks rows sent before and sends the rest only
+    email_client = TestEmailClient()
+    webinar = create_outbox_webinar(document, email_client, outbox)
+    webinar.send_emails_with_certificates()
+    sent_second = {call["to"] for call in email_client.get_calls()}
+    assert not sent_first & sent_second
+    assert sent_first | sent_second == {row[6] for row in rows}
+    assert [row[2] for row in webinar.cert_sheet.get_all_values()] == ["yes"] * len(rows)
+    assert outbox.count_by_status(webinar.document.url) == {OutboxStatus.SENT: len(rows)}
+
+
+def test_webinar_send_stops_at_plan_budget_and_resumes(tmp_path) -> None:
+    rows = [create_row("Мазаев", "Антон", f"Андреевич{i}", email=f"{i}@ya.ru") for i in range(5)]
+    document = create_stub_document(rows)
+    db = DB(path=tmp_path / "test.db")
+    outbox = OutboxRepository(db=db)
+    usage = SenderUsageRepository(db=db)
+    planner = SendPlanner(daily_quota=3)
+    email_client = TestEmailClient()
+    webinar = create_outbox_webinar(document, email_client, outbox)
+    webinar.certificates_sheet_fill()
+
+    plan = webinar.plan_send(planner, usage, now=1000.0)
+    assert (plan.pending, plan.budget) == (5, 3)
+    assert webinar.send_emails_with_certificates(limit=plan.budget) == 3
+    for _ in range(plan.budget):
+        usage.record("sender@gmail.com", sent_at=1000.0)
+    assert email_client.total_send_count == 3
+
+    assert webinar.plan_send(planner, usage, now=2000.0).budget == 0
+    plan = webinar.plan_send(planner, usage, now=1000.0 + DAY_SECONDS)
+    assert (plan.pending, plan.budget) == (2, 2)
+    assert webinar.send_emails_with_certificates(limit=plan.budget) == 2
+    assert email_client.total_send_count == 5
+    assert {call["to"] for call in email_client.get_calls()} == {row[6] for row in rows}
+
+
+def test_certificates_sheet_is_filled_in_chunks() -> None:
+    rows = [create_row("Мазаев", "Антон", f"Андреевич{i}", email=f"{i}@ya.ru") for i in range(5)]
+    webinar = create_stub_webinar(create_stub_document(rows), fill_chunk_rows=2)
+    original = SpreadsheetStub.append_rows
+    with patch.object(SpreadsheetStub, "append_rows", autospec=True) as append_rows:
+        append_rows.side_effect = original
+        webinar.certificates_sheet_fill()
+    assert [len(call.args[1]) for call in append_rows.call_args_list] == [2, 2, 1]
+    values = webinar.cert_sheet.get_all_values()
+    assert [row[0] for row in values] == [f"Мазаев Антон Андреевич{i}" for i in range(5)]
+    assert values[0][1:4] == ["-", "no", "0@ya.ru"]
+
+
+def test_certificates_sheet_fill_does_not_repeat_applied_chunk() -> None:
+    rows = [create_row("Мазаев", "Антон", f"Андреевич{i}", email=f"{i}@ya.ru") for i in range(3)]
+    webinar = create_stub_webinar(
+        create_stub_document(rows),
+        sheet_retry=Retry("sheets", is_transient_sheets_error, sleep=lambda _: None),
+        fill_chunk_rows=2,
+    )
+    original = SpreadsheetStub.append_rows
+
+    def append_and_fail(sheet: SpreadsheetStub, chunk: RowsT) -> None:
+        original(sheet, chunk)
+        if append_rows.call_count == 1:
+            raise ConnectionResetError("the response is lost")
+
+    with patch.object(SpreadsheetStub, "append_rows", autospec=True) as append_rows:
+        append_rows.side_effect = append_and_fail
+        webinar.certificates_sheet_fill()
+    values = webinar.cert_sheet.get_all_values()
+    assert [row[0] for row in values] == [f"Мазаев Антон Андреевич{i}" for i in range(3)]
+    assert webinar.sheet_retry.stats["retries"] == 1
+
+
+def test_webinar_keeps_email_with_unknown_outcome_in_sending(tmp_path) -> None:
+    rows = [create_row("Мельникова", "Людмила", "Андреевна", email="fail@ya.ru")]
+    document = create_stub_document(rows)
+    outbox = OutboxRepository(db=DB(path=tmp_path / "test.db"))
+    webinar = create_outbox_webinar(document, FailingEmailClient(), outbox)
+    webinar.certificates_sheet_fill()
+    with pytest.raises(ConnectionError):
+        webinar.send_emails_with_certificates()
+    # the connection was lost, so the email may be delivered and it is not sent again
+    assert outbox.count_by_status(document.url) == {OutboxStatus.SENDING: 1}
+    email_client = TestEmailClient()
+    create_outbox_webinar(document, email_client, outbox).send_emails_with_certificates()
+    assert email_client.total_send_count == 0
+
+
+def test_webinar_sends_repeated_row_once_with_outbox(tmp_path) -> None:
+    row = create_row("Мельникова", "Людмила", "Андреевна", email="l@ya.ru")
+    document = create_stub_document([row, row])
+    outbox = OutboxRepository(db=DB(path=tmp_path / "test.db"))
+    email_client = TestEmailClient()
+    webinar = create_outbox_webinar(document, email_client, outbox)
+    webinar.certificates_sheet_fill()
+    assert webinar.send_emails_with_certificates() == 1
+    assert email_client.total_send_count == 1
+    assert outbox.count_by_status(document.url) == {OutboxStatus.SENT: 1}